@@ -1,8 +1,10 @@
 import altair as alt
 import pandas as pd
 import streamlit as st
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+from st_aggrid import GridUpdateMode
 
+from components import grid_formatters as fmt
+from components import paged_grid
 from components.active_client_badge import render as client_badge
 from utils.auth import require_auth
 from utils.branding import apply_branding_to_sidebar, inject_brand_colors
@@ -108,38 +110,26 @@ st.subheader("📋 Recipe Portfolio with Metrics")
 if df.empty:
     st.info("No recipe data available to display.")
 else:
-    df["Cost (% of Price)"] = (df["cost"] / df["price"]) * 100
-    display_df = df[["recipe", "price", "Cost (% of Price)", "margin_dollar"]].copy()
-
-    display_df.rename(
-        columns={
-            "recipe": "Recipe",
-            "price": "Price ($)",
-            "margin_dollar": "Margin ($)",
-        },
-        inplace=True,
-    )
-
-    # Round values
-    for col in ["Price ($)", "Cost (% of Price)", "Margin ($)"]:
-        display_df[col] = display_df[col].round(2)
-
-    # Configure AgGrid
-    gb = GridOptionsBuilder.from_dataframe(display_df)
-    gb.configure_default_column(editable=False, filter=True, sortable=True)
-
-    # Right-align numeric columns
-    for col in ["Price ($)", "Cost (% of Price)", "Margin ($)"]:
-        gb.configure_column(
-            col, type=["numericColumn", "rightAligned"], valueFormatter="x.toFixed(2)"
-        )
-
-    grid_options = gb.build()
 
-    AgGrid(
-        display_df,
-        gridOptions=grid_options,
+    def configure_grid(gb):
+        # Right-align numeric columns; numbers stay numeric and are formatted in the browser
+        headers = {"price": "Price ($)", "cost_pct": "Cost (% of Price)", "margin": "Margin ($)"}
+        gb.configure_column("name", header_name="Recipe")
+        for col, header in headers.items():
+            gb.configure_column(
+                col,
+                header_name=header,
+                type=["numericColumn", "rightAligned"],
+                valueFormatter=fmt.fixed(2),
+            )
+
+    # One page at a time from recipe_summary; sort and filter run in Postgres
+    paged_grid.render(
+        "recipe_summary",
+        ["name", "price", "cost_pct", "margin"],
+        key="home_recipe_grid",
+        row_key="recipe_id",
+        configure=configure_grid,
         update_mode=GridUpdateMode.NO_UPDATE,
         fit_columns_on_grid_load=True,
-        allow_unsafe_jscode=True,
     )
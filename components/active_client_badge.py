@@ -2,15 +2,16 @@ from typing import Optional
 
 import streamlit as st
 
+from components.query_profiler import render as query_profiler
+from utils import tenant_db as db
 from utils.branding import inject_brand_colors
-from utils.supabase_client import supabase
 from utils.tenant_state import get_active_tenant, set_active_tenant
 
 
 def _pick_default_tenant() -> Optional[str]:
     # Prefer DB default & active, else first by name
     r = (
-        supabase.table("tenants")
+        db.table("tenants")
         .select("id")
         .eq("is_default", True)
         .eq("is_active", True)
@@ -19,7 +20,7 @@ def _pick_default_tenant() -> Optional[str]:
     )
     if r.data:
         return r.data[0]["id"]
-    r = supabase.table("tenants").select("id").order("name").limit(1).execute()
+    r = db.table("tenants").select("id").order("name").limit(1).execute()
     return r.data[0]["id"] if r.data else None
 
 
@@ -36,7 +37,7 @@ def _ensure_loaded_tenant() -> Optional[str]:
 def _tenant_name(tenant_id: Optional[str]) -> str:
     if not tenant_id:
         return "— No client loaded —"
-    r = supabase.table("tenants").select("name").eq("id", tenant_id).limit(1).execute()
+    r = db.table("tenants").select("name").eq("id", tenant_id).limit(1).execute()
     return r.data[0]["name"] if r.data else tenant_id
 
 
@@ -58,6 +59,8 @@ def _go_clients_page():
 def render(clients_page_title: str = "Clients", **_ignore_kwargs):
     # ensure CSS vars are present (safe to call multiple times)
     inject_brand_colors()
+    # every page renders the badge, so the opt-in profiler panel rides along
+    query_profiler()
 
     tid = _ensure_loaded_tenant()
     name = _tenant_name(tid)
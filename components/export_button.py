@@ -0,0 +1,54 @@
+"""
+"Prepare" + "Download" buttons for an export registered with utils.exports.
+
+Rendering costs nothing: the file is built when "Prepare" is clicked, and the
+prepared file is kept in session_state (for the same parameters) so later
+reruns show its download button without reading anything. Prepared files are
+kept per tenant (utils.tenant_state.key).
+"""
+
+from typing import Any
+
+import streamlit as st
+
+from utils import exports
+from utils.tenant_state import key as tenant_key
+
+
+def render(name: str, *params: Any, label: str, file_name: str, mime: str = "text/csv") -> None:
+    """
+    Buttons for export `name` with `params` (passed to its frames function).
+    When `params` change (e.g. the grid's filters), the prepared file is dropped.
+    """
+    # Per tenant: after a client switch the previous tenant's file must not be offered
+    key = tenant_key(f"export__{name}")
+    prepared = st.session_state.get(key)
+    if prepared is not None and prepared[0] != params:
+        prepared = None
+
+    c1, c2 = st.columns([1, 3])
+    if c1.button(
+        "📦 Prepare export",
+        key=f"{key}__prepare",
+        help="Reads the data now; an unchanged export is served from cache.",
+    ):
+        with st.spinner("Building export…"):
+            prepared = (params, exports.build(name, *params))
+        st.session_state[key] = prepared
+
+    if prepared is None:
+        c2.caption("Nothing is read until you prepare the file.")
+        return
+
+    file = prepared[1]
+    c2.caption(f"{file.rows:,} rows, as of {file.built_at:%H:%M:%S}")
+    st.download_button(
+        label=label,
+        data=file.data,
+        file_name=file_name,
+        mime=mime,
+        disabled=file.rows == 0,
+        key=f"{key}__download",
+    )
+    if file.rows == 0:
+        st.caption("Export is disabled because there are no rows to export.")
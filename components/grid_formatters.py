@@ -0,0 +1,31 @@
+"""
+AG Grid valueFormatters. Grid columns stay numeric (so they sort, filter and
+export as numbers) and are formatted in the browser; pass these as
+`valueFormatter=` to GridOptionsBuilder.configure_column (the grid needs
+allow_unsafe_jscode=True).
+"""
+
+from st_aggrid import JsCode
+
+
+def currency(decimals: int = 2) -> JsCode:
+    """$12.50 style; blank for missing values."""
+    return JsCode(
+        "function(p){ if(p.value==null) return ''; "
+        f"return '$'+Number(p.value).toFixed({decimals});}}"
+    )
+
+
+def percent(decimals: int = 1) -> JsCode:
+    """12.5% style, for values already in percent (12.5, not 0.125)."""
+    return JsCode(
+        "function(p){ if(p.value==null) return ''; "
+        f"return Number(p.value).toFixed({decimals})+'%';}}"
+    )
+
+
+def fixed(decimals: int = 2) -> JsCode:
+    return JsCode(
+        "function(p){ if(p.value==null) return ''; "
+        f"return Number(p.value).toFixed({decimals});}}"
+    )
@@ -0,0 +1,153 @@
+"""
+AgGrid over a tenant_db relation, one page at a time.
+
+The browser only receives the rows it shows. Sort and filter happen in
+Postgres: the grid's sort/filter state is replayed on a range query
+(utils.grid_query -> tenant_db.read_page), and a pager under the grid picks the
+page. Format numbers with components.grid_formatters so columns stay numeric.
+"""
+
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+import streamlit as st
+from st_aggrid import AgGrid, GridOptionsBuilder
+from st_aggrid.AgGridReturn import AgGridReturn
+
+from utils import tenant_db as db
+from utils.grid_query import GridQuery, from_state
+
+PAGE_SIZES = (50, 100, 250, 500)
+DEFAULT_PAGE_SIZE = 100
+
+
+class PagedGrid(NamedTuple):
+    response: AgGridReturn  # selection etc., for the rows on this page
+    source: str
+    columns: Tuple[str, ...]
+    query: GridQuery  # the grid's sort and filters, tie-breaker order included
+    filters: Dict[str, Any]  # the caller's equality filters
+    total: int  # rows matching query + filters, all pages
+
+
+def _grid_state(key: str) -> Dict[str, Any]:
+    # The component's last value is in session_state under its key before it renders,
+    # so this rerun already fetches the page for the sort/filter the user just set
+    raw = st.session_state.get(key)
+    return (raw.get("gridState") or {}) if isinstance(raw, dict) else {}
+
+
+def render(
+    source: str,
+    columns: Sequence[str],
+    *,
+    key: str,
+    row_key: str = "id",
+    default_order: Sequence[Tuple[str, bool]] = (("name", False),),
+    filters: Optional[Dict[str, Any]] = None,
+    configure: Optional[Callable[[GridOptionsBuilder], None]] = None,
+    height: int = 600,
+    **aggrid_kwargs,
+) -> PagedGrid:
+    """
+    Grid over tenant_db relation `source`, showing `columns` (plus `row_key`, hidden,
+    when not among them). `filters` are equality filters applied on top of the
+    grid's own; `configure(gb)` sets up columns (formatters, headers, selection).
+    `key` must be unique on the page: it keys the grid and its pager.
+    """
+    filters = dict(filters or {})
+    fetched = tuple(columns) + (() if row_key in columns else (row_key,))
+    state = _grid_state(key)
+    grid = from_state(state, columns)
+    order = grid.order or tuple(default_order)
+    if row_key not in (c for c, _ in order):
+        order += ((row_key, False),)  # unique last: stable pages
+    query = grid._replace(order=order)
+
+    # New sort, filters or page size: back to the first page
+    page_key, size_key, seen_key = f"{key}__page", f"{key}__page_size", f"{key}__query"
+    page_size = st.session_state.get(size_key, DEFAULT_PAGE_SIZE)
+    signature = (query, tuple(sorted(filters.items())), page_size)
+    if st.session_state.get(seen_key) != signature:
+        st.session_state[seen_key] = signature
+        st.session_state[page_key] = 1
+    page = st.session_state.get(page_key, 1)
+
+    def fetch(page: int) -> Tuple[pd.DataFrame, int]:
+        df, total = db.read_page(
+            source,
+            ", ".join(fetched),
+            offset=(page - 1) * page_size,
+            limit=page_size,
+            order=query.order,
+            where=query.where,
+            any_of=query.any_of,
+            **filters,
+        )
+        return df.reindex(columns=list(fetched)), total if total is not None else len(df)
+
+    df, total = fetch(page)
+    pages = max(1, -(-total // page_size))
+    if page > pages:  # rows went away (deletes, another session): show the last page
+        page = pages
+        df, total = fetch(page)
+
+    gb = GridOptionsBuilder.from_dataframe(df)
+    gb.configure_default_column(editable=False, filter=True, sortable=True)
+    if row_key not in columns:
+        gb.configure_column(row_key, hide=True, filter=False)
+    if configure is not None:
+        configure(gb)
+    grid_options = gb.build()
+    # The grid is rebuilt when its rows change; carry the user's sort and filters over
+    initial = {k: state[k] for k in ("sort", "filter") if k in state}
+    if initial:
+        grid_options["initialState"] = initial
+
+    response = AgGrid(
+        df,
+        gridOptions=grid_options,
+        key=key,
+        height=height,
+        allow_unsafe_jscode=True,
+        **aggrid_kwargs,
+    )
+
+    st.session_state[page_key] = page
+    c1, c2, c3 = st.columns([1, 1, 3])
+    c1.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    c2.selectbox("Rows per page", PAGE_SIZES, key=size_key, index=PAGE_SIZES.index(page_size))
+    first = (page - 1) * page_size + 1 if total else 0
+    c3.caption(f"Rows {first:,}–{min(page * page_size, total):,} of {total:,}")
+
+    return PagedGrid(response, source, fetched, query, filters, total)
+
+
+def iter_pages(
+    source: str,
+    columns: Sequence[str],
+    query: GridQuery,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Every row `query` and `filters` select (all pages), one frame per request, e.g.
+    for an export (utils.exports) of what a grid shows: pass its `query`/`filters`.
+    Pages are not counted: the last one is the first that comes back short.
+    """
+    offset = 0
+    while True:
+        df, _ = db.read_page(
+            source,
+            ", ".join(columns),
+            offset=offset,
+            limit=db.PAGE_SIZE,
+            order=query.order,
+            where=query.where,
+            any_of=query.any_of,
+            count=None,
+            **(filters or {}),
+        )
+        yield df.reindex(columns=list(columns))
+        if len(df) < db.PAGE_SIZE:
+            return
+        offset += db.PAGE_SIZE
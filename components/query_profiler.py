@@ -0,0 +1,71 @@
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from utils import profiler
+from utils.env import is_prod
+from utils.secrets import get as get_secret
+
+SLOWEST_SHOWN = 5
+
+
+def _enabled() -> bool:
+    # Always offered outside production; in production only with QUERY_PROFILER set
+    return not is_prod() or bool(get_secret("QUERY_PROFILER", default=""))
+
+
+def _calls_df(run: profiler.Run) -> pd.DataFrame:
+    df = pd.DataFrame(run.calls, columns=profiler.Call._fields)
+    df["call"] = [f"{i + 1:>3} {name}" for i, name in enumerate(df["name"])]
+    df["start_ms"] = df["started"] * 1000
+    df["end_ms"] = (df["started"] + df["seconds"]) * 1000
+    df["ms"] = (df["seconds"] * 1000).round(1)
+    return df
+
+
+def render() -> None:
+    """Opt-in sidebar panel: the previous rerun's queries (utils.profiler)."""
+    if not _enabled():
+        return
+    with st.sidebar:
+        if not st.toggle("⏱️ Query profiler", key="query_profiler_on"):
+            return
+        run = profiler.last_run()
+        if run is None or not run.calls:
+            st.caption("No queries recorded in the previous rerun.")
+            return
+
+        totals = run.totals()
+        st.caption(f"Previous rerun (#{run.seq})")
+        c1, c2 = st.columns(2)
+        c1.metric("Calls", totals["calls"])
+        c2.metric("Wall", f"{totals['span'] * 1000:,.0f} ms")
+        c1.metric("Rows", f"{totals['rows']:,}")
+        c2.metric("Payload", f"{totals['bytes'] / 1024:,.1f} KB")
+        st.caption(f"Sum of call times: {totals['seconds'] * 1000:,.0f} ms")
+
+        df = _calls_df(run)
+        waterfall = (
+            alt.Chart(df)
+            .mark_bar()
+            .encode(
+                x=alt.X("start_ms:Q", title="ms since rerun start"),
+                x2="end_ms:Q",
+                y=alt.Y("call:N", sort=None, title=None),
+                color=alt.Color("method:N", legend=None),
+                tooltip=["name", "method", "filters", "rows", "bytes", "ms"],
+            )
+            .properties(height=max(120, 18 * len(df)))
+        )
+        st.altair_chart(waterfall, use_container_width=True)
+
+        st.caption("Slowest calls")
+        slowest = df.sort_values("seconds", ascending=False).head(SLOWEST_SHOWN)
+        st.dataframe(
+            slowest[["name", "ms", "rows", "filters"]], hide_index=True, use_container_width=True
+        )
+
+        for name, n in run.repeated().items():
+            st.warning(f"`{name}` called {n}× in one rerun (N+1?)")
+        if run.dropped:
+            st.caption(f"{run.dropped} more calls not shown")
@@ -1,12 +1,13 @@
 # components/tenant_switcher.py
 import streamlit as st
 
+from utils.cache import WRITE_AWARE_TTL, cache_by_tenant
 from utils.secrets import get as get_secret
 from utils.supabase_client import supabase
 from utils.tenant_state import get_active_tenant, set_active_tenant
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, shared=True, reads=("tenants",))
 def _load_tenants():
     # include code so we can honor DEFAULT_TENANT_CODE
     resp = supabase.table("tenants").select("id,name,code").order("name").execute()
@@ -0,0 +1,117 @@
+-- ============================================
+-- V015: Recipe editor bundle RPC
+--       One round trip returns everything pages/RecipeEditor.py renders:
+--       recipe header + KPIs, lines (labels, notes, unit costs),
+--       selectable input catalog, blocked ancestor recipes, UOM options.
+-- Rollback: drop function if exists public.get_recipe_editor_bundle(uuid, uuid);
+-- ============================================
+
+create or replace function public.get_recipe_editor_bundle(p_tenant uuid, p_recipe_id uuid)
+returns jsonb
+language sql
+stable
+set search_path = public, pg_temp
+as $$
+  with recursive
+  recipe as (
+    select r.id, r.name, r.recipe_code, r.recipe_type, r.status, r.price, r.yield_qty, r.yield_uom
+    from public.recipes r
+    where r.tenant_id = p_tenant
+      and r.id = p_recipe_id
+      and r.deleted_at is null
+  ),
+  active_recipes as (
+    select r.id
+    from public.recipes r
+    where r.tenant_id = p_tenant
+      and r.status = 'Active'
+      and r.deleted_at is null
+  ),
+  -- Recipes that (directly or indirectly) use this recipe; picking them as inputs
+  -- would create a cycle.
+  ancestors (recipe_id) as (
+    select rl.recipe_id
+    from public.recipe_lines rl
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.ingredient_id = p_recipe_id
+      and rl.ingredient_id in (select id from active_recipes)
+    union
+    select rl.recipe_id
+    from public.recipe_lines rl
+      join ancestors a on a.recipe_id = rl.ingredient_id
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.ingredient_id in (select id from active_recipes)
+  ),
+  blocked as (
+    select recipe_id as id from ancestors
+    union
+    select p_recipe_id
+  ),
+  -- Same semantics as get_unit_costs_for_inputs(ids)
+  unit_costs as (
+    select i.id,
+      case when i.package_qty > 0 then i.package_cost / i.package_qty else null end as unit_cost
+    from public.ingredients i
+    where i.tenant_id = p_tenant
+    union all
+    select pc.recipe_id as id, pc.unit_cost
+    from public.prep_costs pc
+    where pc.tenant_id = p_tenant
+  ),
+  catalog as (
+    select ic.id, ic.code, ic.name, ic.source,
+      coalesce(ic.name, '') || ' – ' || coalesce(ic.code, '') as label
+    from public.input_catalog ic
+    where ic.tenant_id = p_tenant
+  ),
+  lines as (
+    select rlc.recipe_line_id, rlc.ingredient_id, rlc.qty, rlc.qty_uom, rlc.line_cost,
+      rl.note, c.label, uc.unit_cost, rl.updated_at
+    from public.recipe_line_costs rlc
+      join public.recipe_lines rl on rl.id = rlc.recipe_line_id
+      left join catalog c on c.id = rlc.ingredient_id
+      left join unit_costs uc on uc.id = rlc.ingredient_id
+    where rlc.tenant_id = p_tenant
+      and rlc.recipe_id = p_recipe_id
+  ),
+  uoms as (
+    select from_uom as uom from public.ref_uom_conversion where from_uom is not null
+    union
+    select to_uom from public.ref_uom_conversion where to_uom is not null
+  )
+  select jsonb_build_object(
+    'recipe', (select to_jsonb(recipe) from recipe),
+    'summary', (
+      select to_jsonb(rs) from public.recipe_summary rs
+      where rs.tenant_id = p_tenant and rs.recipe_id = p_recipe_id
+    ),
+    'prep_costs', (
+      select to_jsonb(pc) from public.prep_costs pc
+      where pc.tenant_id = p_tenant and pc.recipe_id = p_recipe_id
+    ),
+    'lines', coalesce((
+      select jsonb_agg(
+        to_jsonb(l) - 'updated_at'
+        order by l.updated_at, l.recipe_line_id
+      ) from lines l
+    ), '[]'::jsonb),
+    'catalog', coalesce((
+      select jsonb_agg(
+        jsonb_build_object(
+          'id', c.id, 'code', c.code, 'name', c.name, 'source', c.source,
+          'label', c.label, 'unit_cost', uc.unit_cost
+        )
+        order by lower(c.label) collate "C"
+      )
+      from catalog c
+        left join unit_costs uc on uc.id = c.id
+      where not (c.source = 'recipe' and c.id in (select id from blocked))
+    ), '[]'::jsonb),
+    'blocked_recipe_ids', coalesce((select jsonb_agg(id) from blocked), '[]'::jsonb),
+    'uom_options', coalesce((
+      select jsonb_agg(uom order by uom collate "C") from uoms
+    ), '[]'::jsonb)
+  )
+$$;
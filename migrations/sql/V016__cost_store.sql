@@ -0,0 +1,416 @@
+-- ============================================
+-- V016: Materialized cost store with trigger-driven incremental refresh
+--       recipe_line_cost_store / recipe_cost_store hold per-line and per-recipe
+--       costs (every level of prep nesting, same formulas as utils/costing.py).
+--       Statement-level triggers on ingredients, recipes, recipe_lines and
+--       ref_uom_conversion re-cost only the recipes a statement touched plus
+--       every recipe above them. recipe_line_costs, prep_costs and recipe_summary
+--       become thin views over the store, so readers do index lookups instead of
+--       re-joining the base tables.
+-- Rollback: drop the tr_*_cost_store_{ins,upd,del} triggers,
+--           tr_cost_store_refresh(), refresh_recipe_costs(uuid, uuid[]) and
+--           refresh_all_recipe_costs(),
+--           re-run the V007 definitions of recipe_line_costs / prep_costs /
+--           recipe_summary (+ V012 security_invoker), then
+--           drop table public.recipe_line_cost_store, public.recipe_cost_store;
+-- ============================================
+
+-- 1) Store tables (written only by the refresh functions below)
+create table if not exists public.recipe_cost_store (
+  tenant_id uuid not null,
+  recipe_id uuid primary key,
+  recipe_code text,
+  name text,
+  recipe_type text,
+  status text,
+  price numeric,
+  yield_qty numeric,
+  yield_uom text,
+  level integer not null default 0,
+  total_cost numeric not null default 0,
+  base_uom text,
+  conversion_factor numeric,
+  unit_cost numeric,
+  cost_pct numeric,
+  margin numeric
+);
+create index if not exists idx_recipe_cost_store_tenant_type_status
+  on public.recipe_cost_store (tenant_id, recipe_type, status);
+
+create table if not exists public.recipe_line_cost_store (
+  tenant_id uuid not null,
+  recipe_line_id uuid primary key,
+  recipe_id uuid not null,
+  ingredient_id uuid,
+  qty numeric,
+  qty_uom text,
+  line_cost numeric not null default 0
+);
+create index if not exists idx_recipe_line_cost_store_tenant_recipe
+  on public.recipe_line_cost_store (tenant_id, recipe_id);
+
+alter table public.recipe_cost_store enable row level security;
+alter table public.recipe_line_cost_store enable row level security;
+drop policy if exists p_select_all_recipe_cost_store on public.recipe_cost_store;
+create policy p_select_all_recipe_cost_store on public.recipe_cost_store for select using (true);
+drop policy if exists p_select_all_recipe_line_cost_store on public.recipe_line_cost_store;
+create policy p_select_all_recipe_line_cost_store on public.recipe_line_cost_store for select using (true);
+
+-- 2) Re-cost p_recipe_ids and every recipe that (transitively) uses them.
+--    Sub-recipes are costed before their parents, one dependency level per pass;
+--    recipes outside that set are read from the store as they are.
+create or replace function public.refresh_recipe_costs(p_tenant uuid, p_recipe_ids uuid[])
+returns void
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_pending uuid[];
+  v_ready uuid[];
+begin
+  with recursive up (id) as (
+    select unnest(p_recipe_ids)
+    union
+    select rl.recipe_id
+    from public.recipe_lines rl
+      join up on up.id = rl.ingredient_id
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+  )
+  select array_agg(id) into v_pending from up where id is not null;
+  if v_pending is null then
+    return;
+  end if;
+
+  delete from public.recipe_line_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+  delete from public.recipe_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+
+  select array_agg(r.id) into v_pending
+  from public.recipes r
+  where r.tenant_id = p_tenant
+    and r.deleted_at is null
+    and r.id = any(v_pending);
+
+  while coalesce(cardinality(v_pending), 0) > 0 loop
+    select array_agg(p.id) into v_ready
+    from unnest(v_pending) as p(id)
+    where not exists (
+      select 1
+      from public.recipe_lines rl
+      where rl.tenant_id = p_tenant
+        and rl.deleted_at is null
+        and rl.recipe_id = p.id
+        and rl.ingredient_id = any(v_pending)
+    );
+    if v_ready is null then
+      raise exception 'Recipe dependency cycle involving: %', array_to_string(v_pending, ', ')
+        using errcode = 'check_violation';
+    end if;
+
+    insert into public.recipe_line_cost_store (
+      tenant_id, recipe_line_id, recipe_id, ingredient_id, qty, qty_uom, line_cost
+    )
+    select rl.tenant_id,
+      rl.id,
+      rl.recipe_id,
+      rl.ingredient_id,
+      rl.qty,
+      rl.qty_uom,
+      coalesce(
+        -- ingredient path
+        case
+          when i.package_qty > 0 and i.yield_pct <> 0 then
+            rl.qty * fi.factor / (i.yield_pct / 100.0) * (i.package_cost / i.package_qty)
+        end,
+        -- prep path
+        rl.qty * fp.factor * p.unit_cost,
+        0
+      )
+    from public.recipe_lines rl
+      left join public.ingredients i on i.id = rl.ingredient_id
+        and i.tenant_id = rl.tenant_id
+        and i.deleted_at is null
+      left join public.recipe_cost_store p on p.recipe_id = rl.ingredient_id
+        and p.tenant_id = rl.tenant_id
+        and p.recipe_type = 'prep'
+      left join lateral (
+        select case
+          when rl.qty_uom = i.package_uom then 1.0
+          else (
+            select cu.factor from public.ref_uom_conversion cu
+            where cu.from_uom = rl.qty_uom and cu.to_uom = i.package_uom
+          )
+        end as factor
+      ) fi on true
+      left join lateral (
+        select case
+          when rl.qty_uom = p.base_uom then 1.0
+          else (
+            select cu.factor from public.ref_uom_conversion cu
+            where cu.from_uom = rl.qty_uom and cu.to_uom = p.base_uom
+          )
+        end as factor
+      ) fp on true
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.recipe_id = any(v_ready);
+
+    insert into public.recipe_cost_store (
+      tenant_id, recipe_id, recipe_code, name, recipe_type, status, price, yield_qty,
+      yield_uom, level, total_cost, base_uom, conversion_factor, unit_cost, cost_pct, margin
+    )
+    select r.tenant_id,
+      r.id,
+      r.recipe_code,
+      r.name,
+      r.recipe_type,
+      r.status,
+      r.price,
+      r.yield_qty,
+      r.yield_uom,
+      lv.level,
+      t.total_cost,
+      case when r.recipe_type = 'prep' then coalesce(b.base_uom, r.yield_uom) end,
+      cf.factor,
+      case
+        when r.recipe_type = 'prep' and r.status = 'Active' and r.yield_qty * cf.factor > 0
+          then t.total_cost / (r.yield_qty * cf.factor)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(t.total_cost / r.price * 100.0, 2)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(r.price - t.total_cost, 2)
+      end
+    from public.recipes r
+      cross join lateral (
+        select coalesce(sum(s.line_cost), 0) as total_cost
+        from public.recipe_line_cost_store s
+        where s.tenant_id = r.tenant_id and s.recipe_id = r.id
+      ) t
+      cross join lateral (
+        select coalesce(max(sub.level + 1), 0) as level
+        from public.recipe_lines rl
+          join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+            and sub.tenant_id = rl.tenant_id
+        where rl.tenant_id = r.tenant_id
+          and rl.deleted_at is null
+          and rl.recipe_id = r.id
+      ) lv
+      -- Smallest ingredient base UOM, else smallest base UOM of a costed sub-prep
+      cross join lateral (
+        select coalesce(
+          (
+            select min(i.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.ingredients i on i.id = rl.ingredient_id
+                and i.tenant_id = rl.tenant_id
+                and i.deleted_at is null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          ),
+          (
+            select min(sub.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+                and sub.tenant_id = rl.tenant_id
+                and sub.recipe_type = 'prep'
+                and sub.unit_cost is not null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          )
+        ) as base_uom
+      ) b
+      cross join lateral (
+        select case
+          when r.recipe_type is distinct from 'prep' or b.base_uom is null then null
+          when r.yield_uom = b.base_uom then 1.0
+          else (
+            select cu.factor from public.ref_uom_conversion cu
+            where cu.from_uom = r.yield_uom and cu.to_uom = b.base_uom
+          )
+        end as factor
+      ) cf
+    where r.tenant_id = p_tenant
+      and r.id = any(v_ready);
+
+    v_pending := array(select unnest(v_pending) except select unnest(v_ready));
+  end loop;
+end $$;
+
+create or replace function public.refresh_all_recipe_costs()
+returns void
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  t record;
+begin
+  delete from public.recipe_line_cost_store;
+  delete from public.recipe_cost_store;
+  for t in
+    select r.tenant_id, array_agg(r.id) as ids
+    from public.recipes r
+    where r.deleted_at is null
+    group by r.tenant_id
+  loop
+    perform public.refresh_recipe_costs(t.tenant_id, t.ids);
+  end loop;
+end $$;
+
+-- 3) Statement-level triggers: one refresh per statement and tenant, scoped to
+--    the rows the statement changed (read from its transition tables).
+create or replace function public.tr_cost_store_refresh()
+returns trigger
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_key text := case tg_table_name when 'recipe_lines' then 'recipe_id' else 'id' end;
+  v_changed text;
+  t record;
+begin
+  -- Conversions are global and rarely edited: re-cost everything
+  if tg_table_name = 'ref_uom_conversion' then
+    perform public.refresh_all_recipe_costs();
+    return null;
+  end if;
+
+  v_changed := case tg_op
+    when 'INSERT' then format('select tenant_id, %I as id from new_rows', v_key)
+    when 'DELETE' then format('select tenant_id, %I as id from old_rows', v_key)
+    else format(
+      'select tenant_id, %1$I as id from new_rows union select tenant_id, %1$I from old_rows',
+      v_key
+    )
+  end;
+  -- An ingredient change re-costs the recipes with a line using it
+  if tg_table_name = 'ingredients' then
+    v_changed := 'select rl.tenant_id, rl.recipe_id as id from (' || v_changed || ') c '
+      || 'join public.recipe_lines rl on rl.tenant_id = c.tenant_id '
+      || 'and rl.ingredient_id = c.id and rl.deleted_at is null';
+  end if;
+
+  for t in execute
+    'select tenant_id, array_agg(distinct id) as ids from (' || v_changed || ') c '
+    || 'where tenant_id is not null group by tenant_id'
+  loop
+    perform public.refresh_recipe_costs(t.tenant_id, t.ids);
+  end loop;
+  return null;
+end $$;
+
+-- Transition tables need one trigger per event
+do $$
+declare
+  tbl text;
+begin
+  foreach tbl in array array['ingredients', 'recipes', 'recipe_lines', 'ref_uom_conversion'] loop
+    execute format('drop trigger if exists tr_%1$s_cost_store_ins on public.%1$I', tbl);
+    execute format('drop trigger if exists tr_%1$s_cost_store_upd on public.%1$I', tbl);
+    execute format('drop trigger if exists tr_%1$s_cost_store_del on public.%1$I', tbl);
+    execute format(
+      'create trigger tr_%1$s_cost_store_ins after insert on public.%1$I '
+      'referencing new table as new_rows '
+      'for each statement execute function public.tr_cost_store_refresh()',
+      tbl
+    );
+    execute format(
+      'create trigger tr_%1$s_cost_store_upd after update on public.%1$I '
+      'referencing old table as old_rows new table as new_rows '
+      'for each statement execute function public.tr_cost_store_refresh()',
+      tbl
+    );
+    execute format(
+      'create trigger tr_%1$s_cost_store_del after delete on public.%1$I '
+      'referencing old table as old_rows '
+      'for each statement execute function public.tr_cost_store_refresh()',
+      tbl
+    );
+  end loop;
+end $$;
+
+-- 4) Backfill
+select public.refresh_all_recipe_costs();
+
+-- 5) Cost views read the store (same columns as V007; every nesting level costed)
+create or replace view public.recipe_line_costs (
+  tenant_id,
+  recipe_line_id,
+  recipe_id,
+  ingredient_id,
+  qty,
+  qty_uom,
+  line_cost
+) as
+select s.tenant_id,
+  s.recipe_line_id,
+  s.recipe_id,
+  s.ingredient_id,
+  s.qty,
+  s.qty_uom,
+  s.line_cost
+from public.recipe_line_cost_store s;
+
+create or replace view public.prep_costs (
+  tenant_id,
+  recipe_id,
+  recipe_code,
+  name,
+  yield_qty,
+  yield_uom,
+  total_cost,
+  conversion_factor,
+  base_uom,
+  unit_cost
+) as
+select s.tenant_id,
+  s.recipe_id,
+  s.recipe_code,
+  s.name,
+  s.yield_qty,
+  s.yield_uom,
+  s.total_cost,
+  s.conversion_factor,
+  s.base_uom,
+  s.unit_cost
+from public.recipe_cost_store s
+where s.recipe_type = 'prep'
+  and s.status = 'Active';
+
+create or replace view public.recipe_summary (
+  tenant_id,
+  recipe_id,
+  recipe_code,
+  name,
+  status,
+  price,
+  total_cost,
+  cost_pct,
+  margin
+) as
+select s.tenant_id,
+  s.recipe_id,
+  s.recipe_code,
+  s.name,
+  s.status,
+  s.price,
+  s.total_cost,
+  s.cost_pct,
+  s.margin
+from public.recipe_cost_store s
+where s.recipe_type = 'service'
+  and s.status = 'Active';
+
+alter view public.recipe_line_costs set (security_invoker = true);
+alter view public.prep_costs set (security_invoker = true);
+alter view public.recipe_summary set (security_invoker = true);
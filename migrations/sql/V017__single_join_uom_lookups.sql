@@ -0,0 +1,236 @@
+-- ============================================
+-- V017: Resolve UOM conversions with one join per lookup
+--       recipe_line_costs_base evaluated the same correlated
+--       (select factor from ref_uom_conversion ...) subquery up to three times
+--       per line (exists + factor); refresh_recipe_costs ran one scalar subplan
+--       per line and per recipe. Both now join ref_uom_conversion once per
+--       conversion and compute the factor in a lateral, so the planner can
+--       hash/merge join instead of running per-row SubPlans.
+--       Output columns and values are unchanged. recipe_line_costs and
+--       prep_costs are thin views over the V016 store and need no change.
+--       Benchmark: scripts/bench_cost_views.py (EXPLAIN ANALYZE before/after).
+-- Rollback: re-run the V007 definition of recipe_line_costs_base (+ V012
+--           security_invoker) and the V016 definition of refresh_recipe_costs.
+-- ============================================
+
+-- 1) Ingredient-only line costs
+create or replace view public.recipe_line_costs_base (
+  tenant_id,
+  recipe_line_id,
+  recipe_id,
+  ingredient_id,
+  qty,
+  qty_uom,
+  package_qty,
+  package_uom,
+  package_cost,
+  yield_pct,
+  line_cost
+) as
+select rl.tenant_id,
+  rl.id as recipe_line_id,
+  rl.recipe_id,
+  rl.ingredient_id,
+  rl.qty,
+  rl.qty_uom,
+  i.package_qty,
+  i.package_uom,
+  i.package_cost,
+  i.yield_pct,
+  case
+    when i.id is not null
+    and i.package_qty > 0
+    and f.factor is not null then (rl.qty * f.factor / (i.yield_pct / 100.0)) * (i.package_cost / i.package_qty)
+    else 0
+  end as line_cost
+from public.recipe_lines rl
+  left join public.ingredients i on i.id = rl.ingredient_id
+  and i.tenant_id = rl.tenant_id
+  and i.deleted_at is null
+  left join public.ref_uom_conversion cu on cu.from_uom = rl.qty_uom
+  and cu.to_uom = i.package_uom
+  cross join lateral (
+    select case
+        when rl.qty_uom = i.package_uom then 1.0
+        else cu.factor
+      end as factor
+  ) f
+where rl.deleted_at is null;
+
+alter view public.recipe_line_costs_base set (security_invoker = true);
+
+-- 2) Store refresh (same results as V016)
+create or replace function public.refresh_recipe_costs(p_tenant uuid, p_recipe_ids uuid[])
+returns void
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_pending uuid[];
+  v_ready uuid[];
+begin
+  with recursive up (id) as (
+    select unnest(p_recipe_ids)
+    union
+    select rl.recipe_id
+    from public.recipe_lines rl
+      join up on up.id = rl.ingredient_id
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+  )
+  select array_agg(id) into v_pending from up where id is not null;
+  if v_pending is null then
+    return;
+  end if;
+
+  delete from public.recipe_line_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+  delete from public.recipe_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+
+  select array_agg(r.id) into v_pending
+  from public.recipes r
+  where r.tenant_id = p_tenant
+    and r.deleted_at is null
+    and r.id = any(v_pending);
+
+  while coalesce(cardinality(v_pending), 0) > 0 loop
+    select array_agg(p.id) into v_ready
+    from unnest(v_pending) as p(id)
+    where not exists (
+      select 1
+      from public.recipe_lines rl
+      where rl.tenant_id = p_tenant
+        and rl.deleted_at is null
+        and rl.recipe_id = p.id
+        and rl.ingredient_id = any(v_pending)
+    );
+    if v_ready is null then
+      raise exception 'Recipe dependency cycle involving: %', array_to_string(v_pending, ', ')
+        using errcode = 'check_violation';
+    end if;
+
+    insert into public.recipe_line_cost_store (
+      tenant_id, recipe_line_id, recipe_id, ingredient_id, qty, qty_uom, line_cost
+    )
+    select rl.tenant_id,
+      rl.id,
+      rl.recipe_id,
+      rl.ingredient_id,
+      rl.qty,
+      rl.qty_uom,
+      coalesce(
+        -- ingredient path
+        case
+          when i.package_qty > 0 and i.yield_pct <> 0 then
+            rl.qty * f.ing / (i.yield_pct / 100.0) * (i.package_cost / i.package_qty)
+        end,
+        -- prep path
+        rl.qty * f.prep * p.unit_cost,
+        0
+      )
+    from public.recipe_lines rl
+      left join public.ingredients i on i.id = rl.ingredient_id
+        and i.tenant_id = rl.tenant_id
+        and i.deleted_at is null
+      left join public.recipe_cost_store p on p.recipe_id = rl.ingredient_id
+        and p.tenant_id = rl.tenant_id
+        and p.recipe_type = 'prep'
+      left join public.ref_uom_conversion ci on ci.from_uom = rl.qty_uom
+        and ci.to_uom = i.package_uom
+      left join public.ref_uom_conversion cp on cp.from_uom = rl.qty_uom
+        and cp.to_uom = p.base_uom
+      cross join lateral (
+        select case when rl.qty_uom = i.package_uom then 1.0 else ci.factor end as ing,
+          case when rl.qty_uom = p.base_uom then 1.0 else cp.factor end as prep
+      ) f
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.recipe_id = any(v_ready);
+
+    insert into public.recipe_cost_store (
+      tenant_id, recipe_id, recipe_code, name, recipe_type, status, price, yield_qty,
+      yield_uom, level, total_cost, base_uom, conversion_factor, unit_cost, cost_pct, margin
+    )
+    select r.tenant_id,
+      r.id,
+      r.recipe_code,
+      r.name,
+      r.recipe_type,
+      r.status,
+      r.price,
+      r.yield_qty,
+      r.yield_uom,
+      lv.level,
+      t.total_cost,
+      case when r.recipe_type = 'prep' then coalesce(b.base_uom, r.yield_uom) end,
+      cf.factor,
+      case
+        when r.recipe_type = 'prep' and r.status = 'Active' and r.yield_qty * cf.factor > 0
+          then t.total_cost / (r.yield_qty * cf.factor)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(t.total_cost / r.price * 100.0, 2)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(r.price - t.total_cost, 2)
+      end
+    from public.recipes r
+      cross join lateral (
+        select coalesce(sum(s.line_cost), 0) as total_cost
+        from public.recipe_line_cost_store s
+        where s.tenant_id = r.tenant_id and s.recipe_id = r.id
+      ) t
+      cross join lateral (
+        select coalesce(max(sub.level + 1), 0) as level
+        from public.recipe_lines rl
+          join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+            and sub.tenant_id = rl.tenant_id
+        where rl.tenant_id = r.tenant_id
+          and rl.deleted_at is null
+          and rl.recipe_id = r.id
+      ) lv
+      -- Smallest ingredient base UOM, else smallest base UOM of a costed sub-prep
+      cross join lateral (
+        select coalesce(
+          (
+            select min(i.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.ingredients i on i.id = rl.ingredient_id
+                and i.tenant_id = rl.tenant_id
+                and i.deleted_at is null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          ),
+          (
+            select min(sub.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+                and sub.tenant_id = rl.tenant_id
+                and sub.recipe_type = 'prep'
+                and sub.unit_cost is not null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          )
+        ) as base_uom
+      ) b
+      left join public.ref_uom_conversion cy on cy.from_uom = r.yield_uom
+        and cy.to_uom = b.base_uom
+      cross join lateral (
+        select case
+          when r.recipe_type is distinct from 'prep' or b.base_uom is null then null
+          when r.yield_uom = b.base_uom then 1.0
+          else cy.factor
+        end as factor
+      ) cf
+    where r.tenant_id = p_tenant
+      and r.id = any(v_ready);
+
+    v_pending := array(select unnest(v_pending) except select unnest(v_ready));
+  end loop;
+end $$;
@@ -0,0 +1,416 @@
+-- ============================================
+-- V018: Transitive UOM conversion closure
+--       ref_uom_conversion_closure holds every pair reachable by chaining
+--       ref_uom_conversion rows (kg->g + g->oz gives kg->oz), with the number
+--       of hops. Path rules match utils/uom.py: a direct row wins, then the
+--       fewest hops, then the path whose last intermediate UOM sorts first.
+--       The conversion trigger from V016 rebuilds it before re-costing, so a
+--       save on the UOM Conversions page refreshes it automatically.
+--       Cost views, missing_uom_conversions and refresh_recipe_costs join the
+--       closure (identity pairs stay implicit: equal UOMs convert at 1.0).
+-- Rollback: re-run the V017 refresh_recipe_costs and recipe_line_costs_base,
+--           the V007 ingredient_costs and missing_uom_conversions, the V016
+--           tr_cost_store_refresh, then select refresh_all_recipe_costs();
+--           drop function public.refresh_uom_conversion_closure();
+--           drop table public.ref_uom_conversion_closure;
+-- ============================================
+
+-- 1) Closure table (global, like ref_uom_conversion)
+create table if not exists public.ref_uom_conversion_closure (
+  from_uom text not null,
+  to_uom text not null,
+  factor numeric not null,
+  hops integer not null,
+  primary key (from_uom, to_uom)
+);
+
+alter table public.ref_uom_conversion_closure enable row level security;
+drop policy if exists p_uom_closure_select_public on public.ref_uom_conversion_closure;
+create policy p_uom_closure_select_public on public.ref_uom_conversion_closure for
+select to anon,
+  authenticated using (true);
+
+-- 2) Rebuild: direct rows, then one hop longer per pass until nothing new is reachable
+create or replace function public.refresh_uom_conversion_closure()
+returns void
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_hops integer := 1;
+  v_added integer;
+begin
+  delete from public.ref_uom_conversion_closure;
+
+  insert into public.ref_uom_conversion_closure (from_uom, to_uom, factor, hops)
+  select c.from_uom, c.to_uom, c.factor, 1
+  from public.ref_uom_conversion c
+  where c.from_uom <> c.to_uom;
+
+  loop
+    insert into public.ref_uom_conversion_closure (from_uom, to_uom, factor, hops)
+    select distinct on (k.from_uom, d.to_uom) k.from_uom, d.to_uom, k.factor * d.factor, v_hops + 1
+    from public.ref_uom_conversion_closure k
+      join public.ref_uom_conversion d on d.from_uom = k.to_uom
+    where k.from_uom <> d.to_uom
+      and not exists (
+        select 1
+        from public.ref_uom_conversion_closure x
+        where x.from_uom = k.from_uom
+          and x.to_uom = d.to_uom
+      )
+    order by k.from_uom, d.to_uom, k.to_uom collate "C";
+    get diagnostics v_added = row_count;
+    exit when v_added = 0;
+    v_hops := v_hops + 1;
+  end loop;
+end $$;
+
+select public.refresh_uom_conversion_closure();
+
+-- 3) Conversion writes rebuild the closure before re-costing
+create or replace function public.tr_cost_store_refresh()
+returns trigger
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_key text := case tg_table_name when 'recipe_lines' then 'recipe_id' else 'id' end;
+  v_changed text;
+  t record;
+begin
+  -- Conversions are global and rarely edited: rebuild the closure, re-cost everything
+  if tg_table_name = 'ref_uom_conversion' then
+    perform public.refresh_uom_conversion_closure();
+    perform public.refresh_all_recipe_costs();
+    return null;
+  end if;
+
+  v_changed := case tg_op
+    when 'INSERT' then format('select tenant_id, %I as id from new_rows', v_key)
+    when 'DELETE' then format('select tenant_id, %I as id from old_rows', v_key)
+    else format(
+      'select tenant_id, %1$I as id from new_rows union select tenant_id, %1$I from old_rows',
+      v_key
+    )
+  end;
+  -- An ingredient change re-costs the recipes with a line using it
+  if tg_table_name = 'ingredients' then
+    v_changed := 'select rl.tenant_id, rl.recipe_id as id from (' || v_changed || ') c '
+      || 'join public.recipe_lines rl on rl.tenant_id = c.tenant_id '
+      || 'and rl.ingredient_id = c.id and rl.deleted_at is null';
+  end if;
+
+  for t in execute
+    'select tenant_id, array_agg(distinct id) as ids from (' || v_changed || ') c '
+    || 'where tenant_id is not null group by tenant_id'
+  loop
+    perform public.refresh_recipe_costs(t.tenant_id, t.ids);
+  end loop;
+  return null;
+end $$;
+
+-- 4) Views join the closure (same columns as before)
+create or replace view public.ingredient_costs (
+  tenant_id,
+  ingredient_id,
+  ingredient_code,
+  name,
+  package_qty,
+  package_uom,
+  base_uom,
+  package_cost,
+  yield_pct,
+  package_qty_net,
+  conversion_factor,
+  package_qty_net_base_unit,
+  unit_cost
+) as
+select i.tenant_id,
+  i.id as ingredient_id,
+  i.ingredient_code,
+  i.name,
+  i.package_qty,
+  i.package_uom,
+  i.base_uom,
+  i.package_cost,
+  i.yield_pct,
+  (i.package_qty * (i.yield_pct / 100.0)) as package_qty_net,
+  case
+    when i.package_uom = i.base_uom then 1.0
+    else c.factor
+  end as conversion_factor,
+  case
+    when i.package_uom = i.base_uom then (i.package_qty * (i.yield_pct / 100.0))
+    when c.factor is not null then (i.package_qty * (i.yield_pct / 100.0)) * c.factor
+    else null
+  end as package_qty_net_base_unit,
+  case
+    when i.package_uom = i.base_uom
+    and (i.package_qty * (i.yield_pct / 100.0)) > 0 then i.package_cost / (i.package_qty * (i.yield_pct / 100.0))
+    when c.factor is not null
+    and (
+      (i.package_qty * (i.yield_pct / 100.0)) * c.factor
+    ) > 0 then i.package_cost / (
+      (i.package_qty * (i.yield_pct / 100.0)) * c.factor
+    )
+    else null
+  end as unit_cost
+from public.ingredients i
+  left join public.ref_uom_conversion_closure c on i.package_uom = c.from_uom
+  and i.base_uom = c.to_uom
+where i.deleted_at is null;
+create or replace view public.recipe_line_costs_base (
+  tenant_id,
+  recipe_line_id,
+  recipe_id,
+  ingredient_id,
+  qty,
+  qty_uom,
+  package_qty,
+  package_uom,
+  package_cost,
+  yield_pct,
+  line_cost
+) as
+select rl.tenant_id,
+  rl.id as recipe_line_id,
+  rl.recipe_id,
+  rl.ingredient_id,
+  rl.qty,
+  rl.qty_uom,
+  i.package_qty,
+  i.package_uom,
+  i.package_cost,
+  i.yield_pct,
+  case
+    when i.id is not null
+    and i.package_qty > 0
+    and f.factor is not null then (rl.qty * f.factor / (i.yield_pct / 100.0)) * (i.package_cost / i.package_qty)
+    else 0
+  end as line_cost
+from public.recipe_lines rl
+  left join public.ingredients i on i.id = rl.ingredient_id
+  and i.tenant_id = rl.tenant_id
+  and i.deleted_at is null
+  left join public.ref_uom_conversion_closure cu on cu.from_uom = rl.qty_uom
+  and cu.to_uom = i.package_uom
+  cross join lateral (
+    select case
+        when rl.qty_uom = i.package_uom then 1.0
+        else cu.factor
+      end as factor
+  ) f
+where rl.deleted_at is null;
+
+-- Lines whose UOM cannot reach the package UOM, even through chained conversions
+create or replace view public.missing_uom_conversions (
+  tenant_id,
+  recipe_line_id,
+  recipe,
+  ingredient,
+  qty_uom,
+  package_uom
+) as
+select rl.tenant_id,
+  rl.id as recipe_line_id,
+  r.name as recipe,
+  i.name as ingredient,
+  rl.qty_uom,
+  i.package_uom
+from public.recipe_lines rl
+  join public.recipes r on r.id = rl.recipe_id
+  and r.tenant_id = rl.tenant_id
+  and r.deleted_at is null
+  join public.ingredients i on i.id = rl.ingredient_id
+  and i.tenant_id = rl.tenant_id
+  and i.deleted_at is null
+  left join public.ref_uom_conversion_closure c on rl.qty_uom = c.from_uom
+  and i.package_uom = c.to_uom
+where rl.deleted_at is null
+  and rl.qty_uom <> i.package_uom
+  and c.from_uom is null;
+
+alter view public.ingredient_costs set (security_invoker = true);
+alter view public.recipe_line_costs_base set (security_invoker = true);
+alter view public.missing_uom_conversions set (security_invoker = true);
+
+-- 5) Store refresh (as V017, through the closure)
+create or replace function public.refresh_recipe_costs(p_tenant uuid, p_recipe_ids uuid[])
+returns void
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_pending uuid[];
+  v_ready uuid[];
+begin
+  with recursive up (id) as (
+    select unnest(p_recipe_ids)
+    union
+    select rl.recipe_id
+    from public.recipe_lines rl
+      join up on up.id = rl.ingredient_id
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+  )
+  select array_agg(id) into v_pending from up where id is not null;
+  if v_pending is null then
+    return;
+  end if;
+
+  delete from public.recipe_line_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+  delete from public.recipe_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+
+  select array_agg(r.id) into v_pending
+  from public.recipes r
+  where r.tenant_id = p_tenant
+    and r.deleted_at is null
+    and r.id = any(v_pending);
+
+  while coalesce(cardinality(v_pending), 0) > 0 loop
+    select array_agg(p.id) into v_ready
+    from unnest(v_pending) as p(id)
+    where not exists (
+      select 1
+      from public.recipe_lines rl
+      where rl.tenant_id = p_tenant
+        and rl.deleted_at is null
+        and rl.recipe_id = p.id
+        and rl.ingredient_id = any(v_pending)
+    );
+    if v_ready is null then
+      raise exception 'Recipe dependency cycle involving: %', array_to_string(v_pending, ', ')
+        using errcode = 'check_violation';
+    end if;
+
+    insert into public.recipe_line_cost_store (
+      tenant_id, recipe_line_id, recipe_id, ingredient_id, qty, qty_uom, line_cost
+    )
+    select rl.tenant_id,
+      rl.id,
+      rl.recipe_id,
+      rl.ingredient_id,
+      rl.qty,
+      rl.qty_uom,
+      coalesce(
+        -- ingredient path
+        case
+          when i.package_qty > 0 and i.yield_pct <> 0 then
+            rl.qty * f.ing / (i.yield_pct / 100.0) * (i.package_cost / i.package_qty)
+        end,
+        -- prep path
+        rl.qty * f.prep * p.unit_cost,
+        0
+      )
+    from public.recipe_lines rl
+      left join public.ingredients i on i.id = rl.ingredient_id
+        and i.tenant_id = rl.tenant_id
+        and i.deleted_at is null
+      left join public.recipe_cost_store p on p.recipe_id = rl.ingredient_id
+        and p.tenant_id = rl.tenant_id
+        and p.recipe_type = 'prep'
+      left join public.ref_uom_conversion_closure ci on ci.from_uom = rl.qty_uom
+        and ci.to_uom = i.package_uom
+      left join public.ref_uom_conversion_closure cp on cp.from_uom = rl.qty_uom
+        and cp.to_uom = p.base_uom
+      cross join lateral (
+        select case when rl.qty_uom = i.package_uom then 1.0 else ci.factor end as ing,
+          case when rl.qty_uom = p.base_uom then 1.0 else cp.factor end as prep
+      ) f
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.recipe_id = any(v_ready);
+
+    insert into public.recipe_cost_store (
+      tenant_id, recipe_id, recipe_code, name, recipe_type, status, price, yield_qty,
+      yield_uom, level, total_cost, base_uom, conversion_factor, unit_cost, cost_pct, margin
+    )
+    select r.tenant_id,
+      r.id,
+      r.recipe_code,
+      r.name,
+      r.recipe_type,
+      r.status,
+      r.price,
+      r.yield_qty,
+      r.yield_uom,
+      lv.level,
+      t.total_cost,
+      case when r.recipe_type = 'prep' then coalesce(b.base_uom, r.yield_uom) end,
+      cf.factor,
+      case
+        when r.recipe_type = 'prep' and r.status = 'Active' and r.yield_qty * cf.factor > 0
+          then t.total_cost / (r.yield_qty * cf.factor)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(t.total_cost / r.price * 100.0, 2)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(r.price - t.total_cost, 2)
+      end
+    from public.recipes r
+      cross join lateral (
+        select coalesce(sum(s.line_cost), 0) as total_cost
+        from public.recipe_line_cost_store s
+        where s.tenant_id = r.tenant_id and s.recipe_id = r.id
+      ) t
+      cross join lateral (
+        select coalesce(max(sub.level + 1), 0) as level
+        from public.recipe_lines rl
+          join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+            and sub.tenant_id = rl.tenant_id
+        where rl.tenant_id = r.tenant_id
+          and rl.deleted_at is null
+          and rl.recipe_id = r.id
+      ) lv
+      -- Smallest ingredient base UOM, else smallest base UOM of a costed sub-prep
+      cross join lateral (
+        select coalesce(
+          (
+            select min(i.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.ingredients i on i.id = rl.ingredient_id
+                and i.tenant_id = rl.tenant_id
+                and i.deleted_at is null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          ),
+          (
+            select min(sub.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+                and sub.tenant_id = rl.tenant_id
+                and sub.recipe_type = 'prep'
+                and sub.unit_cost is not null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          )
+        ) as base_uom
+      ) b
+      left join public.ref_uom_conversion_closure cy on cy.from_uom = r.yield_uom
+        and cy.to_uom = b.base_uom
+      cross join lateral (
+        select case
+          when r.recipe_type is distinct from 'prep' or b.base_uom is null then null
+          when r.yield_uom = b.base_uom then 1.0
+          else cy.factor
+        end as factor
+      ) cf
+    where r.tenant_id = p_tenant
+      and r.id = any(v_ready);
+
+    v_pending := array(select unnest(v_pending) except select unnest(v_ready));
+  end loop;
+end $$;
+
+select public.refresh_all_recipe_costs();
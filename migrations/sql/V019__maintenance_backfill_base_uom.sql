@@ -0,0 +1,70 @@
+-- ============================================
+-- V019: Set-based maintenance: backfill ingredients.base_uom
+--       Settings "Run Maintenance" fetched every ingredient and sent one UPDATE
+--       per row over REST. maintenance_backfill_base_uom does it in one
+--       UPDATE ... FROM for the tenant's live ingredients that have no base_uom:
+--         - package_uom each/unit (any case)  -> 'unit'
+--         - package_uom g/ml (any case)       -> itself
+--         - otherwise the g/ml target reachable from package_uom in
+--           ref_uom_conversion_closure (V018): fewest hops, then g before ml
+--       Returns the number of rows changed; p_dry_run => count only, nothing written.
+--       Runs as the caller (RLS applies). Future maintenance routines follow the
+--       same shape: maintenance_<task>(p_tenant, p_dry_run) returns integer.
+-- Rollback: drop function if exists public.maintenance_backfill_base_uom(uuid, boolean);
+--           drop function if exists public.maintenance_inferred_base_uom(uuid);
+-- ============================================
+
+-- Ingredients the backfill would change, with the inferred base UOM
+create or replace function public.maintenance_inferred_base_uom(p_tenant uuid)
+returns table (ingredient_id uuid, base_uom text)
+language sql
+stable
+set search_path = public, pg_temp
+as $$
+  select i.id,
+    case
+      when lower(i.package_uom) in ('each', 'unit') then 'unit'
+      when lower(i.package_uom) in ('g', 'ml') then lower(i.package_uom)
+      else c.to_uom
+    end
+  from public.ingredients i
+    left join lateral (
+      select cc.to_uom
+      from public.ref_uom_conversion_closure cc
+      where cc.from_uom = i.package_uom
+        and cc.to_uom in ('g', 'ml')
+      order by cc.hops, cc.to_uom
+      limit 1
+    ) c on true
+  where i.tenant_id = p_tenant
+    and i.deleted_at is null
+    and i.base_uom is null
+    and (lower(i.package_uom) in ('each', 'unit', 'g', 'ml') or c.to_uom is not null);
+$$;
+
+create or replace function public.maintenance_backfill_base_uom(
+  p_tenant uuid,
+  p_dry_run boolean default false
+)
+returns integer
+language plpgsql
+set search_path = public, pg_temp
+as $$
+declare
+  v_count integer;
+begin
+  if p_dry_run then
+    select count(*) into v_count from public.maintenance_inferred_base_uom(p_tenant);
+    return v_count;
+  end if;
+
+  update public.ingredients i
+  set base_uom = x.base_uom
+  from public.maintenance_inferred_base_uom(p_tenant) x
+  where i.id = x.ingredient_id
+    and i.tenant_id = p_tenant
+    and i.base_uom is null;
+  get diagnostics v_count = row_count;
+  return v_count;
+end;
+$$;
@@ -0,0 +1,149 @@
+-- ============================================
+-- V020: Statement-level cross-tenant guards
+--       The V008 guards are BEFORE ... FOR EACH ROW triggers issuing up to three
+--       single-row lookups per written row; a 50k-row import of recipe lines
+--       pays 150k index probes one function call at a time. These replacements
+--       are AFTER ... FOR EACH STATEMENT triggers over the transition table
+--       (REFERENCING NEW TABLE): one set-based join per statement, raising on the
+--       first offending row with the same message as before (row id in DETAIL).
+--
+--       Same guarantees as V008:
+--         recipe_lines: tenant matches the parent recipe, the ingredient, or
+--                       (when ingredient_id is not an ingredient) the prep recipe
+--         sales:        tenant matches the recipe
+--         ingredients:  tenant matches category_id / storage_type_id
+--       Unknown references still pass (FKs / app logic own those), and the
+--       statement still fails as a whole.
+--
+--       Transition tables need one trigger per event, so each table gets
+--       tr_<table>_check_tenant_{ins,upd}. Same-event AFTER triggers fire in name
+--       order, so "check_tenant" runs before "cost_store" (V016) and a rejected
+--       batch never pays for a cost refresh.
+--       The V008 row-level functions are kept (unused) for rollback.
+-- Rollback: drop the six tr_*_check_tenant_* triggers and the three *_stmt()
+--           functions, then recreate the V008 row-level triggers:
+--   create trigger tr_recipe_lines_tenant_guard before insert or update on public.recipe_lines
+--     for each row execute function public.enforce_same_tenant_recipe_lines();
+--   create trigger tr_sales_tenant_guard before insert or update on public.sales
+--     for each row execute function public.enforce_same_tenant_sales();
+--   create trigger tr_ingredients_tenant_guard before insert or update on public.ingredients
+--     for each row execute function public.enforce_same_tenant_ingredient_refs();
+-- ============================================
+
+-- 1) recipe_lines: parent recipe, ingredient, or prep recipe used as ingredient
+create or replace function public.enforce_same_tenant_recipe_lines_stmt()
+returns trigger
+language plpgsql
+set search_path = public, pg_temp
+as $$
+declare
+  v_id uuid;
+  v_problem text;
+begin
+  select n.id,
+    case
+      when p.tenant_id is not null and n.tenant_id is distinct from p.tenant_id
+        then 'Cross-tenant reference (parent recipe)'
+      when i.tenant_id is not null and n.tenant_id is distinct from i.tenant_id
+        then 'Cross-tenant reference (ingredient)'
+      else 'Cross-tenant reference (prep recipe)'
+    end
+  into v_id, v_problem
+  from new_rows n
+    left join public.recipes p on p.id = n.recipe_id
+    left join public.ingredients i on i.id = n.ingredient_id
+    left join public.recipes pr
+      on i.id is null and pr.id = n.ingredient_id and pr.recipe_type = 'prep'
+  where (p.tenant_id is not null and n.tenant_id is distinct from p.tenant_id)
+     or (i.tenant_id is not null and n.tenant_id is distinct from i.tenant_id)
+     or (pr.tenant_id is not null and n.tenant_id is distinct from pr.tenant_id)
+  limit 1;
+
+  if found then
+    raise exception '%', v_problem using detail = format('recipe_lines.id = %s', v_id);
+  end if;
+  return null;
+end $$;
+
+-- 2) sales: recipe
+create or replace function public.enforce_same_tenant_sales_stmt()
+returns trigger
+language plpgsql
+set search_path = public, pg_temp
+as $$
+declare
+  v_id uuid;
+begin
+  select n.id into v_id
+  from new_rows n
+    join public.recipes r on r.id = n.recipe_id
+  where n.tenant_id is distinct from r.tenant_id
+  limit 1;
+
+  if found then
+    raise exception 'Cross-tenant reference in sales'
+      using detail = format('sales.id = %s', v_id);
+  end if;
+  return null;
+end $$;
+
+-- 3) ingredients: category and storage type
+create or replace function public.enforce_same_tenant_ingredient_refs_stmt()
+returns trigger
+language plpgsql
+set search_path = public, pg_temp
+as $$
+declare
+  v_id uuid;
+  v_problem text;
+begin
+  select n.id,
+    case
+      when c.tenant_id is not null and n.tenant_id is distinct from c.tenant_id
+        then 'Cross-tenant reference: ingredient.category_id'
+      else 'Cross-tenant reference: ingredient.storage_type_id'
+    end
+  into v_id, v_problem
+  from new_rows n
+    left join public.ref_ingredient_categories c on c.id = n.category_id
+    left join public.ref_storage_type s on s.id = n.storage_type_id
+  where (c.tenant_id is not null and n.tenant_id is distinct from c.tenant_id)
+     or (s.tenant_id is not null and n.tenant_id is distinct from s.tenant_id)
+  limit 1;
+
+  if found then
+    raise exception '%', v_problem using detail = format('ingredients.id = %s', v_id);
+  end if;
+  return null;
+end $$;
+
+-- 4) Swap the triggers
+drop trigger if exists tr_recipe_lines_tenant_guard on public.recipe_lines;
+drop trigger if exists tr_sales_tenant_guard on public.sales;
+drop trigger if exists tr_ingredients_tenant_guard on public.ingredients;
+
+do $$
+declare
+  t record;
+begin
+  for t in
+    select * from (values
+      ('recipe_lines', 'enforce_same_tenant_recipe_lines_stmt'),
+      ('sales', 'enforce_same_tenant_sales_stmt'),
+      ('ingredients', 'enforce_same_tenant_ingredient_refs_stmt')
+    ) v (tbl, fn)
+  loop
+    execute format('drop trigger if exists %I on public.%I', 'tr_' || t.tbl || '_check_tenant_ins', t.tbl);
+    execute format('drop trigger if exists %I on public.%I', 'tr_' || t.tbl || '_check_tenant_upd', t.tbl);
+    execute format(
+      'create trigger %I after insert on public.%I referencing new table as new_rows '
+      'for each statement execute function public.%I()',
+      'tr_' || t.tbl || '_check_tenant_ins', t.tbl, t.fn
+    );
+    execute format(
+      'create trigger %I after update on public.%I referencing new table as new_rows '
+      'for each statement execute function public.%I()',
+      'tr_' || t.tbl || '_check_tenant_upd', t.tbl, t.fn
+    );
+  end loop;
+end $$;
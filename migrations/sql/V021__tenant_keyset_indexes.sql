@@ -0,0 +1,23 @@
+-- ============================================
+-- V021: (tenant_id, id) indexes for keyset-paged reads
+--       tenant_db iter_rows/select_all page with
+--         tenant_id = $t and id > $last order by id limit $n
+--       These composite indexes make each page an index range scan, so page k
+--       costs the same as page 1. With only (tenant_id) or (id) indexes,
+--       Postgres has to sort or filter the tenant's rows again for every page.
+--       The single-column idx_<table>_tenant indexes are now redundant prefixes
+--       and are dropped.
+-- Rollback: drop index if exists public.ix_<table>_tenant_id_id;
+--           create index if not exists idx_<table>_tenant on public.<table> (tenant_id);
+--           for ingredients, recipes, recipe_lines and sales.
+-- ============================================
+
+create index if not exists ix_ingredients_tenant_id_id on public.ingredients (tenant_id, id);
+create index if not exists ix_recipes_tenant_id_id on public.recipes (tenant_id, id);
+create index if not exists ix_recipe_lines_tenant_id_id on public.recipe_lines (tenant_id, id);
+create index if not exists ix_sales_tenant_id_id on public.sales (tenant_id, id);
+
+drop index if exists public.idx_ingredients_tenant;
+drop index if exists public.idx_recipes_tenant;
+drop index if exists public.idx_recipe_lines_tenant;
+drop index if exists public.idx_sales_tenant;
@@ -0,0 +1,99 @@
+-- ============================================
+-- V022: Views behind the server-side paged grids
+--       The Ingredients and Recipes grids (components/paged_grid.py) fetch
+--       one page at a time and sort and filter in Postgres. That only works
+--       if every grid column, looked-up names and costs included, is a column
+--       of the relation being paged. These views are those relations: live
+--       rows only, one row per ingredient / recipe, same values the pages
+--       computed in Python before.
+--       The (tenant_id, name) indexes serve the default order (name) with a
+--       range, so a page is an index scan plus limit.
+-- Rollback: drop view if exists public.ingredient_grid, public.recipe_grid;
+--           drop index if exists public.ix_ingredients_tenant_name,
+--                                 public.ix_recipes_tenant_name;
+-- ============================================
+
+create or replace view public.ingredient_grid (
+  tenant_id,
+  id,
+  ingredient_code,
+  name,
+  ingredient_type,
+  status,
+  category_id,
+  storage_type_id,
+  package_qty,
+  package_uom,
+  base_uom,
+  package_cost,
+  yield_pct,
+  category,
+  storage_type,
+  unit_cost
+) as
+select i.tenant_id,
+  i.id,
+  i.ingredient_code,
+  i.name,
+  i.ingredient_type,
+  i.status,
+  i.category_id,
+  i.storage_type_id,
+  i.package_qty,
+  i.package_uom,
+  i.base_uom,
+  i.package_cost,
+  i.yield_pct,
+  c.name,
+  s.name,
+  ic.unit_cost
+from public.ingredients i
+  left join public.ref_ingredient_categories c on c.id = i.category_id
+    and c.tenant_id = i.tenant_id
+  left join public.ref_storage_type s on s.id = i.storage_type_id
+    and s.tenant_id = i.tenant_id
+  left join public.ingredient_costs ic on ic.ingredient_id = i.id
+    and ic.tenant_id = i.tenant_id
+where i.deleted_at is null;
+
+-- Costs only for active service recipes (recipe_summary), as the Recipes page shows them
+create or replace view public.recipe_grid (
+  tenant_id,
+  id,
+  recipe_code,
+  name,
+  status,
+  recipe_type,
+  recipe_category,
+  yield_qty,
+  yield_uom,
+  price,
+  total_cost,
+  cost_pct,
+  margin
+) as
+select r.tenant_id,
+  r.id,
+  r.recipe_code,
+  r.name,
+  r.status,
+  r.recipe_type,
+  r.recipe_category,
+  r.yield_qty,
+  r.yield_uom,
+  r.price,
+  rs.total_cost,
+  case when r.price > 0 then round(rs.total_cost / r.price * 100.0, 1) end,
+  round(r.price - rs.total_cost, 2)
+from public.recipes r
+  left join public.recipe_summary rs on rs.recipe_id = r.id
+    and rs.tenant_id = r.tenant_id
+where r.deleted_at is null;
+
+alter view public.ingredient_grid set (security_invoker = true);
+alter view public.recipe_grid set (security_invoker = true);
+
+create index if not exists ix_ingredients_tenant_name on public.ingredients (tenant_id, name)
+  where deleted_at is null;
+create index if not exists ix_recipes_tenant_name on public.recipes (tenant_id, name)
+  where deleted_at is null;
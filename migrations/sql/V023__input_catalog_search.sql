@@ -0,0 +1,210 @@
+-- ============================================
+-- V023: Type-ahead search over input_catalog
+--       The Recipe Editor line form used to receive the whole catalog (every
+--       active ingredient and prep recipe) in get_recipe_editor_bundle and
+--       offer it as one selectbox. It now asks search_input_catalog for the
+--       top matches of what the user typed:
+--         - code equal to the query, then name prefix, then fuzzy
+--           (pg_trgm word similarity), then label order;
+--         - substring (ilike) and code-prefix matches always qualify, so
+--           short queries still find rows.
+--       Trigram GIN indexes on (tenant_id, name, code) per table, live rows
+--       only. btree_gin puts tenant_id into the same index, so a search reads
+--       one tenant's postings instead of filtering every tenant's matches.
+--       The bundle no longer carries 'catalog'; the editor passes its
+--       blocked_recipe_ids as p_exclude.
+-- Rollback: drop function if exists public.search_input_catalog(uuid, text, uuid[], integer);
+--           drop index if exists public.ix_ingredients_search, public.ix_recipes_search;
+--           re-run V015 to restore the bundle's 'catalog'.
+-- ============================================
+
+create extension if not exists pg_trgm with schema extensions;
+create extension if not exists btree_gin with schema extensions;
+
+create index if not exists ix_ingredients_search on public.ingredients using gin (
+  tenant_id,
+  name extensions.gin_trgm_ops,
+  ingredient_code extensions.gin_trgm_ops
+)
+  where deleted_at is null;
+create index if not exists ix_recipes_search on public.recipes using gin (
+  tenant_id,
+  name extensions.gin_trgm_ops,
+  recipe_code extensions.gin_trgm_ops
+)
+  where deleted_at is null;
+
+create or replace function public.search_input_catalog(
+  p_tenant uuid,
+  p_query text,
+  p_exclude uuid[] default '{}',
+  p_limit integer default 20
+)
+returns table (
+  id uuid,
+  code text,
+  name text,
+  source text,
+  label text,
+  unit_cost numeric
+)
+language plpgsql
+stable
+set search_path = public, extensions, pg_temp
+-- <% defaults to 0.6, too strict for a half-typed word
+set pg_trgm.word_similarity_threshold = 0.3
+as $$
+#variable_conflict use_column
+declare
+  q text := btrim(coalesce(p_query, ''));
+  -- the typed text is literal: escape LIKE's own wildcards
+  pattern text := replace(replace(replace(q, '\', '\\'), '%', '\%'), '_', '\_');
+  n integer := least(greatest(coalesce(p_limit, 20), 1), 100);
+begin
+  return query
+  with hits as (
+    select ic.id, ic.code, ic.name, ic.source,
+      coalesce(ic.name, '') || ' – ' || coalesce(ic.code, '') as label,
+      case
+        when q = '' then 0
+        when lower(ic.code) = lower(q) then 3
+        when ic.name ilike pattern || '%' then 2
+        when ic.code ilike pattern || '%' then 1
+        else 0
+      end as rank,
+      case when q = '' then 0 else word_similarity(q, ic.name) end as score
+    from public.input_catalog ic
+    where ic.tenant_id = p_tenant
+      and ic.id <> all (coalesce(p_exclude, '{}'))
+      and (
+        q = ''
+        or ic.name ilike '%' || pattern || '%'
+        or ic.code ilike pattern || '%'
+        or q <% ic.name
+      )
+  ),
+  top as (
+    select h.*
+    from hits h
+    order by h.rank desc, h.score desc, lower(h.label) collate "C", h.id
+    limit n
+  )
+  -- Unit costs for the page only, same semantics as get_unit_costs_for_inputs(ids)
+  select t.id, t.code, t.name, t.source, t.label,
+    case t.source
+      when 'ingredient' then (
+        select case when i.package_qty > 0 then i.package_cost / i.package_qty end
+        from public.ingredients i
+        where i.tenant_id = p_tenant
+          and i.id = t.id
+      )
+      else (
+        select pc.unit_cost
+        from public.prep_costs pc
+        where pc.tenant_id = p_tenant
+          and pc.recipe_id = t.id
+      )
+    end
+  from top t
+  order by t.rank desc, t.score desc, lower(t.label) collate "C", t.id;
+end
+$$;
+
+-- The line form searches instead of receiving the catalog (see V015 for the rest)
+create or replace function public.get_recipe_editor_bundle(p_tenant uuid, p_recipe_id uuid)
+returns jsonb
+language sql
+stable
+set search_path = public, pg_temp
+as $$
+  with recursive
+  recipe as (
+    select r.id, r.name, r.recipe_code, r.recipe_type, r.status, r.price, r.yield_qty, r.yield_uom
+    from public.recipes r
+    where r.tenant_id = p_tenant
+      and r.id = p_recipe_id
+      and r.deleted_at is null
+  ),
+  active_recipes as (
+    select r.id
+    from public.recipes r
+    where r.tenant_id = p_tenant
+      and r.status = 'Active'
+      and r.deleted_at is null
+  ),
+  -- Recipes that (directly or indirectly) use this recipe; picking them as inputs
+  -- would create a cycle.
+  ancestors (recipe_id) as (
+    select rl.recipe_id
+    from public.recipe_lines rl
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.ingredient_id = p_recipe_id
+      and rl.ingredient_id in (select id from active_recipes)
+    union
+    select rl.recipe_id
+    from public.recipe_lines rl
+      join ancestors a on a.recipe_id = rl.ingredient_id
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.ingredient_id in (select id from active_recipes)
+  ),
+  blocked as (
+    select recipe_id as id from ancestors
+    union
+    select p_recipe_id
+  ),
+  -- Same semantics as get_unit_costs_for_inputs(ids)
+  unit_costs as (
+    select i.id,
+      case when i.package_qty > 0 then i.package_cost / i.package_qty else null end as unit_cost
+    from public.ingredients i
+    where i.tenant_id = p_tenant
+    union all
+    select pc.recipe_id as id, pc.unit_cost
+    from public.prep_costs pc
+    where pc.tenant_id = p_tenant
+  ),
+  catalog as (
+    select ic.id, ic.code, ic.name, ic.source,
+      coalesce(ic.name, '') || ' – ' || coalesce(ic.code, '') as label
+    from public.input_catalog ic
+    where ic.tenant_id = p_tenant
+  ),
+  lines as (
+    select rlc.recipe_line_id, rlc.ingredient_id, rlc.qty, rlc.qty_uom, rlc.line_cost,
+      rl.note, c.label, uc.unit_cost, rl.updated_at
+    from public.recipe_line_costs rlc
+      join public.recipe_lines rl on rl.id = rlc.recipe_line_id
+      left join catalog c on c.id = rlc.ingredient_id
+      left join unit_costs uc on uc.id = rlc.ingredient_id
+    where rlc.tenant_id = p_tenant
+      and rlc.recipe_id = p_recipe_id
+  ),
+  uoms as (
+    select from_uom as uom from public.ref_uom_conversion where from_uom is not null
+    union
+    select to_uom from public.ref_uom_conversion where to_uom is not null
+  )
+  select jsonb_build_object(
+    'recipe', (select to_jsonb(recipe) from recipe),
+    'summary', (
+      select to_jsonb(rs) from public.recipe_summary rs
+      where rs.tenant_id = p_tenant and rs.recipe_id = p_recipe_id
+    ),
+    'prep_costs', (
+      select to_jsonb(pc) from public.prep_costs pc
+      where pc.tenant_id = p_tenant and pc.recipe_id = p_recipe_id
+    ),
+    'lines', coalesce((
+      select jsonb_agg(
+        to_jsonb(l) - 'updated_at'
+        order by l.updated_at, l.recipe_line_id
+      ) from lines l
+    ), '[]'::jsonb),
+    'blocked_recipe_ids', coalesce((select jsonb_agg(id) from blocked), '[]'::jsonb),
+    'uom_options', coalesce((
+      select jsonb_agg(uom order by uom collate "C") from uoms
+    ), '[]'::jsonb)
+  )
+$$;
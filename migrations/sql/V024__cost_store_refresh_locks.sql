@@ -0,0 +1,223 @@
+-- ============================================
+-- V024: Serialize cost store refreshes per tenant
+--       refresh_recipe_costs deletes and re-inserts the store rows of the
+--       recipes it re-costs. Two transactions writing the same tenant's
+--       recipes could run it at once; the second then failed on the
+--       recipe_cost_store / recipe_line_cost_store primary keys, aborting the
+--       user's own edit. Both refresh functions now take a transaction-level
+--       advisory lock per tenant (hashtext(tenant_id::text)) first, so a
+--       concurrent refresh waits for the other to commit and re-reads its rows.
+-- Rollback: re-run the V018 refresh_recipe_costs and the V016
+--           refresh_all_recipe_costs.
+-- ============================================
+
+-- 1) Per-recipe refresh (as V018, locked)
+create or replace function public.refresh_recipe_costs(p_tenant uuid, p_recipe_ids uuid[])
+returns void
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  v_pending uuid[];
+  v_ready uuid[];
+begin
+  -- One refresh per tenant at a time: the delete + re-insert below would otherwise
+  -- race a concurrent refresh of the same recipes into duplicate store keys.
+  -- Held until commit, so the second transaction sees the first one's rows.
+  perform pg_advisory_xact_lock(hashtext(p_tenant::text));
+
+  with recursive up (id) as (
+    select unnest(p_recipe_ids)
+    union
+    select rl.recipe_id
+    from public.recipe_lines rl
+      join up on up.id = rl.ingredient_id
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+  )
+  select array_agg(id) into v_pending from up where id is not null;
+  if v_pending is null then
+    return;
+  end if;
+
+  delete from public.recipe_line_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+  delete from public.recipe_cost_store
+  where tenant_id = p_tenant and recipe_id = any(v_pending);
+
+  select array_agg(r.id) into v_pending
+  from public.recipes r
+  where r.tenant_id = p_tenant
+    and r.deleted_at is null
+    and r.id = any(v_pending);
+
+  while coalesce(cardinality(v_pending), 0) > 0 loop
+    select array_agg(p.id) into v_ready
+    from unnest(v_pending) as p(id)
+    where not exists (
+      select 1
+      from public.recipe_lines rl
+      where rl.tenant_id = p_tenant
+        and rl.deleted_at is null
+        and rl.recipe_id = p.id
+        and rl.ingredient_id = any(v_pending)
+    );
+    if v_ready is null then
+      raise exception 'Recipe dependency cycle involving: %', array_to_string(v_pending, ', ')
+        using errcode = 'check_violation';
+    end if;
+
+    insert into public.recipe_line_cost_store (
+      tenant_id, recipe_line_id, recipe_id, ingredient_id, qty, qty_uom, line_cost
+    )
+    select rl.tenant_id,
+      rl.id,
+      rl.recipe_id,
+      rl.ingredient_id,
+      rl.qty,
+      rl.qty_uom,
+      coalesce(
+        -- ingredient path
+        case
+          when i.package_qty > 0 and i.yield_pct <> 0 then
+            rl.qty * f.ing / (i.yield_pct / 100.0) * (i.package_cost / i.package_qty)
+        end,
+        -- prep path
+        rl.qty * f.prep * p.unit_cost,
+        0
+      )
+    from public.recipe_lines rl
+      left join public.ingredients i on i.id = rl.ingredient_id
+        and i.tenant_id = rl.tenant_id
+        and i.deleted_at is null
+      left join public.recipe_cost_store p on p.recipe_id = rl.ingredient_id
+        and p.tenant_id = rl.tenant_id
+        and p.recipe_type = 'prep'
+      left join public.ref_uom_conversion_closure ci on ci.from_uom = rl.qty_uom
+        and ci.to_uom = i.package_uom
+      left join public.ref_uom_conversion_closure cp on cp.from_uom = rl.qty_uom
+        and cp.to_uom = p.base_uom
+      cross join lateral (
+        select case when rl.qty_uom = i.package_uom then 1.0 else ci.factor end as ing,
+          case when rl.qty_uom = p.base_uom then 1.0 else cp.factor end as prep
+      ) f
+    where rl.tenant_id = p_tenant
+      and rl.deleted_at is null
+      and rl.recipe_id = any(v_ready);
+
+    insert into public.recipe_cost_store (
+      tenant_id, recipe_id, recipe_code, name, recipe_type, status, price, yield_qty,
+      yield_uom, level, total_cost, base_uom, conversion_factor, unit_cost, cost_pct, margin
+    )
+    select r.tenant_id,
+      r.id,
+      r.recipe_code,
+      r.name,
+      r.recipe_type,
+      r.status,
+      r.price,
+      r.yield_qty,
+      r.yield_uom,
+      lv.level,
+      t.total_cost,
+      case when r.recipe_type = 'prep' then coalesce(b.base_uom, r.yield_uom) end,
+      cf.factor,
+      case
+        when r.recipe_type = 'prep' and r.status = 'Active' and r.yield_qty * cf.factor > 0
+          then t.total_cost / (r.yield_qty * cf.factor)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(t.total_cost / r.price * 100.0, 2)
+      end,
+      case
+        when r.recipe_type is distinct from 'prep' and r.price > 0
+          then round(r.price - t.total_cost, 2)
+      end
+    from public.recipes r
+      cross join lateral (
+        select coalesce(sum(s.line_cost), 0) as total_cost
+        from public.recipe_line_cost_store s
+        where s.tenant_id = r.tenant_id and s.recipe_id = r.id
+      ) t
+      cross join lateral (
+        select coalesce(max(sub.level + 1), 0) as level
+        from public.recipe_lines rl
+          join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+            and sub.tenant_id = rl.tenant_id
+        where rl.tenant_id = r.tenant_id
+          and rl.deleted_at is null
+          and rl.recipe_id = r.id
+      ) lv
+      -- Smallest ingredient base UOM, else smallest base UOM of a costed sub-prep
+      cross join lateral (
+        select coalesce(
+          (
+            select min(i.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.ingredients i on i.id = rl.ingredient_id
+                and i.tenant_id = rl.tenant_id
+                and i.deleted_at is null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          ),
+          (
+            select min(sub.base_uom collate "C")
+            from public.recipe_lines rl
+              join public.recipe_cost_store sub on sub.recipe_id = rl.ingredient_id
+                and sub.tenant_id = rl.tenant_id
+                and sub.recipe_type = 'prep'
+                and sub.unit_cost is not null
+            where rl.tenant_id = r.tenant_id
+              and rl.deleted_at is null
+              and rl.recipe_id = r.id
+          )
+        ) as base_uom
+      ) b
+      left join public.ref_uom_conversion_closure cy on cy.from_uom = r.yield_uom
+        and cy.to_uom = b.base_uom
+      cross join lateral (
+        select case
+          when r.recipe_type is distinct from 'prep' or b.base_uom is null then null
+          when r.yield_uom = b.base_uom then 1.0
+          else cy.factor
+        end as factor
+      ) cf
+    where r.tenant_id = p_tenant
+      and r.id = any(v_ready);
+
+    v_pending := array(select unnest(v_pending) except select unnest(v_ready));
+  end loop;
+end $$;
+
+-- 2) Full rebuild: lock every tenant it is about to wipe, in tenant order
+create or replace function public.refresh_all_recipe_costs()
+returns void
+language plpgsql
+security definer
+set search_path = public, pg_temp
+as $$
+declare
+  t record;
+begin
+  perform pg_advisory_xact_lock(hashtext(k.tenant_id::text))
+  from (
+    select tenant_id from public.recipes
+    union
+    select tenant_id from public.recipe_cost_store
+    order by 1
+  ) k;
+
+  delete from public.recipe_line_cost_store;
+  delete from public.recipe_cost_store;
+  for t in
+    select r.tenant_id, array_agg(r.id) as ids
+    from public.recipes r
+    where r.deleted_at is null
+    group by r.tenant_id
+  loop
+    perform public.refresh_recipe_costs(t.tenant_id, t.ids);
+  end loop;
+end $$;
@@ -0,0 +1,22 @@
+-- ============================================
+-- V025: Keep the cost store refresh functions off the public API
+--       refresh_recipe_costs, refresh_all_recipe_costs (V016) and
+--       refresh_uom_conversion_closure (V018) are security definer and kept
+--       the default EXECUTE grant to PUBLIC, so any anon / authenticated
+--       caller could run them over PostgREST RPC: for any p_tenant, or
+--       re-costing every tenant. They are only meant for the store triggers
+--       (security definer, so they run as the function owner) and for
+--       maintenance (migrations / psql as the owner, or service_role).
+-- Rollback: grant execute on the three functions to public, anon, authenticated;
+-- ============================================
+
+revoke execute on function public.refresh_recipe_costs(uuid, uuid[])
+  from public, anon, authenticated;
+revoke execute on function public.refresh_all_recipe_costs()
+  from public, anon, authenticated;
+revoke execute on function public.refresh_uom_conversion_closure()
+  from public, anon, authenticated;
+
+grant execute on function public.refresh_recipe_costs(uuid, uuid[]) to service_role;
+grant execute on function public.refresh_all_recipe_costs() to service_role;
+grant execute on function public.refresh_uom_conversion_closure() to service_role;
@@ -5,6 +5,7 @@ from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 from components.active_client_badge import render as client_badge
 from utils import tenant_db as db
 from utils.auth import require_auth
+from utils.cache import WRITE_AWARE_TTL, cache_by_tenant
 from utils.env import env_label, is_prod
 from utils.tenant_state import get_active_tenant, set_active_tenant
 
@@ -91,7 +92,7 @@ div[role='radiogroup'] > label:has(input:checked) div {
 
 
 # ---------- data ----------
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, shared=True, reads=("tenants",))
 def load_all_clients_df() -> pd.DataFrame:
     r = (
         db.table("tenants")
@@ -146,7 +147,6 @@ if mode == "🔁 Switch client":
             if chosen_id and chosen_id != cur_tid:
                 set_active_tenant(chosen_id)
                 st.success(f"Loaded: {chosen_name}")
-                st.cache_data.clear()
                 st.rerun()
             else:
                 st.info("That client is already loaded.")
@@ -271,7 +271,7 @@ if mode == "🛠️ Manage clients":
                     if saved_id:
                         st.session_state["_clients_focus_id"] = saved_id
 
-                    st.cache_data.clear()
+                    # tenant_db writes above already evicted cached tenant reads
                     st.rerun()
 
         if sel_row.get("id"):
@@ -1,8 +1,11 @@
 import pandas as pd
 import streamlit as st
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
+from st_aggrid import GridOptionsBuilder, GridUpdateMode
 
+import components.grid_formatters as fmt
+from components import export_button, paged_grid
 from components.active_client_badge import render as client_badge
+from utils import exports, fragments
 from utils import tenant_db as db
 from utils.auth import require_auth
 from utils.env import env_label, is_prod
@@ -21,49 +24,17 @@ st.title("🥦 Ingredients")
 
 
 # ---------- Data loaders ----------
-def fetch_ingredients_df() -> pd.DataFrame:
-    res = (
-        db.table("ingredients")
-        .select(
-            "id,ingredient_code,name,ingredient_type,status,"
-            "category_id,storage_type_id,"
-            "package_qty,package_uom,base_uom,package_cost,yield_pct"
-        )
-        .order("name")
-        .execute()
-    )
-    rows = res.data or []
-    df = pd.DataFrame(rows)
-
-    # Ensure expected columns exist even if empty (prevents KeyError)
-    expected = [
-        "id",
-        "ingredient_code",
-        "name",
-        "ingredient_type",
-        "status",
-        "category_id",
-        "storage_type_id",
-        "package_qty",
-        "package_uom",
-        "base_uom",
-        "package_cost",
-        "yield_pct",
-    ]
-    for c in expected:
-        if c not in df.columns:
-            df[c] = None
-    return df
-
-
-def fetch_cost_lookup() -> dict:
-    res = db.table("ingredient_costs").select("ingredient_code,unit_cost").execute()
-    return {r["ingredient_code"]: r["unit_cost"] for r in (res.data or [])}
+INGREDIENT_COLUMNS = (
+    "id,ingredient_code,name,ingredient_type,status,"
+    "category_id,storage_type_id,"
+    "package_qty,package_uom,base_uom,package_cost,yield_pct"
+)
 
 
 def fetch_uoms() -> list[str]:
-    # Global reference table; fine to read via db.table() (no tenant filter applied)
-    res = db.table("ref_uom_conversion").select("from_uom").execute()
+    # Global reference table; fine to read via db.table() (no tenant filter applied).
+    # Same columns as fetch_base_uom_map, so the page reads the table once (rerun memo).
+    res = db.table("ref_uom_conversion").select("from_uom, to_uom").execute()
     return sorted(set(r["from_uom"] for r in (res.data or [])))
 
 
@@ -83,23 +54,12 @@ def fetch_base_uom_map() -> dict:
     return {r["from_uom"]: r["to_uom"] for r in (res.data or []) if r["to_uom"] in ["g", "ml"]}
 
 
-# ---------- Fetch ----------
-uom_options = fetch_uoms()
-categories = fetch_categories()
-storage_types = fetch_storage_types()
-category_lu = {c["id"]: c["name"] for c in categories}
-storage_lu = {s["id"]: s["name"] for s in storage_types}
-category_rev = {v: k for k, v in category_lu.items()}
-base_uom_map = fetch_base_uom_map()
-cost_lu = fetch_cost_lookup()
+# ---------- Fragments ----------
+# Grid, export and sidebar form rerun on their own (utils.fragments); a save reruns
+# only the fragments that read what it wrote.
+SELECTED_INGREDIENT = "ingredients_selected_code"  # grid selection, read by the form
 
-df = fetch_ingredients_df()
-df["category"] = df["category_id"].map(category_lu)
-df["storage_type"] = df["storage_type_id"].map(storage_lu)
-df["unit_cost"] = df["ingredient_code"].map(cost_lu)
-
-# ---------- Display table ----------
-column_order = [
+GRID_COLUMNS = [
     "name",
     "ingredient_code",
     "ingredient_type",
@@ -113,73 +73,97 @@ column_order = [
     "unit_cost",
     "base_uom",
 ]
-display_df = df[column_order if all(c in df.columns for c in column_order) else df.columns].copy()
-
-gb = GridOptionsBuilder.from_dataframe(display_df)
-grid_height = 600 if len(display_df) > 10 else None
-gb.configure_default_column(editable=False, filter=True, sortable=True)
-gb.configure_selection("single", use_checkbox=False)
 
-# Pretty formatting
-if "package_cost" in display_df:
-    display_df["package_cost"] = display_df["package_cost"].apply(
-        lambda x: f"${x: .2f}" if pd.notnull(x) else ""
-    )
-if "yield_pct" in display_df:
-    display_df["yield_pct"] = display_df["yield_pct"].apply(
-        lambda x: f"{x: .1f}%" if pd.notnull(x) else ""
-    )
-if "unit_cost" in display_df:
-    display_df["unit_cost"] = display_df["unit_cost"].apply(
-        lambda x: f"${x: .5f}" if pd.notnull(x) else ""
-    )
 
-for col in ["package_qty", "package_cost", "yield_pct", "unit_cost"]:
-    if col in display_df.columns:
+def configure_grid(gb: GridOptionsBuilder) -> None:
+    gb.configure_selection("single", use_checkbox=False)
+    for col in ["package_qty", "package_cost", "yield_pct", "unit_cost"]:
         gb.configure_column(col, cellStyle={"textAlign": "right"})
+    # Pretty formatting, in the browser (values stay numeric)
+    gb.configure_column("package_cost", valueFormatter=fmt.currency(2))
+    gb.configure_column("yield_pct", valueFormatter=fmt.percent(1))
+    gb.configure_column("unit_cost", valueFormatter=fmt.currency(5))
+
+
+# One page at a time from the ingredient_grid view (V022): names and unit costs
+# are columns there, so every column sorts and filters in Postgres
+@fragments.fragment("ingredients_grid", reads=("ingredient_grid",))
+def ingredients_grid() -> None:
+    grid = paged_grid.render(
+        "ingredient_grid",
+        GRID_COLUMNS,
+        key="ingredient_grid",
+        configure=configure_grid,
+        update_mode=GridUpdateMode.SELECTION_CHANGED,
+        fit_columns_on_grid_load=True,
+    )
 
-grid_options = gb.build()
-grid_response = AgGrid(
-    display_df,
-    gridOptions=grid_options,
-    update_mode=GridUpdateMode.SELECTION_CHANGED,
-    fit_columns_on_grid_load=True,
-    height=grid_height,
-    allow_unsafe_jscode=True,
-)
-
-# ---------- CSV export ----------
-st.markdown("### 📤 Export Ingredients")
-export_df = display_df.copy()
-for col in ["package_qty", "package_cost", "yield_pct", "unit_cost"]:
-    if col in export_df.columns:
-        export_df[col] = export_df[col].astype(str)
-st.download_button(
-    label="Download Ingredients as CSV",
-    data=export_df.to_csv(index=False),
-    file_name="ingredients_export.csv",
-    mime="text/csv",
-)
-
-# ---------- Selection handling ----------
-selected_row = grid_response["selected_rows"]
-edit_data = None
-if selected_row is not None:
+    # ---------- Selection handling ----------
+    selected_row = grid.response["selected_rows"]
+    sel_code = None
     if isinstance(selected_row, pd.DataFrame) and not selected_row.empty:
         sel_code = selected_row.iloc[0].get("ingredient_code")
     elif isinstance(selected_row, list) and len(selected_row) > 0:
         sel_code = selected_row[0].get("ingredient_code")
-    else:
-        sel_code = None
-    if sel_code:
-        match = df[df["ingredient_code"] == sel_code]
-        if not match.empty:
-            edit_data = match.iloc[0].to_dict()
+    if st.session_state.get(SELECTED_INGREDIENT) != sel_code:
+        st.session_state[SELECTED_INGREDIENT] = sel_code
+        fragments.rerun("ingredient_form")
+
+
+@exports.register("ingredients_grid", reads=("ingredient_grid",))
+def export_frames():
+    # Name order, one page at a time; the keyset needs a unique key, hence id
+    for frame in exports.relation_frames(
+        "ingredient_grid", ", ".join(GRID_COLUMNS), key=("name", "id")
+    ):
+        yield frame.reindex(columns=GRID_COLUMNS)
+
+
+@fragments.fragment("ingredients_export", reads=())
+def ingredients_export() -> None:
+    # Nothing is read until "Prepare export" is clicked (utils.exports)
+    st.markdown("### 📤 Export Ingredients")
+    export_button.render(
+        "ingredients_grid",
+        label="Download Ingredients as CSV",
+        file_name="ingredients_export.csv",
+    )
+
+
+def fetch_edit_data(code) -> dict | None:
+    """The selected ingredient's row (None: add mode)."""
+    if not code:
+        return None
+    res = (
+        db.table("ingredients")
+        .select(INGREDIENT_COLUMNS)
+        .eq("ingredient_code", code)
+        .limit(1)
+        .execute()
+    )
+    if not res.data:
+        return None
+    # Unset numbers fall back to the form defaults
+    return {k: v for k, v in res.data[0].items() if v is not None}
 
-edit_mode = edit_data is not None
 
 # ---------- Sidebar form ----------
-with st.sidebar:
+@fragments.fragment(
+    "ingredient_form",
+    reads=("ingredients", "ref_uom_conversion", "ref_ingredient_categories", "ref_storage_type"),
+)
+def ingredient_form() -> None:
+    uom_options, categories, storage_types, base_uom_map = db.gather(
+        fetch_uoms,
+        fetch_categories,
+        fetch_storage_types,
+        fetch_base_uom_map,
+    )
+    category_lu = {c["id"]: c["name"] for c in categories}
+    storage_lu = {s["id"]: s["name"] for s in storage_types}
+    edit_data = fetch_edit_data(st.session_state.get(SELECTED_INGREDIENT))
+    edit_mode = edit_data is not None
+
     st.subheader("➕ Add or Edit Ingredient")
     with st.form("ingredient_form"):
         name = st.text_input("Name", value=edit_data.get("name", "") if edit_mode else "")
@@ -299,11 +283,11 @@ with st.sidebar:
                 }
                 if edit_mode:
                     db.table("ingredients").update(payload).eq("id", edit_data["id"]).execute()
-                    st.success("Ingredient updated.")
+                    st.toast("Ingredient updated.")
                 else:
                     db.insert("ingredients", payload).execute()
-                    st.success("Ingredient added.")
-                st.rerun()
+                    st.toast("Ingredient added.")
+                fragments.refresh()
 
     if edit_mode:
         cols = st.columns(2)
@@ -312,5 +296,11 @@ with st.sidebar:
         if cols[1].button("Delete"):
             # Soft delete, not status flip
             db.soft_delete("ingredients", id=edit_data["id"]).execute()
-            st.success("Ingredient deleted (soft).")
-            st.rerun()
+            st.toast("Ingredient deleted (soft).")
+            fragments.refresh()
+
+
+ingredients_grid()
+ingredients_export()
+with st.sidebar:
+    ingredient_form()
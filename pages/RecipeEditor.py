@@ -4,10 +4,10 @@ import streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 
 from components.active_client_badge import render as client_badge
+from utils import fragments
 from utils import tenant_db as db
-from utils.cache import cache_by_tenant
+from utils.cache import WRITE_AWARE_TTL, cache_by_tenant
 from utils.env import env_label, is_prod
-from utils.supabase_client import supabase
 
 # Page chrome
 title_suffix = "" if is_prod() else f" — {env_label()}"
@@ -34,110 +34,51 @@ st.title("📝 Recipe Editor")
 # -----------------------------
 
 
-def fetch_recipes_active():
-    res = (
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, reads=("recipes",))
+def _load_recipe_picker():
+    return (
         db.table("recipes")
-        .select("id, name, recipe_code, recipe_type, status")
+        .select("id,name,recipe_code,status,recipe_type")
         .eq("status", "Active")
         .order("name")
         .execute()
+        .data
+        or []
     )
-    return res.data or []
 
 
-def fetch_recipe_core(recipe_id: str) -> dict:
-    """Single base recipe row with name, price, type, yield."""
-    res = (
-        db.table("recipes")
-        .select("name, price, recipe_type, yield_qty, yield_uom")
-        .eq("id", recipe_id)
-        .single()
-        .execute()
-    )
+@cache_by_tenant(
+    ttl=WRITE_AWARE_TTL,
+    reads=("recipes", "recipe_lines", "ingredients", "ref_uom_conversion"),
+)
+def fetch_editor_bundle(recipe_id: str) -> dict:
+    """
+    Everything the editor renders for one recipe, in one round trip
+    (see get_recipe_editor_bundle in V015): recipe core, header KPIs from the
+    V016 cost store (`summary` / `prep_costs`), lines with labels, notes, unit and
+    line costs, blocked (ancestor) recipe ids, UOM options.
+    The input picker searches instead of receiving the catalog (search_inputs).
+    """
+    res = db.rpc("get_recipe_editor_bundle", {"p_recipe_id": recipe_id}).execute()
     return res.data or {}
 
 
-def fetch_input_catalog():
-    # Active ingredients + active prep recipes (backed by input_catalog view)
-    res = db.table("input_catalog").select("*").execute()
-    rows = res.data or []
-    for r in rows:
-        r["label"] = f"{r.get('name','')} – {r.get('code','')}"
-    return rows
+SEARCH_LIMIT = 20  # matches offered per search
 
 
-def fetch_all_recipe_lines_pairs():
-    # For dependency graph (edges among recipes only)
-    res = db.table("recipe_lines").select("recipe_id, ingredient_id").execute()
-    return res.data or []
-
-
-def compute_ancestor_recipes(current_recipe_id, all_lines, all_recipe_ids):
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, reads=("input_catalog", "prep_costs"))
+def search_inputs(query: str, exclude: tuple = (), limit: int = SEARCH_LIMIT) -> list:
     """
-    Ancestors = recipes that (directly or indirectly) use the current recipe.
-    Build reverse edges: used_by[X] = set of recipes that include X.
-    DFS from current_recipe_id following used_by to collect all ancestors.
+    Top `limit` ingredients / prep recipes for `query` (code, name prefix, then fuzzy;
+    see search_input_catalog in V023), with unit costs. An empty query lists the
+    first `limit` by label. `exclude`: ids that must not be offered.
     """
-    used_by = {}
-    for row in all_lines:
-        rid = row["recipe_id"]
-        iid = row["ingredient_id"]
-        if iid in all_recipe_ids:
-            used_by.setdefault(iid, set()).add(rid)
-
-    ancestors = set()
-    stack = [current_recipe_id]
-    while stack:
-        node = stack.pop()
-        for parent in used_by.get(node, set()):
-            if parent not in ancestors:
-                ancestors.add(parent)
-                stack.append(parent)
-    return ancestors
-
-
-def fetch_recipe_summary_row(recipe_id: str):
-    # Might return 0 rows (e.g., for prep recipes)
-    res = db.table("recipe_summary").select("*").eq("recipe_id", recipe_id).execute()
-    rows = res.data or []
-    return rows[0] if rows else None
-
-
-def fetch_prep_costs_row(recipe_id: str):
-    res = db.table("prep_costs").select("*").eq("recipe_id", recipe_id).execute()
-    rows = res.data or []
-    return rows[0] if rows else None
-
-
-def fetch_recipe_line_costs(recipe_id):
-    res = db.table("recipe_line_costs").select("*").eq("recipe_id", recipe_id).execute()
-    return res.data or []
-
-
-def fetch_notes_map(recipe_id):
-    res = db.table("recipe_lines").select("id, note").eq("recipe_id", recipe_id).execute()
-    return {r["id"]: r.get("note") for r in (res.data or [])}
+    params = {"p_query": query, "p_exclude": list(exclude), "p_limit": limit}
+    return db.rpc("search_input_catalog", params).execute().data or []
 
 
-def fetch_uom_options():
-    res = db.table("ref_uom_conversion").select("from_uom, to_uom").execute()
-    rows = res.data or []
-    uoms = set()
-    for r in rows:
-        if r.get("from_uom"):
-            uoms.add(r["from_uom"])
-        if r.get("to_uom"):
-            uoms.add(r["to_uom"])
-    return sorted(uoms)
-
-
-def rpc_unit_cost_map(ids):
-    if not ids:
-        return {}
-    # RPC: get_unit_costs_for_inputs(ids uuid[]) -> (id, unit_cost)
-    res = supabase.rpc("get_unit_costs_for_inputs", {"ids": ids}).execute()
-    rows = res.data or []
-    return {r["id"]: r["unit_cost"] for r in rows if r.get("unit_cost") is not None}
+def _money(x) -> float:
+    return float(x) if pd.notna(x) else 0.0
 
 
 def upsert_recipe_line(edit_mode, recipe_line_id, payload):
@@ -148,184 +89,184 @@ def upsert_recipe_line(edit_mode, recipe_line_id, payload):
         tbl.insert(payload).execute()
 
 
-@cache_by_tenant(ttl=60)
-def _load_recipe_picker():
-    return (
-        db.table("recipes")
-        .select("id,name,recipe_code,status,recipe_type")
-        .eq("recipe_type", "service")
-        .eq("status", "Active")
-        .order("name")
-        .execute()
-        .data
-        or []
-    )
-
-
 # -----------------------------
-# Recipe selection
+# Fragments: each reruns on its own and declares what it reads (utils.fragments).
+# Saving a line reruns the KPI header, line grid and export; the picker and the
+# form keep their state.
 # -----------------------------
 
-recipes = fetch_recipes_active()
-name_to_id = {
-    (f"{r['name']} – {r['recipe_code']}" if r.get("recipe_code") else r["name"]): r["id"]
-    for r in recipes
-}
-options = ["— Select —"] + list(name_to_id.keys())
-selected_name = st.selectbox("Select Recipe", options, index=0)
-recipe_id = name_to_id.get(selected_name)
+SELECTED_LINE = "editor_selected_line"  # grid selection, read by the line form
 
-if not recipe_id:
-    st.info("Select a recipe to view and edit.")
-    st.stop()
 
-core = fetch_recipe_core(recipe_id)
-rtype = core.get("recipe_type", "service")
-rname = core.get("name") or selected_name.replace(" – ", " ")
-price = float(core.get("price") or 0.0)
-yield_qty = core.get("yield_qty")
-yield_uom = core.get("yield_uom")
+def _lines_frame(recipe_id: str) -> pd.DataFrame:
+    df = pd.DataFrame(fetch_editor_bundle(recipe_id).get("lines") or [])
 
-# -----------------------------
-# Header KPIs (service vs prep)
-# -----------------------------
+    # Always have base columns so grid renders even if empty
+    cols = ("recipe_line_id", "ingredient_id", "qty", "qty_uom", "unit_cost", "line_cost")
+    for c in cols + ("label", "note"):
+        if c not in df.columns:
+            df[c] = None
 
-if rtype == "prep":
-    pc = fetch_prep_costs_row(recipe_id) or {}
-    total_cost = float(pc.get("total_cost") or 0.0)
-    base_uom = pc.get("base_uom") or ""
-    unit_cost = float(pc.get("unit_cost") or 0.0)
-
-    c1, c2, c3 = st.columns([2, 2, 2])
-    c1.metric("Total Cost", f"${total_cost:.2f}")
-    c2.metric("Yield", f"{yield_qty or 0:g} {yield_uom or ''}")
-    c3.metric(f"Unit Cost ({base_uom})", f"${unit_cost:.6f}")
-else:
-    srow = fetch_recipe_summary_row(recipe_id) or {}
-    cost = float(srow.get("total_cost") or srow.get("cost") or 0.0)
-    margin = float(srow.get("margin") or srow.get("margin_dollar") or (price - cost))
-    cost_pct = (cost / price) * 100 if price else 0.0
-
-    c1, c2, c3, c4 = st.columns([2, 2, 2, 2])
-    c1.metric("Recipe", rname)
-    c2.metric("Price", f"${price:.2f}")
-    c3.metric("Cost (% of price)", f"{cost_pct:.1f}%")
-    c4.metric("Margin", f"${margin:.2f}")
+    # Labels, notes, unit and line costs come resolved from the bundle (cost store)
+    df["ingredient"] = df["label"].fillna("— missing or inactive —")
+    df["line_cost"] = pd.to_numeric(df["line_cost"], errors="coerce").fillna(0.0)
+    return df
 
-st.divider()
 
-# -----------------------------
-# Load lines + unit costs
-# -----------------------------
+def _display_frame(df: pd.DataFrame) -> pd.DataFrame:
+    display_cols = [
+        "recipe_line_id",
+        "ingredient",
+        "qty",
+        "qty_uom",
+        "unit_cost",
+        "line_cost",
+        "note",
+    ]
+    display_df = df.reindex(columns=[c for c in display_cols if c in df.columns]).copy()
+    for col in ["unit_cost", "line_cost"]:
+        if col in display_df.columns:
+            display_df[col] = pd.to_numeric(display_df[col], errors="coerce").map(
+                lambda x: f"${x:.6f}" if pd.notnull(x) else ""
+            )
+    return display_df
+
+
+def _recipe_name(core: dict, picked_name: str) -> str:
+    return core.get("name") or picked_name.replace(" – ", " ")
+
+
+@fragments.fragment("kpi_header", reads=("recipes", "recipe_summary", "prep_costs"))
+def kpi_header(recipe_id: str, picked_name: str) -> None:
+    bundle = fetch_editor_bundle(recipe_id)
+    core = bundle.get("recipe") or {}
+    rtype = core.get("recipe_type", "service")
+    price = float(core.get("price") or 0.0)
+    yield_qty = core.get("yield_qty")
+    yield_uom = core.get("yield_uom")
+
+    # Costs come from the cost store (all nesting levels), shared with Home/Recipes
+    if rtype == "prep":
+        cost_row = bundle.get("prep_costs") or {}
+        total_cost = _money(cost_row.get("total_cost"))
+        base_uom = cost_row.get("base_uom") or ""
+        unit_cost = _money(cost_row.get("unit_cost"))
+
+        c1, c2, c3 = st.columns([2, 2, 2])
+        c1.metric("Total Cost", f"${total_cost:.2f}")
+        c2.metric("Yield", f"{yield_qty or 0:g} {yield_uom or ''}")
+        c3.metric(f"Unit Cost ({base_uom})", f"${unit_cost:.6f}")
+    else:
+        cost_row = bundle.get("summary") or {}
+        cost = _money(cost_row.get("total_cost"))
+        margin = _money(cost_row.get("margin")) or (price - cost)
+        cost_pct = (cost / price) * 100 if price else 0.0
+
+        c1, c2, c3, c4 = st.columns([2, 2, 2, 2])
+        c1.metric("Recipe", _recipe_name(core, picked_name))
+        c2.metric("Price", f"${price:.2f}")
+        c3.metric("Cost (% of price)", f"{cost_pct:.1f}%")
+        c4.metric("Margin", f"${margin:.2f}")
+
+
+@fragments.fragment("line_grid", reads=("recipe_lines", "recipe_line_costs", "prep_costs"))
+def line_grid(recipe_id: str) -> None:
+    display_df = _display_frame(_lines_frame(recipe_id))
+
+    gb = GridOptionsBuilder.from_dataframe(display_df)
+    gb.configure_default_column(editable=False, filter=True, sortable=True)
+    gb.configure_selection("single", use_checkbox=False)
+    if "recipe_line_id" in display_df.columns:
+        gb.configure_column("recipe_line_id", hide=True)
+    grid_options = gb.build()
+
+    grid_response = AgGrid(
+        display_df,
+        gridOptions=grid_options,
+        update_mode=GridUpdateMode.SELECTION_CHANGED,
+        fit_columns_on_grid_load=True,
+        height=480,
+        allow_unsafe_jscode=True,
+    )
 
-line_rows = fetch_recipe_line_costs(recipe_id)
-df = pd.DataFrame(line_rows)
-
-# Always have base columns so grid renders even if empty
-for c in ("recipe_line_id", "ingredient_id", "qty", "qty_uom", "line_cost"):
-    if c not in df.columns:
-        df[c] = None
-
-notes_map = fetch_notes_map(recipe_id)
-
-# Catalog for labels (ingredients + prep recipes)
-catalog_rows = fetch_input_catalog()
-id_to_label = {r["id"]: r["label"] for r in catalog_rows}
-df["ingredient"] = df["ingredient_id"].map(id_to_label).fillna("— missing or inactive —")
-df["note"] = df["recipe_line_id"].map(notes_map)
-
-# Unit cost for the referenced input (ingredient or prep)
-unit_costs = rpc_unit_cost_map(list({rid for rid in df["ingredient_id"].dropna().unique()}))
-df["unit_cost"] = df["ingredient_id"].map(unit_costs)
-
-# Display table
-display_cols = [
-    "recipe_line_id",
-    "ingredient",
-    "qty",
-    "qty_uom",
-    "unit_cost",
-    "line_cost",
-    "note",
-]
-display_df = df.reindex(columns=[c for c in display_cols if c in df.columns]).copy()
-for col in ["unit_cost", "line_cost"]:
-    if col in display_df.columns:
-        display_df[col] = pd.to_numeric(display_df[col], errors="coerce").map(
-            lambda x: f"${x:.6f}" if pd.notnull(x) else ""
-        )
+    # Robust selection handling (AgGrid may return list or DataFrame)
+    sel = grid_response.get("selected_rows", [])
+    if isinstance(sel, list):
+        sel_df = pd.DataFrame(sel)
+    elif isinstance(sel, pd.DataFrame):
+        sel_df = sel
+    else:
+        sel_df = pd.DataFrame()
+    sel_id = sel_df.iloc[0].get("recipe_line_id") if not sel_df.empty else None
 
-gb = GridOptionsBuilder.from_dataframe(display_df)
-gb.configure_default_column(editable=False, filter=True, sortable=True)
-gb.configure_selection("single", use_checkbox=False)
-if "recipe_line_id" in display_df.columns:
-    gb.configure_column("recipe_line_id", hide=True)
-grid_options = gb.build()
-
-grid_response = AgGrid(
-    display_df,
-    gridOptions=grid_options,
-    update_mode=GridUpdateMode.SELECTION_CHANGED,
-    fit_columns_on_grid_load=True,
-    height=480,
-    allow_unsafe_jscode=True,
-)
+    # The form lives in its own fragment: hand it the selection and rerun it
+    if st.session_state.get(SELECTED_LINE) != sel_id:
+        st.session_state[SELECTED_LINE] = sel_id
+        fragments.rerun("line_form")
 
-# Robust selection handling (AgGrid may return list or DataFrame)
-sel = grid_response.get("selected_rows", [])
-if isinstance(sel, list):
-    sel_df = pd.DataFrame(sel)
-elif isinstance(sel, pd.DataFrame):
-    sel_df = sel
-else:
-    sel_df = pd.DataFrame()
-
-edit_data = None
-if not sel_df.empty:
-    sel_id = sel_df.iloc[0].get("recipe_line_id")
-    match = df[df["recipe_line_id"] == sel_id]
-    if not match.empty:
-        m = match.iloc[0]
-        edit_data = {
-            "recipe_line_id": m.get("recipe_line_id"),
-            "ingredient_id": m.get("ingredient_id"),
-            "qty": float(m.get("qty") or 1.0),
-            "qty_uom": m.get("qty_uom"),
-            "note": notes_map.get(m.get("recipe_line_id"), ""),
-        }
 
-# -----------------------------
-# Sidebar form — Save-only (handles add & update)
-# -----------------------------
+def _edit_data(bundle: dict, recipe_line_id) -> dict | None:
+    if not recipe_line_id:
+        return None
+    m = next(
+        (r for r in bundle.get("lines") or [] if r.get("recipe_line_id") == recipe_line_id), None
+    )
+    if m is None:
+        return None
+    return {
+        "recipe_line_id": m.get("recipe_line_id"),
+        "ingredient_id": m.get("ingredient_id"),
+        "qty": float(m.get("qty") or 1.0),
+        "qty_uom": m.get("qty_uom"),
+        "note": m.get("note") or "",
+        "label": m.get("label") or "(unknown input)",
+        "unit_cost": m.get("unit_cost"),
+    }
+
+
+# Sidebar form — Save-only (handles add & update). The search excludes this recipe and
+# its ancestors, so a saved line changes none of the unit costs shown here.
+@fragments.fragment("line_form", reads=("input_catalog",))
+def line_form(recipe_id: str) -> None:
+    bundle = fetch_editor_bundle(recipe_id)
+    edit_data = _edit_data(bundle, st.session_state.get(SELECTED_LINE))
 
-with st.sidebar:
     st.subheader("➕ Add or Edit Recipe Line")
 
-    # Build dependency guard: exclude current recipe and its ancestors
-    all_lines = fetch_all_recipe_lines_pairs()
-    all_recipe_ids = {r["id"] for r in recipes}
-    ancestors = compute_ancestor_recipes(recipe_id, all_lines, all_recipe_ids)
-    blocked_recipes = ancestors | {recipe_id}
-
-    # Selection options from catalog, excluding blocked recipes
-    filtered_catalog = [
-        r for r in catalog_rows if not (r["source"] == "recipe" and r["id"] in blocked_recipes)
+    # Type-ahead: the server returns the top matches (never this recipe or its ancestors).
+    # Outside the form, so a new query reruns this fragment and refreshes the choices.
+    query = st.text_input(
+        "Search ingredients and prep recipes",
+        key=f"line_search_{recipe_id}",
+        placeholder="Name or code",
+    )
+    matches = search_inputs(query.strip(), tuple(bundle.get("blocked_recipe_ids") or ()))
+
+    # The line being edited keeps its input even when it is not among the matches
+    current = None
+    if edit_data:
+        current = {k: edit_data[k] for k in ("label", "unit_cost")}
+        current["id"] = edit_data["ingredient_id"]
+    choices = ([current] if current else []) + [
+        r for r in matches if not current or r["id"] != current["id"]
     ]
-    filtered_catalog.sort(key=lambda r: r["label"].lower())
+    unit_costs = {r["id"]: r["unit_cost"] for r in choices if r.get("unit_cost") is not None}
 
     label_to_id = {"— Select —": None}
-    for r in filtered_catalog:
+    for r in choices:
         label_to_id[r["label"]] = r["id"]
 
     with st.form("line_form", clear_on_submit=False):
-        default_label = None
-        if edit_data:
-            default_label = id_to_label.get(edit_data["ingredient_id"])
         labels = list(label_to_id.keys())
         selected_label = st.selectbox(
             "Ingredient or Prep Recipe",
             options=labels,
-            index=(labels.index(default_label) if default_label in labels else 0),
+            index=(labels.index(current["label"]) if current else 0),
+            help=(
+                f"Top {SEARCH_LIMIT} matches; refine the search to narrow them down."
+                if len(matches) >= SEARCH_LIMIT
+                else None
+            ),
         )
         ingredient_id = label_to_id.get(selected_label)
 
@@ -336,7 +277,7 @@ with st.sidebar:
             value=(edit_data["qty"] if edit_data else 1.0),
         )
 
-        uom_opts = ["— Select —"] + fetch_uom_options()
+        uom_opts = ["— Select —"] + (bundle.get("uom_options") or [])
         default_uom = edit_data["qty_uom"] if edit_data else None
         qty_uom = st.selectbox(
             "UOM",
@@ -345,9 +286,7 @@ with st.sidebar:
         )
 
         # Display unit cost (server-side)
-        unit_cost_display = (
-            rpc_unit_cost_map([ingredient_id]).get(ingredient_id) if ingredient_id else None
-        )
+        unit_cost_display = unit_costs.get(ingredient_id) if ingredient_id else None
         st.text_input(
             "Unit Cost (base unit)",
             value=(f"{unit_cost_display:.6f}" if unit_cost_display is not None else ""),
@@ -381,15 +320,8 @@ with st.sidebar:
                     (edit_data or {}).get("recipe_line_id"),
                     payload,
                 )
-                st.success("Line saved.")
-                st.rerun()
-
-# -----------------------------
-# CSV Export
-# -----------------------------
-
-st.markdown("### 📥 Export Recipe Lines")
-export_df = display_df.drop(columns=["recipe_line_id"], errors="ignore").copy()
+                st.toast("Line saved.")
+                fragments.refresh()
 
 
 def _strip_money(x):
@@ -399,13 +331,44 @@ def _strip_money(x):
         return x
 
 
-for c in ["unit_cost", "line_cost"]:
-    if c in export_df.columns:
-        export_df[c] = export_df[c].map(_strip_money)
+@fragments.fragment("lines_export", reads=("recipe_lines", "recipe_line_costs", "prep_costs"))
+def lines_export(recipe_id: str, picked_name: str) -> None:
+    st.markdown("### 📥 Export Recipe Lines")
+    display_df = _display_frame(_lines_frame(recipe_id))
+    export_df = display_df.drop(columns=["recipe_line_id"], errors="ignore").copy()
+    for c in ["unit_cost", "line_cost"]:
+        if c in export_df.columns:
+            export_df[c] = export_df[c].map(_strip_money)
+
+    rname = _recipe_name(fetch_editor_bundle(recipe_id).get("recipe") or {}, picked_name)
+    st.download_button(
+        label="Download Lines as CSV",
+        data=export_df.to_csv(index=False),
+        file_name=f"{(rname or 'recipe').replace(' ', '_')}_lines.csv",
+        mime="text/csv",
+    )
+
 
-st.download_button(
-    label="Download Lines as CSV",
-    data=export_df.to_csv(index=False),
-    file_name=f"{(rname or 'recipe').replace(' ', '_')}_lines.csv",
-    mime="text/csv",
-)
+# -----------------------------
+# Recipe selection (a full rerun: every fragment follows the recipe)
+# -----------------------------
+
+recipes = _load_recipe_picker()
+name_to_id = {
+    (f"{r['name']} – {r['recipe_code']}" if r.get("recipe_code") else r["name"]): r["id"]
+    for r in recipes
+}
+options = ["— Select —"] + list(name_to_id.keys())
+selected_name = st.selectbox("Select Recipe", options, index=0)
+recipe_id = name_to_id.get(selected_name)
+
+if not recipe_id:
+    st.info("Select a recipe to view and edit.")
+    st.stop()
+
+kpi_header(recipe_id, selected_name)
+st.divider()
+line_grid(recipe_id)
+with st.sidebar:
+    line_form(recipe_id)
+lines_export(recipe_id, selected_name)
@@ -15,15 +15,27 @@
 #   Implementation prefers DataReturnMode.FILTERED_AND_SORTED when available,
 #   and falls back to FILTERED + manual sortModel apply (from grid_state).
 # + Added WHY comments where behavior isn’t obvious to reduce future head-scratching.
+#
+# 2026-10-18 / Fragments
+# ~ Grid (with filters + export) and sidebar form are fragments (utils.fragments);
+#   a save reruns only the fragments that read recipes instead of st.rerun().
+#
+# 2026-10-18 / Server-side grid + on-demand export
+# ~ Grid pages over the recipe_grid view (components.paged_grid); sort/filter run in Postgres.
+# ~ CSV is built only when "Prepare export" is clicked (utils.exports), still matching
+#   the grid's filters + sort, all pages.
 # ============================================================================
 
 from datetime import datetime
 
 import pandas as pd
 import streamlit as st
-from st_aggrid import AgGrid, DataReturnMode, GridOptionsBuilder, GridUpdateMode, JsCode
+from st_aggrid import GridOptionsBuilder, GridUpdateMode
 
+import components.grid_formatters as fmt
+from components import export_button, paged_grid
 from components.active_client_badge import render as client_badge
+from utils import exports, fragments
 from utils import tenant_db as db
 from utils.env import env_label, is_prod
 
@@ -42,8 +54,9 @@ DEBUG = False  # Flip to True to see sidebar logs during Save
 
 
 def dlog(msg):
+    # Called from the sidebar form fragment; fragments cannot write to st.sidebar themselves
     if DEBUG:
-        st.sidebar.write(f"🛠️ {msg}")
+        st.write(f"🛠️ {msg}")
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -62,97 +75,6 @@ st.title("📘 Recipes")
 # -----------------------------
 # Helpers
 # -----------------------------
-def fetch_recipes_df() -> pd.DataFrame:
-    """Load base recipes using new schema fields."""
-    res = (
-        db.table("recipes")
-        .select(
-            "id, recipe_code, name, status, recipe_type, recipe_category, yield_qty, yield_uom, price"
-        )
-        .order("name")
-        .execute()
-    )
-    df = pd.DataFrame(res.data or [])
-    must_have = [
-        "id",
-        "recipe_code",
-        "name",
-        "status",
-        "recipe_type",
-        "recipe_category",
-        "yield_qty",
-        "yield_uom",
-        "price",
-    ]
-    for c in must_have:
-        if c not in df.columns:
-            df[c] = None
-    if not df.empty:
-        for c in ("yield_qty", "price"):
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    return df
-
-
-def fetch_recipe_summary_map() -> pd.DataFrame:
-    """Pull summary rows (by recipe_id) for cost aggregation (we rely on recipe_id, total_cost)."""
-    res = db.table("recipe_summary").select("recipe_id, total_cost").execute()
-    s = pd.DataFrame(res.data or [])
-    if "total_cost" not in s.columns:
-        s["total_cost"] = None
-    return s
-
-
-def assemble_grid_df(base_df: pd.DataFrame, summary_df: pd.DataFrame) -> pd.DataFrame:
-    """Merge base recipes with summary costs, compute KPIs as numerics."""
-    if base_df.empty:
-        return pd.DataFrame(
-            columns=[
-                "recipe_code",
-                "name",
-                "status",
-                "recipe_type",
-                "recipe_category",
-                "yield_qty",
-                "yield_uom",
-                "price",
-                "total_cost",
-                "cost_pct",
-                "margin",
-            ]
-        )
-    df = base_df.copy()
-    s = summary_df.rename(columns={"recipe_id": "id"}).copy()
-    df = df.merge(s, on="id", how="left")
-
-    def safe_ratio(cost, price):
-        if pd.isna(cost) or pd.isna(price) or price is None or price <= 0:
-            return None
-        return round(float(cost) / float(price) * 100.0, 1)
-
-    def safe_margin(cost, price):
-        if pd.isna(cost) or pd.isna(price):
-            return None
-        return round(float(price) - float(cost), 2)
-
-    df["cost_pct"] = df.apply(lambda r: safe_ratio(r.get("total_cost"), r.get("price")), axis=1)
-    df["margin"] = df.apply(lambda r: safe_margin(r.get("total_cost"), r.get("price")), axis=1)
-
-    ordered = [
-        "recipe_code",
-        "name",
-        "status",
-        "recipe_type",
-        "recipe_category",
-        "yield_qty",
-        "yield_uom",
-        "price",
-        "total_cost",
-        "cost_pct",
-        "margin",
-    ]
-    return df[[c for c in ordered if c in df.columns]]
-
-
 def fetch_uom_options() -> list:
     """Return sorted unique union of from_uom/to_uom from ref_uom_conversion."""
     res = db.table("ref_uom_conversion").select("from_uom, to_uom").execute()
@@ -192,179 +114,149 @@ def build_uom_choices(recipe_type: str | None, current_uom: str | None, all_uoms
 
 
 # -----------------------------
-# Filters (horizontal)
-# -----------------------------
-f1, f2, _ = st.columns([1, 1, 1])
-with f1:
-    status_filter = st.radio(
-        "Status", options=["All", "Active", "Inactive"], index=1, horizontal=True
-    )
-with f2:
-    type_filter = st.radio("Type", options=["All", "service", "prep"], index=0, horizontal=True)
-
-# -----------------------------
-# Fetch & Filter
-# -----------------------------
-base_df = fetch_recipes_df()
-summary_df = fetch_recipe_summary_map()
-
-if status_filter != "All":
-    base_df = base_df[base_df["status"] == status_filter]
-if type_filter != "All":
-    base_df = base_df[base_df["recipe_type"] == type_filter]
-
-grid_source_df = assemble_grid_df(base_df, summary_df)
-display_df = grid_source_df.copy()
-
-# -----------------------------
-# Grid (AgGrid)
+# Fragments (utils.fragments): the grid and the sidebar form rerun on their own.
+# A save reruns the grid (and the form, which reloads the saved row).
 # -----------------------------
-gb = GridOptionsBuilder.from_dataframe(display_df)
-gb.configure_default_column(editable=False, filter=True, sortable=True)
-gb.configure_selection("single", use_checkbox=False)
-
-# Right-align numerics
-for col in ("yield_qty", "price", "total_cost", "cost_pct", "margin"):
-    if col in display_df.columns:
+SELECTED_RECIPE = "recipes_selected_code"  # grid selection, read by the form
+
+GRID_COLUMNS = [
+    "recipe_code",
+    "name",
+    "status",
+    "recipe_type",
+    "recipe_category",
+    "yield_qty",
+    "yield_uom",
+    "price",
+    "total_cost",
+    "cost_pct",
+    "margin",
+]
+
+
+def configure_grid(gb: GridOptionsBuilder) -> None:
+    gb.configure_selection("single", use_checkbox=False)
+
+    # Right-align numerics
+    for col in ("yield_qty", "price", "total_cost", "cost_pct", "margin"):
         gb.configure_column(col, cellStyle={"textAlign": "right"})
 
-# Value formatters (display-only; underlying data remains numeric for export)
-fmt_currency_2 = JsCode(
-    """function(p){ if(p.value==null) return ''; return '$'+Number(p.value).toFixed(2);}"""
-)
-fmt_currency_5 = JsCode(
-    """function(p){ if(p.value==null) return ''; return '$'+Number(p.value).toFixed(5);}"""
-)
-fmt_percent_1 = JsCode(
-    """function(p){ if(p.value==null) return ''; return Number(p.value).toFixed(1)+'%';}"""
-)
-
-if "price" in display_df.columns:
-    gb.configure_column("price", header_name="Price", valueFormatter=fmt_currency_2)
-if "total_cost" in display_df.columns:
-    gb.configure_column("total_cost", header_name="Total Cost", valueFormatter=fmt_currency_5)
-if "cost_pct" in display_df.columns:
-    gb.configure_column("cost_pct", header_name="Cost %", valueFormatter=fmt_percent_1)
-if "margin" in display_df.columns:
-    gb.configure_column("margin", header_name="Margin", valueFormatter=fmt_currency_2)
-
-grid_options = gb.build()
-
-# IMPORTANT: We want export to match the *visible grid* including sort.
-# On newer st-aggrid, DataReturnMode.FILTERED_AND_SORTED is available.
-# On older versions, we fall back to FILTERED and manually apply sortModel.
-try:
-    SNAPSHOT_MODE = DataReturnMode.FILTERED_AND_SORTED  # preferred
-except AttributeError:
-    SNAPSHOT_MODE = DataReturnMode.FILTERED  # fallback
-
-grid_response = AgGrid(
-    display_df,
-    gridOptions=grid_options,
-    data_return_mode=SNAPSHOT_MODE,
-    update_mode=GridUpdateMode.MODEL_CHANGED,
-    fit_columns_on_grid_load=True,
-    height=600,
-    allow_unsafe_jscode=True,
-)
+    # Value formatters (display-only; underlying data remains numeric for export)
+    gb.configure_column("price", header_name="Price", valueFormatter=fmt.currency(2))
+    gb.configure_column("total_cost", header_name="Total Cost", valueFormatter=fmt.currency(5))
+    gb.configure_column("cost_pct", header_name="Cost %", valueFormatter=fmt.percent(1))
+    gb.configure_column("margin", header_name="Margin", valueFormatter=fmt.currency(2))
 
-# -----------------------------
-# Export (mirrors *filters + sort*; column reordering is intentionally ignored)
-# -----------------------------
-st.markdown("### 📤 Export Recipes")
-
-# NOTE: st-aggrid returns data as a list of dicts. We convert to DataFrame.
-export_snapshot = grid_response.get("data", pd.DataFrame())
-if isinstance(export_snapshot, list):
-    export_snapshot = pd.DataFrame(export_snapshot)
-if export_snapshot is None:
-    export_snapshot = pd.DataFrame()
-
-# If we were forced to use FILTERED (older builds), mirror sort via grid_state.sortModel
-if SNAPSHOT_MODE == DataReturnMode.FILTERED and not export_snapshot.empty:
-    grid_state = grid_response.get("grid_state", {}) or {}
-    sort_model = grid_state.get("sortModel") or []
-    if isinstance(sort_model, list) and sort_model:
-        by_cols = []
-        ascending = []
-        for s in sort_model:
-            col_id = s.get("colId") or s.get("col_id")
-            direction = (s.get("sort") or s.get("direction") or "asc").lower()
-            if col_id and col_id in export_snapshot.columns:
-                by_cols.append(col_id)
-                ascending.append(direction == "asc")
-        if by_cols:
-            export_snapshot = export_snapshot.sort_values(
-                by=by_cols, ascending=ascending, kind="mergesort"
-            )
-
-# Build export DF with friendly headers (keep values numeric; formatting is for UI only)
-export_df = export_snapshot.copy()
-rename_map = {
-    "price": "Price",
-    "total_cost": "Total Cost",
-    "cost_pct": "Cost %",
-    "margin": "Margin",
+
+EXPORT_HEADERS = {
     "recipe_code": "Recipe Code",
+    "name": "Name",
+    "status": "Status",
     "recipe_type": "Recipe Type",
     "recipe_category": "Recipe Category",
     "yield_qty": "Yield Quantity",
     "yield_uom": "Yield UOM",
-    "status": "Status",
-    "name": "Name",
+    "price": "Price",
+    "total_cost": "Total Cost",
+    "cost_pct": "Cost %",
+    "margin": "Margin",
 }
-export_df.rename(
-    columns={k: v for k, v in rename_map.items() if k in export_df.columns},
-    inplace=True,
-)
-
-ts = datetime.now().strftime("%Y%m%d-%H%M")
-fname = f"recipes_{status_filter.lower()}_{type_filter.lower()}_{ts}.csv"
-
-is_empty = export_df.empty
-st.download_button(
-    label="⬇️ Download CSV (matches grid)",
-    data=(export_df.to_csv(index=False) if not is_empty else "".encode("utf-8")),
-    file_name=fname,
-    mime="text/csv",
-    disabled=is_empty,
-)
-if is_empty:
-    st.caption("Export is disabled because there are no rows in the current view.")
 
-# -----------------------------
-# Selection → load edit_data for Save-only form
-# -----------------------------
-selected_row = grid_response.get("selected_rows")
-edit_data = None
-if selected_row is not None:
+
+@exports.register("recipes_grid", reads=("recipe_grid",))
+def export_frames(query, filters):
+    # Friendly headers; values stay numeric (formatting is for the UI only)
+    for frame in paged_grid.iter_pages("recipe_grid", GRID_COLUMNS, query, dict(filters)):
+        yield frame.rename(columns=EXPORT_HEADERS)
+
+
+# Filters, grid and export share a fragment: the CSV follows the grid's filters and sort
+@fragments.fragment("recipes_grid", reads=("recipe_grid",))
+def recipes_grid() -> None:
+    # -----------------------------
+    # Filters (horizontal)
+    # -----------------------------
+    f1, f2, _ = st.columns([1, 1, 1])
+    with f1:
+        status_filter = st.radio(
+            "Status", options=["All", "Active", "Inactive"], index=1, horizontal=True
+        )
+    with f2:
+        type_filter = st.radio("Type", options=["All", "service", "prep"], index=0, horizontal=True)
+
+    filters = {}
+    if status_filter != "All":
+        filters["status"] = status_filter
+    if type_filter != "All":
+        filters["recipe_type"] = type_filter
+
+    # -----------------------------
+    # Grid (AgGrid): one page at a time from the recipe_grid view (V022), where costs,
+    # cost % and margin are columns, so sort and filter run in Postgres
+    # -----------------------------
+    grid = paged_grid.render(
+        "recipe_grid",
+        GRID_COLUMNS,
+        key="recipe_grid",
+        filters=filters,
+        configure=configure_grid,
+        update_mode=GridUpdateMode.MODEL_CHANGED,
+        fit_columns_on_grid_load=True,
+    )
+
+    # -----------------------------
+    # Export (mirrors *filters + sort*, all pages; column reordering is intentionally ignored).
+    # Built only on request (utils.exports), for the sort and filters in effect then.
+    # -----------------------------
+    st.markdown("### 📤 Export Recipes")
+    ts = datetime.now().strftime("%Y%m%d-%H%M")
+    export_button.render(
+        "recipes_grid",
+        grid.query,
+        tuple(sorted(grid.filters.items())),
+        label="⬇️ Download CSV (matches grid)",
+        file_name=f"recipes_{status_filter.lower()}_{type_filter.lower()}_{ts}.csv",
+    )
+
+    # -----------------------------
+    # Selection → the form fragment loads edit_data
+    # -----------------------------
+    selected_row = grid.response.get("selected_rows")
+    selected_code = None
     if isinstance(selected_row, pd.DataFrame) and not selected_row.empty:
         selected_code = selected_row.iloc[0].get("recipe_code")
     elif isinstance(selected_row, list) and len(selected_row) > 0:
         selected_code = selected_row[0].get("recipe_code")
-    else:
-        selected_code = None
-
-    if selected_code:
-        dlog(f"Selected row recipe_code={selected_code}")
-        # Reload full row from DB for accurate edit payload
-        orig_res = (
-            db.table("recipes")
-            .select(
-                "id, recipe_code, name, status, recipe_type, recipe_category, yield_qty, yield_uom, price"
-            )
-            .eq("recipe_code", selected_code)
-            .limit(1)
-            .execute()
+    if st.session_state.get(SELECTED_RECIPE) != selected_code:
+        st.session_state[SELECTED_RECIPE] = selected_code
+        fragments.rerun("recipe_form")
+
+
+def load_edit_data(selected_code):
+    """Reload the selected row from the DB for an accurate edit payload (None: add mode)."""
+    if not selected_code:
+        return None
+    dlog(f"Selected row recipe_code={selected_code}")
+    orig_res = (
+        db.table("recipes")
+        .select(
+            "id, recipe_code, name, status, recipe_type, recipe_category, yield_qty, yield_uom, price"
         )
-        if orig_res.data:
-            edit_data = orig_res.data[0]
-edit_mode = edit_data is not None
+        .eq("recipe_code", selected_code)
+        .limit(1)
+        .execute()
+    )
+    return orig_res.data[0] if orig_res.data else None
+
 
 # -----------------------------
 # Sidebar — Recipe Type OUTSIDE the form (reactive; controls UOM & Price disable)
 # -----------------------------
-with st.sidebar:
+@fragments.fragment("recipe_form", reads=("recipes", "ref_uom_conversion"))
+def recipe_form() -> None:
+    edit_data = load_edit_data(st.session_state.get(SELECTED_RECIPE))
+    edit_mode = edit_data is not None
+
     st.subheader("➕ Add or Edit Recipe")
 
     type_options = ["— Select —", "service", "prep"]
@@ -482,12 +374,17 @@ with st.sidebar:
                 try:
                     if edit_mode:
                         db.table("recipes").update(payload).eq("id", edit_data["id"]).execute()
-                        st.success("✅ Recipe updated.")
+                        st.toast("✅ Recipe updated.")
                     else:
                         db.insert("recipes", payload).execute()
-                        st.success("✅ Recipe added.")
-                    # Refresh grid/summary so KPIs & row list are current
-                    st.rerun()
+                        st.toast("✅ Recipe added.")
+                    # Rerun the fragments reading recipes so KPIs & row list are current
+                    fragments.refresh()
                 except Exception as e:
                     st.error(f"Failed to save recipe: {e}")
                     dlog(f"save exception: {e}")
+
+
+recipes_grid()
+with st.sidebar:
+    recipe_form()
@@ -1,12 +1,28 @@
+import io
 from datetime import datetime
+from functools import partial
 
 import pandas as pd
 import streamlit as st
 
+from components import export_button
 from components.active_client_badge import render as client_badge
+from utils import exports, snapshot
 from utils import tenant_db as db
 from utils.auth import require_auth
+from utils.bulk_load import bulk_load
+from utils.db import direct_url_configured, get_engine
 from utils.env import env_label, is_prod
+from utils.importers import (
+    BATCH_ROWS,
+    CHUNK_ROWS,
+    INGREDIENT_REQUIRED,
+    RECIPE_REQUIRED,
+    read_chunks,
+    run_import,
+    validate_ingredients,
+    validate_recipes,
+)
 
 # Page chrome
 title_suffix = "" if is_prod() else f" — {env_label()}"
@@ -23,52 +39,180 @@ st.title("⚙️ Settings")
 
 
 st.header("🔧 Backfill Missing Base UOMs")
+st.caption(
+    "Infers base_uom (g / ml / unit) from package_uom and the UOM conversions "
+    "for ingredients that have none, in one server-side update."
+)
 
 
-def fetch_base_uom_map():
-    res = db.table("ref_uom_conversion").select("from_uom, to_uom").execute()
-    return (
-        {row["from_uom"]: row["to_uom"] for row in res.data if row["to_uom"] in ["g", "ml"]}
-        if res.data
-        else {}
-    )
+def backfill_base_uom(dry_run):
+    """Rows the backfill changes (or would change, with dry_run) for the active tenant."""
+    res = db.rpc("maintenance_backfill_base_uom", {"p_dry_run": dry_run}).execute()
+    return int(res.data or 0)
 
 
+col_check, col_run = st.columns(2)
+if col_check.button("Check"):
+    pending = backfill_base_uom(dry_run=True)
+    st.info(f"{pending} ingredients would get an inferred base_uom.")
+
 # Run only when button clicked
-if st.button("Run Maintenance"):
-    st.info("Fetching ingredients...")
-    res = db.table("ingredients").select("id, package_uom, base_uom").execute()
-    rows = res.data if res.data else []
+if col_run.button("Run Maintenance"):
+    updated = backfill_base_uom(dry_run=False)
+    if updated:
+        db.publish_change("ingredients", db.active_tenant_id())
+        st.success(f"✅ Updated {updated} ingredients with inferred base_uom.")
+    else:
+        st.info("Nothing to update — no ingredient missing base_uom has an inferable one.")
 
-    base_uom_map = fetch_base_uom_map()
-    updates = []
 
-    for row in rows:
-        if row["base_uom"]:
-            continue  # already set
+# === Import Section ===
+PREVIEW_ROWS = 5
+DUPLICATES_SHOWN = 200  # duplicate conflicts listed in the expander
 
-        package_uom = row.get("package_uom", "")
-        norm_uom = package_uom.lower()
 
-        if norm_uom in ["each", "unit"]:
-            inferred = "unit"
-        elif package_uom in base_uom_map:
-            inferred = base_uom_map[package_uom]
-        else:
-            inferred = None
+def fetch_existing(table_name, columns, key):
+    """key -> existing row of `table_name` for the active tenant (keyset-paged read)."""
+    existing = {}
+    for r in db.table(table_name).iter_rows(columns):
+        existing.setdefault(r[key], r)
+    return existing
+
+
+def fetch_existing_ingredients():
+    return fetch_existing(
+        "ingredients", "ingredient_code, name, ingredient_type, package_cost", "ingredient_code"
+    )
+
+
+def preview_upload(uploaded_file, required):
+    """Show the first rows and stop the page if required columns are missing."""
+    try:
+        head = pd.read_csv(uploaded_file, nrows=PREVIEW_ROWS)
+    except Exception as e:
+        st.error(f"❌ Failed to read CSV: {e}")
+        st.stop()
+    uploaded_file.seek(0)
+    head = head.drop(columns=["errors"], errors="ignore")
+
+    st.subheader("👀 Preview")
+    st.dataframe(head, use_container_width=True)
+
+    missing_cols = [col for col in required if col not in head.columns]
+    if missing_cols:
+        st.error(f"❌ Missing required columns: {', '.join(missing_cols)}")
+        st.stop()
 
-        if inferred:
-            updates.append({"id": row["id"], "base_uom": inferred})
 
-    if updates:
-        for u in updates:
-            db.table("ingredients").update({"base_uom": u["base_uom"]}).eq("id", u["id"]).execute()
+def dry_run(uploaded_file, validate, existing, key):
+    """
+    Validate the whole upload chunk by chunk without writing (codes of `existing`,
+    keyed by the `key` column, and of earlier chunks are duplicates).
+    Returns (chunk reports, rejected rows as CSV text, first DUPLICATES_SHOWN duplicates).
+    """
+    rejected_csv, duplicates = io.StringIO(), []
+
+    def keep_rejected(rejected):
+        rejected.to_csv(rejected_csv, index=False, header=rejected_csv.tell() == 0)
+
+    def keep_duplicates(rows):
+        duplicates.extend(rows[: DUPLICATES_SHOWN - len(duplicates)])
+
+    try:
+        reports = list(
+            run_import(
+                read_chunks(uploaded_file),
+                validate,
+                on_rejected=keep_rejected,
+                on_duplicates=keep_duplicates,
+                existing=existing,
+                key=key,
+            )
+        )
+    except Exception as e:
+        st.error(f"❌ Failed to read CSV: {e}")
+        st.stop()
+    uploaded_file.seek(0)
+    return reports, rejected_csv.getvalue(), duplicates
 
-        st.success(f"✅ Updated {len(updates)} ingredients with inferred base_uom.")
+
+def show_summary(reports):
+    st.subheader("📊 Import Summary")
+    st.write(f"✅ Valid rows ready to import: {sum(r.valid for r in reports)}")
+    st.write(f"❌ Rows rejected due to validation: {sum(r.rejected for r in reports)}")
+    st.write(f"⚠️ Rows skipped due to duplicate codes: {sum(r.duplicates for r in reports)}")
+
+
+def chunk_writer(table_name):
+    """
+    (write, batch_rows) for run_import: COPY a whole chunk per transaction when a
+    direct DB URL is configured, else REST inserts of BATCH_ROWS rows. `write`
+    returns the rows written: COPY skips codes imported since the dry run, a REST
+    insert writes the whole batch or fails (None).
+    """
+    if not direct_url_configured():
+
+        def insert(batch):
+            db.insert_many(table_name, batch).execute()
+
+        return insert, BATCH_ROWS
+
+    engine, tenant_id = get_engine(), db.active_tenant_id()
+
+    def write(batch):
+        written = bulk_load(table_name, batch, tenant_id, bind=engine).written
+        db.publish_change(table_name, tenant_id)
+        return written
+
+    return write, CHUNK_ROWS
+
+
+def upload_in_chunks(uploaded_file, table_name, validate, existing, key, label):
+    """
+    Re-read the upload and insert it chunk by chunk, with a progress bar and
+    per-chunk timings. Each batch commits on its own, so a failure keeps (and
+    reports) everything imported before it.
+    """
+    write, batch_rows = chunk_writer(table_name)
+    progress = st.progress(0.0, text=f"Importing {label}...")
+    timings = st.empty()
+    reports, inserted, valid = [], 0, 0
+    try:
+        for report in run_import(
+            read_chunks(uploaded_file),
+            validate,
+            write=write,
+            batch_rows=batch_rows,
+            existing=existing,
+            key=key,
+        ):
+            reports.append(report)
+            inserted += report.inserted
+            valid += report.valid
+            done = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+            progress.progress(done, text=f"Chunk {report.chunk}: {inserted} {label} imported")
+            timings.dataframe(pd.DataFrame(reports), use_container_width=True, hide_index=True)
+    except Exception as e:
+        st.error(f"❌ Import stopped after {inserted} {label} were imported: {e}")
+        return
+    finally:
+        uploaded_file.seek(0)
+
+    failed = reports[-1] if reports and reports[-1].error else None
+    if failed:
+        st.error(
+            f"❌ Insert failed in chunk {failed.chunk}: {failed.error}. "
+            f"{inserted} {label} imported before the failure were kept."
+        )
     else:
-        st.info("Nothing to update — all ingredients already have base_uom.")
+        progress.progress(1.0, text=f"{inserted} {label} imported")
+        st.success(f"🎉 {inserted} {label} successfully imported.")
+        if inserted < valid:
+            st.info(
+                f"ℹ️ {valid - inserted} {label} were skipped: their codes were imported meanwhile."
+            )
+
 
-# === Import Section ===
 st.header("📥 Import Data from CSV")
 object_type = st.selectbox("Select object to import", ["Ingredients", "Recipes"])
 
@@ -85,33 +229,7 @@ if object_type == "Ingredients":
             r["from_uom"]: r["to_uom"] for r in uom_res.data if r["to_uom"] in ["g", "ml"]
         }
 
-        try:
-            df = pd.read_csv(uploaded_file)
-        except Exception as e:
-            st.error(f"❌ Failed to read CSV: {e}")
-            st.stop()
-
-        if "errors" in df.columns:
-            df = df.drop(columns=["errors"])
-
-        st.subheader("👀 Preview")
-        st.dataframe(df.head(), use_container_width=True)
-
-        required_fields = [
-            "ingredient_code",
-            "name",
-            "ingredient_type",
-            "package_qty",
-            "package_uom",
-            "package_cost",
-            "yield_pct",
-            "status",
-            "category",
-        ]
-        missing_cols = [col for col in required_fields if col not in df.columns]
-        if missing_cols:
-            st.error(f"❌ Missing required columns: {', '.join(missing_cols)}")
-            st.stop()
+        preview_upload(uploaded_file, INGREDIENT_REQUIRED)
 
         cat_res = (
             db.table("ref_ingredient_categories")
@@ -120,125 +238,40 @@ if object_type == "Ingredients":
             .execute()
         )
         category_map = {row["name"]: row["id"] for row in cat_res.data}
-        valid_statuses = {"active", "inactive"}
-        valid_types = {"bought", "prepped"}
-
-        inserts, rejected, duplicate_collisions = [], [], []
-        for _, row in df.iterrows():
-            issues = []
-            ingredient_code = str(row["ingredient_code"]).strip()
-            name = str(row["name"]).strip()
-            ingredient_type = str(row["ingredient_type"]).strip().capitalize()
-            package_qty = row["package_qty"]
-            package_uom = str(row["package_uom"]).strip()
-            package_cost = row["package_cost"]
-            yield_pct = row["yield_pct"]
-            status = str(row["status"]).strip().capitalize()
-            category_name = str(row["category"]).strip()
-            base_uom = str(row.get("base_uom", "")).strip().lower() or None
-            category_id = category_map.get(category_name)
-
-            if not ingredient_code or len(ingredient_code) > 100:
-                issues.append("Invalid or missing ingredient_code")
-            if not name or len(name) > 100:
-                issues.append("Invalid or missing name")
-            if ingredient_type.lower() not in valid_types and ingredient_type != "":
-                issues.append("Invalid ingredient_type")
-            if pd.isna(package_qty) or package_qty < 0:
-                issues.append("Invalid package_qty")
-            if not package_uom:
-                issues.append("Missing package_uom")
-            if pd.isna(package_cost) or package_cost < 0:
-                issues.append("Invalid package_cost")
-            if 0 < yield_pct <= 2:
-                yield_pct = round(yield_pct * 100, 6)
-            if pd.isna(yield_pct) or yield_pct <= 0 or yield_pct > 200:
-                issues.append("Invalid yield_pct")
-            if status.lower() not in valid_statuses and status != "":
-                issues.append("Invalid status")
-            if not category_id:
-                issues.append("Category not found")
-
-            # --- 🔁 Infer base_uom if not provided ---
-            if not base_uom:
-                if package_uom.lower() in ["each", "unit"]:
-                    base_uom = "unit"
-                elif package_uom in base_uom_map:
-                    base_uom = base_uom_map[package_uom]
-
-            exists = (
-                db.table("ingredients").select("*").eq("ingredient_code", ingredient_code).execute()
-            )
-            if exists.data:
-                existing_row = exists.data[0]
-                duplicate_collisions.append(
-                    {
-                        "ingredient_code": ingredient_code,
-                        "source": {
-                            "name": name,
-                            "ingredient_type": ingredient_type,
-                            "package_cost": package_cost,
-                        },
-                        "existing": {
-                            "name": existing_row["name"],
-                            "ingredient_type": existing_row["ingredient_type"],
-                            "package_cost": existing_row["package_cost"],
-                        },
-                    }
-                )
-                continue
-
-            if issues:
-                rejected_row = row.to_dict()
-                rejected_row["errors"] = "; ".join(issues)
-                rejected.append(rejected_row)
-            else:
-                inserts.append(
-                    {
-                        "ingredient_code": ingredient_code,
-                        "name": name,
-                        "ingredient_type": (
-                            ingredient_type if ingredient_type.lower() in valid_types else "Bought"
-                        ),
-                        "package_qty": round(package_qty, 6),
-                        "package_uom": package_uom,
-                        "package_cost": round(package_cost, 6),
-                        "yield_pct": round(yield_pct, 6),
-                        "status": (status if status.lower() in valid_statuses else "Active"),
-                        "category_id": category_id,
-                        "base_uom": base_uom,  # ✅ include inferred value (if any)
-                    }
-                )
-
-        st.subheader("📊 Import Summary")
-        st.write(f"✅ Valid rows ready to import: {len(inserts)}")
-        st.write(f"❌ Rows rejected due to validation: {len(rejected)}")
-        st.write(f"⚠️ Rows skipped due to duplicate codes: {len(duplicate_collisions)}")
+        validate = partial(
+            validate_ingredients, category_map=category_map, base_uom_map=base_uom_map
+        )
+        existing = fetch_existing_ingredients()
+        reports, rejected_csv, duplicate_collisions = dry_run(
+            uploaded_file, validate, existing, "ingredient_code"
+        )
+        show_summary(reports)
 
         if duplicate_collisions:
             with st.expander("🔁 View Duplicate Conflicts"):
                 for dup in duplicate_collisions:
                     st.markdown(f"**{dup['ingredient_code']}**")
                     st.markdown(f"- Source : `{dup['source']}`")
-                    st.markdown(f"- In DB  : `{dup['existing']}`")
+                    st.markdown(f"- Kept   : `{dup['existing']}`")
 
-        if rejected:
-            rejected_df = pd.DataFrame(rejected)
-            csv = rejected_df.to_csv(index=False)
+        if rejected_csv:
             st.download_button(
                 label="⬇️ Download Rejected Rows CSV",
-                data=csv,
+                data=rejected_csv,
                 file_name="rejected_ingredients.csv",
                 mime="text/csv",
             )
 
-        if inserts:
+        if any(r.valid for r in reports):
             if st.button("📤 Upload Ingredients to Database"):
-                try:
-                    db.insert("ingredients", inserts).execute()
-                    st.success(f"🎉 {len(inserts)} ingredients successfully imported.")
-                except Exception as e:
-                    st.error(f"❌ Insert failed: {e}")
+                upload_in_chunks(
+                    uploaded_file,
+                    "ingredients",
+                    validate,
+                    existing,
+                    "ingredient_code",
+                    "ingredients",
+                )
 
 elif object_type == "Recipes":
     uploaded_file = st.file_uploader("Upload Recipes CSV", type=["csv"], key="recipes_upload")
@@ -247,141 +280,100 @@ elif object_type == "Recipes":
         uom_res = db.table("ref_uom_conversion").select("from_uom").execute()
         valid_uoms = {r["from_uom"] for r in uom_res.data} if uom_res.data else set()
 
-        try:
-            df = pd.read_csv(uploaded_file)
-        except Exception as e:
-            st.error(f"❌ Failed to read CSV: {e}")
-            st.stop()
-
-        df = df.drop(columns=["errors"], errors="ignore")
-        st.subheader("👀 Preview")
-        st.dataframe(df.head(), use_container_width=True)
-
-        required_fields = ["recipe_code", "name"]
-        missing_cols = [col for col in required_fields if col not in df.columns]
-        if missing_cols:
-            st.error(f"❌ Missing required columns: {', '.join(missing_cols)}")
-            st.stop()
+        preview_upload(uploaded_file, RECIPE_REQUIRED)
 
-        existing_codes = {
-            r["recipe_code"]: r for r in db.table("recipes").select("*").execute().data
-        }
-
-        inserts, rejects = [], []
-
-        for _, row in df.iterrows():
-            issues = []
-            recipe_code = str(row.get("recipe_code", "")).strip()
-            name = str(row.get("name", "")).strip()
-            status = str(row.get("status", "Active")).strip().capitalize()
-            base_yield_qty = row.get("base_yield_qty", 1.0)
-            base_yield_uom = str(row.get("base_yield_uom", "")).strip()
-            price = row.get("price", None)
-            recipe_category = str(row.get("recipe_category", "")).strip() or None
-
-            if not recipe_code:
-                issues.append("Missing recipe_code")
-            elif len(recipe_code) > 32:
-                issues.append("recipe_code too long")
-            elif recipe_code in existing_codes:
-                existing = existing_codes[recipe_code]
-                if existing["name"] != name:
-                    issues.append("Duplicate recipe_code with different name")
-
-            if not name:
-                issues.append("Missing name")
-            elif len(name) > 100:
-                issues.append("Name too long")
-
-            if status not in ["Active", "Inactive"]:
-                issues.append("Invalid status")
-
-            try:
-                if pd.isna(base_yield_qty):
-                    base_yield_qty = 1.0
-                else:
-                    base_yield_qty = round(float(base_yield_qty), 4)
-                    if base_yield_qty <= 0:
-                        issues.append("base_yield_qty must be > 0")
-            except Exception:
-                issues.append("Invalid base_yield_qty")
-
-            # Allow free-form UOMs for now (your model allows it), warn if weird
-            if base_yield_uom and len(base_yield_uom) > 20:
-                issues.append(f"base_yield_uom too long: {base_yield_uom}")
-
-            try:
-                if pd.notna(price):
-                    price = round(float(price), 4)
-                    if price < 0:
-                        issues.append("price must be >= 0")
-                else:
-                    price = None
-            except Exception:
-                issues.append("Invalid price")
-
-            if issues:
-                row["errors"] = "; ".join(issues)
-                rejects.append(row)
-            else:
-                inserts.append(
-                    {
-                        "recipe_code": recipe_code,
-                        "name": name,
-                        "status": status,
-                        "base_yield_qty": base_yield_qty,
-                        "base_yield_uom": base_yield_uom or None,
-                        "price": price,
-                        "recipe_category": recipe_category,
-                    }
-                )
+        existing = fetch_existing("recipes", "recipe_code, name", "recipe_code")
+        reports, rejected_csv, duplicates = dry_run(
+            uploaded_file, validate_recipes, existing, "recipe_code"
+        )
+        show_summary(reports)
 
-        st.subheader("📊 Import Summary")
-        st.write(f"✅ Rows ready to import: {len(inserts)}")
-        st.write(f"❌ Rows rejected: {len(rejects)}")
+        if duplicates:
+            with st.expander("🔁 View Skipped Duplicates"):
+                st.dataframe(pd.DataFrame(duplicates), use_container_width=True, hide_index=True)
 
-        if rejects:
-            failed_df = pd.DataFrame(rejects)
-            csv = failed_df.to_csv(index=False)
+        if rejected_csv:
             st.download_button(
                 label="📤 Download Rejected Rows",
-                data=csv,
+                data=rejected_csv,
                 file_name=f"recipes_rejected_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv",
                 mime="text/csv",
             )
 
-        if inserts:
+        if any(r.valid for r in reports):
             if st.button("📤 Upload Recipes to Database"):
-                try:
-                    db.insert("recipes", inserts).execute()
-                    st.success(f"🎉 {len(inserts)} recipes successfully imported.")
-                except Exception as e:
-                    st.error(f"❌ Insert failed: {e}")
+                upload_in_chunks(
+                    uploaded_file, "recipes", validate_recipes, existing, "recipe_code", "recipes"
+                )
 
 # === Export Section ===
 st.divider()
 st.header("📤 Export Data")
 
-exp_ingr = db.table("ingredients").select("*").execute()
-df_ingr = pd.DataFrame(exp_ingr.data or [])
-if not df_ingr.empty:
-    st.download_button(
-        label="⬇️ Download Ingredients CSV",
-        data=df_ingr.to_csv(index=False),
-        file_name="ingredients_export.csv",
-        mime="text/csv",
-    )
 
+@exports.register("settings_ingredients", reads=("ingredients",))
+def ingredients_frames():
+    return exports.relation_frames("ingredients")
 
-exp_rec = db.table("recipes").select("*").execute()
-df_rec = pd.DataFrame(exp_rec.data or [])
-if not df_rec.empty:
-    st.download_button(
-        label="⬇️ Download Recipes CSV (headers only)",
-        data=df_rec.to_csv(index=False),
-        file_name="recipes_export.csv",
-        mime="text/csv",
-    )
+
+@exports.register("settings_recipes", reads=("recipes",))
+def recipes_frames():
+    return exports.relation_frames("recipes")
+
+
+# Nothing is read until an export is prepared (utils.exports)
+st.subheader("Ingredients")
+export_button.render(
+    "settings_ingredients",
+    label="⬇️ Download Ingredients CSV",
+    file_name="ingredients_export.csv",
+)
+
+st.subheader("Recipes")
+export_button.render(
+    "settings_recipes",
+    label="⬇️ Download Recipes CSV (headers only)",
+    file_name="recipes_export.csv",
+)
+
+for fmt in snapshot.FORMATS:
+    exports.register(
+        f"snapshot_{fmt}", reads=snapshot.RELATIONS, write=partial(snapshot.write, fmt=fmt)
+    )(snapshot.frames)
+
+st.subheader("Full snapshot")
+st.caption(
+    "Ingredients, recipes, recipe lines, sales and the cost views, with typed columns: "
+    "Parquet for analysis tools, Arrow IPC for the fastest reload. Restore it below."
+)
+snapshot_fmt = st.radio("Format", list(snapshot.FORMATS), horizontal=True, key="snapshot_fmt")
+export_button.render(
+    f"snapshot_{snapshot_fmt}",
+    label="⬇️ Download Snapshot",
+    file_name=f"snapshot_{snapshot_fmt}_{datetime.now().strftime('%Y%m%d-%H%M')}.zip",
+    mime="application/zip",
+)
+
+st.subheader("Restore snapshot")
+st.caption(
+    "Loads a snapshot of this tenant back, ids included. Tables that still have rows "
+    "are skipped, so restore after Scrub Dataset (sales are not scrubbed)."
+)
+snapshot_file = st.file_uploader("Upload snapshot (.zip)", type=["zip"], key="snapshot_upload")
+if snapshot_file and st.button("📥 Restore Snapshot"):
+    try:
+        snap = snapshot.open_snapshot(snapshot_file)
+        with st.spinner("Restoring snapshot…"):
+            results = snapshot.restore(snap)
+    except Exception as e:
+        st.error(f"❌ Restore failed: {e}")
+    else:
+        st.dataframe(pd.DataFrame(results), use_container_width=True, hide_index=True)
+        failed = next((r for r in results if r.error), None)
+        if failed:
+            st.error(f"❌ Restoring {failed.table} failed: {failed.error}")
+        else:
+            st.success(f"🎉 {sum(r.loaded for r in results)} rows restored.")
 
 st.divider()
 
@@ -391,8 +383,8 @@ st.markdown(
 ### ⚠️ Scrub Dataset
 This action will **permanently delete all ingredients, recipes, and recipe lines** from the database.
 - This **cannot be undone**.
-- Exported data will not include recipe lines (only recipe headers).
-- Re-importing exported recipes will not restore their content.
+- The CSV exports do not include recipe lines (only recipe headers); take a
+  **Full snapshot** first if you may want the data back.
 
 To confirm, type `DELETE` and click the button below.
 """
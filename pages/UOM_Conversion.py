@@ -4,6 +4,7 @@ from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 
 from components.active_client_badge import render as client_badge
 from utils import tenant_db as db
+from utils import uom
 from utils.auth import require_auth
 from utils.env import env_label, is_prod
 
@@ -49,6 +50,18 @@ grid_response = AgGrid(
     allow_unsafe_jscode=True,
 )
 
+# Pairs the cost views reach by chaining the conversions above (see utils/uom.py)
+if not df.empty:
+    derived = pd.DataFrame(
+        [p for p in uom.closure(df[["from_uom", "to_uom", "factor"]]).pairs() if p["hops"] > 1]
+    )
+    with st.expander(f"Derived conversions ({len(derived)})"):
+        if derived.empty:
+            st.caption("Every reachable pair is entered directly.")
+        else:
+            derived["factor"] = derived["factor"].round(6)
+            st.dataframe(derived, hide_index=True, use_container_width=True)
+
 # === Handle Selection ===
 selected_row = grid_response["selected_rows"]
 edit_data = None
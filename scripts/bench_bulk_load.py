@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Time utils.bulk_load (COPY + merge) against batched INSERTs of the same rows.
+
+Loads N synthetic ingredients for the first tenant inside a transaction that is
+rolled back, so nothing is kept. The batched path sends BATCH_ROWS-row
+multi-value INSERTs over the same connection: a lower bound for the REST path,
+which adds an HTTP round trip and JSON encoding per batch.
+
+Usage:
+    python scripts/bench_bulk_load.py [--rows 100000]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import column, insert, table, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.bulk_load import bulk_load
+from utils.db import get_engine
+from utils.importers import BATCH_ROWS
+
+COLUMNS = [
+    "tenant_id",
+    "ingredient_code",
+    "name",
+    "ingredient_type",
+    "package_qty",
+    "package_uom",
+    "package_cost",
+    "yield_pct",
+    "status",
+    "base_uom",
+]
+
+
+def synthetic_rows(n: int, tenant_id: str, prefix: str):
+    for i in range(n):
+        yield {
+            "tenant_id": tenant_id,
+            "ingredient_code": f"{prefix}-{i:07d}",
+            "name": f"Bench item {i}",
+            "ingredient_type": "Bought",
+            "package_qty": 1000,
+            "package_uom": "g",
+            "package_cost": round(1 + (i % 97) * 0.37, 2),
+            "yield_pct": 100,
+            "status": "Active",
+            "base_uom": "g",
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    args = ap.parse_args()
+
+    ingredients = table("ingredients", *[column(c) for c in COLUMNS])
+    with get_engine().connect() as conn:
+        tid = conn.execute(text("select id::text from tenants order by name limit 1")).scalar()
+        conn.rollback()
+
+        with conn.begin() as tx:
+            t0 = time.perf_counter()
+            result = bulk_load("ingredients", synthetic_rows(args.rows, tid, "BC"), tid, bind=conn)
+            copy_s = time.perf_counter() - t0
+            tx.rollback()
+
+        with conn.begin() as tx:
+            rows = list(synthetic_rows(args.rows, tid, f"BI{uuid.uuid4().hex[:4]}"))
+            t0 = time.perf_counter()
+            for start in range(0, len(rows), BATCH_ROWS):
+                conn.execute(insert(ingredients).values(rows[start : start + BATCH_ROWS]))
+            batch_s = time.perf_counter() - t0
+            tx.rollback()
+
+    n = args.rows
+    print(f"COPY + merge : {copy_s:7.2f}s  {n / copy_s:>10,.0f} rows/s  ({result.written} written)")
+    print(
+        f"{BATCH_ROWS}-row INSERTs: {batch_s:7.2f}s  {n / batch_s:>10,.0f} rows/s  "
+        f"({-(-n // BATCH_ROWS)} statements)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN ANALYZE the cost queries before and after V017 on a synthetic tenant.
+
+Builds a 100-recipe x 20-line tenant (20 preps, 80 service recipes, lines in
+mixed UOMs so conversions are looked up) inside a transaction, runs each query
+in its pre-V017 form (correlated `select factor from ref_uom_conversion`
+subqueries) and its current form, prints the plans with timings and the number
+of SubPlan nodes, then rolls everything back.
+
+Usage (DB_* secrets in the environment, as for utils.db):
+    python scripts/bench_cost_views.py [--runs 5] [--plans]
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import uuid
+from pathlib import Path
+
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.db import get_engine
+
+SEED = """
+insert into public.ref_uom_conversion (from_uom, to_uom, factor)
+values ('kg', 'g', 1000), ('g', 'kg', 0.001), ('l', 'ml', 1000), ('ml', 'l', 0.001),
+       ('oz', 'g', 28.3495), ('g', 'oz', 0.035274)
+on conflict do nothing;
+
+insert into public.tenants (id, name, code) values (:t, 'bench', :code);
+
+insert into public.ingredients (
+  tenant_id, ingredient_code, name, ingredient_type, package_qty, package_uom,
+  package_cost, yield_pct, base_uom
+)
+select :t, 'BI' || g, 'Bench ingredient ' || g, 'food', 1 + g % 5,
+  (array['kg', 'g', 'l', 'ml', 'unit'])[1 + g % 5], 2.5 + g % 17, 80 + g % 21,
+  (array['g', 'g', 'ml', 'ml', 'unit'])[1 + g % 5]
+from generate_series(1, 200) g;
+
+insert into public.recipes (tenant_id, recipe_code, name, recipe_type, yield_qty, yield_uom, price)
+select :t, 'BR' || g, 'Bench recipe ' || g,
+  case when g <= 20 then 'prep' else 'service' end,
+  case when g <= 20 then 1 + g % 4 end,
+  case when g <= 20 then (array['kg', 'g', 'l'])[1 + g % 3] end,
+  case when g > 20 then 12 + g % 9 end
+from generate_series(1, 100) g;
+
+-- 20 lines per recipe: ingredients, plus preps for every 5th line of service recipes
+insert into public.recipe_lines (tenant_id, recipe_id, ingredient_id, qty, qty_uom)
+select :t, r.id,
+  case
+    when r.recipe_type = 'service' and n % 5 = 0 then p.id
+    else i.id
+  end,
+  1 + n % 3, (array['g', 'kg', 'oz', 'ml', 'l', 'unit'])[1 + (n + r.rn) % 6]
+from (
+    select id, recipe_type, row_number() over (order by recipe_code) rn
+    from public.recipes where tenant_id = :t
+  ) r
+  cross join generate_series(1, 20) n
+  join lateral (
+    select id from public.ingredients
+    where tenant_id = :t and ingredient_code = 'BI' || (1 + (r.rn * 7 + n * 13) % 200)
+  ) i on true
+  join lateral (
+    select id from public.recipes
+    where tenant_id = :t and recipe_code = 'BR' || (1 + (r.rn + n) % 20)
+  ) p on true;
+"""
+
+# Pre-V017 recipe_line_costs_base (V007), scoped to the tenant
+BASE_BEFORE = """
+select rl.id, rl.recipe_id,
+  case
+    when i.id is not null and i.package_qty > 0
+    and (
+      rl.qty_uom = i.package_uom
+      or exists (
+        select 1 from public.ref_uom_conversion cu
+        where cu.from_uom = rl.qty_uom and cu.to_uom = i.package_uom
+      )
+    ) then case
+      when rl.qty_uom = i.package_uom then (rl.qty / (i.yield_pct / 100.0)) * (i.package_cost / i.package_qty)
+      else (
+        rl.qty * (
+          select factor from public.ref_uom_conversion cu
+          where cu.from_uom = rl.qty_uom and cu.to_uom = i.package_uom
+        ) / (i.yield_pct / 100.0)
+      ) * (i.package_cost / i.package_qty)
+    end
+    else 0
+  end as line_cost
+from public.recipe_lines rl
+  left join public.ingredients i on i.id = rl.ingredient_id
+  and i.tenant_id = rl.tenant_id and i.deleted_at is null
+where rl.deleted_at is null and rl.tenant_id = :t
+"""
+
+BASE_AFTER = """
+select recipe_line_id, recipe_id, line_cost
+from public.recipe_line_costs_base where tenant_id = :t
+"""
+
+# Line-cost step of refresh_recipe_costs: V016 form vs V017 form
+REFRESH_LINES_BEFORE = """
+select rl.id,
+  coalesce(
+    case when i.package_qty > 0 and i.yield_pct <> 0 then
+      rl.qty * fi.factor / (i.yield_pct / 100.0) * (i.package_cost / i.package_qty) end,
+    rl.qty * fp.factor * p.unit_cost,
+    0
+  )
+from public.recipe_lines rl
+  left join public.ingredients i on i.id = rl.ingredient_id
+    and i.tenant_id = rl.tenant_id and i.deleted_at is null
+  left join public.recipe_cost_store p on p.recipe_id = rl.ingredient_id
+    and p.tenant_id = rl.tenant_id and p.recipe_type = 'prep'
+  left join lateral (
+    select case when rl.qty_uom = i.package_uom then 1.0 else (
+      select cu.factor from public.ref_uom_conversion cu
+      where cu.from_uom = rl.qty_uom and cu.to_uom = i.package_uom
+    ) end as factor
+  ) fi on true
+  left join lateral (
+    select case when rl.qty_uom = p.base_uom then 1.0 else (
+      select cu.factor from public.ref_uom_conversion cu
+      where cu.from_uom = rl.qty_uom and cu.to_uom = p.base_uom
+    ) end as factor
+  ) fp on true
+where rl.tenant_id = :t and rl.deleted_at is null
+"""
+
+REFRESH_LINES_AFTER = """
+select rl.id,
+  coalesce(
+    case when i.package_qty > 0 and i.yield_pct <> 0 then
+      rl.qty * f.ing / (i.yield_pct / 100.0) * (i.package_cost / i.package_qty) end,
+    rl.qty * f.prep * p.unit_cost,
+    0
+  )
+from public.recipe_lines rl
+  left join public.ingredients i on i.id = rl.ingredient_id
+    and i.tenant_id = rl.tenant_id and i.deleted_at is null
+  left join public.recipe_cost_store p on p.recipe_id = rl.ingredient_id
+    and p.tenant_id = rl.tenant_id and p.recipe_type = 'prep'
+  left join public.ref_uom_conversion ci on ci.from_uom = rl.qty_uom
+    and ci.to_uom = i.package_uom
+  left join public.ref_uom_conversion cp on cp.from_uom = rl.qty_uom
+    and cp.to_uom = p.base_uom
+  cross join lateral (
+    select case when rl.qty_uom = i.package_uom then 1.0 else ci.factor end as ing,
+      case when rl.qty_uom = p.base_uom then 1.0 else cp.factor end as prep
+  ) f
+where rl.tenant_id = :t and rl.deleted_at is null
+"""
+
+CASES = [
+    ("recipe_line_costs_base", BASE_BEFORE, BASE_AFTER),
+    ("refresh_recipe_costs line step", REFRESH_LINES_BEFORE, REFRESH_LINES_AFTER),
+]
+
+
+def explain(conn, sql: str, tenant_id: str):
+    rows = conn.execute(
+        text("explain (analyze, buffers, format text) " + sql), {"t": tenant_id}
+    ).fetchall()
+    plan = "\n".join(r[0] for r in rows)
+    ms = float(re.search(r"Execution Time: ([\d.]+) ms", plan).group(1))
+    return plan, ms
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--runs", type=int, default=5, help="EXPLAIN ANALYZE runs per query")
+    ap.add_argument("--plans", action="store_true", help="print the full plans")
+    args = ap.parse_args()
+
+    tenant_id = str(uuid.uuid4())
+    with get_engine().connect() as conn:
+        try:
+            for stmt in SEED.split(";\n"):
+                if stmt.strip():
+                    conn.execute(text(stmt), {"t": tenant_id, "code": f"BENCH-{tenant_id[:8]}"})
+            conn.execute(text("analyze public.recipe_lines, public.ingredients, public.recipes"))
+            n = conn.execute(
+                text("select count(*) from public.recipe_lines where tenant_id = :t"),
+                {"t": tenant_id},
+            ).scalar()
+            print(f"Synthetic tenant: 100 recipes, {n} lines\n")
+
+            for name, before, after in CASES:
+                print(f"== {name}")
+                for label, sql in (("before", before), ("after", after)):
+                    timings = []
+                    for _ in range(args.runs):
+                        plan, ms = explain(conn, sql, tenant_id)
+                        timings.append(ms)
+                    subplans = plan.count("SubPlan")
+                    print(
+                        f"  {label:<6} median {statistics.median(timings):8.2f} ms"
+                        f"   SubPlan nodes: {subplans}"
+                    )
+                    if args.plans:
+                        print("    " + plan.replace("\n", "\n    "))
+                print()
+        finally:
+            conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Time utils.importers.validate_ingredients on synthetic uploads of growing size.
+
+No database needed: the existing-codes map is synthetic too. Rows/second should
+stay roughly flat as the file grows (linear scaling), and a 5,000-row supplier
+file should validate in well under a second.
+
+With --stream N, also writes an N-row CSV and runs it through the chunked
+pipeline (read_chunks + run_import, dry run), reporting the Python heap peak:
+it should stay near one chunk's worth whatever N is.
+
+Usage:
+    python scripts/bench_import_validation.py [--sizes 1000 5000 20000 100000]
+    python scripts/bench_import_validation.py --sizes --stream 1000000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.importers import read_chunks, run_import, validate_ingredients
+
+CATEGORIES = {f"Category {i}": f"cat-{i}" for i in range(20)}
+BASE_UOM_MAP = {"kg": "g", "l": "ml", "lb": "g", "oz": "g"}
+
+
+def synthetic_upload(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "ingredient_code": [f"SUP-{i:07d}" for i in range(n)],
+            "name": [f"Supplier item {i}" for i in range(n)],
+            "ingredient_type": rng.choice(["bought", "Prepped", "other"], n),
+            "package_qty": rng.choice([1.0, 2.5, 5.0, -1.0, np.nan], n),
+            "package_uom": rng.choice(["kg", "l", "each", "g", "oz"], n),
+            "package_cost": rng.uniform(0.5, 80.0, n).round(2),
+            "yield_pct": rng.choice([100.0, 0.9, 85.0, 250.0], n),
+            "status": rng.choice(["active", "inactive", ""], n),
+            "category": rng.choice(list(CATEGORIES) + ["Unknown"], n),
+        }
+    )
+
+
+def bench_stream(n: int) -> None:
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+        path = Path(f.name)
+        for start in range(0, n, 100_000):
+            part = synthetic_upload(min(100_000, n - start), seed=start)
+            part["ingredient_code"] = [f"SUP-{i:07d}" for i in range(start, start + len(part))]
+            part.to_csv(f, index=False, header=start == 0)
+    try:
+        validate = partial(
+            validate_ingredients, existing={}, category_map=CATEGORIES, base_uom_map=BASE_UOM_MAP
+        )
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        reports = list(run_import(read_chunks(path), validate))
+        dt = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        path.unlink()
+    print(
+        f"streamed {n:,} rows in {len(reports)} chunks: {dt:.1f}s ({n / dt:,.0f} rows/s), "
+        f"slowest chunk {max(r.seconds for r in reports):.3f}s, heap peak {peak / 2**20:.1f} MiB"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", type=int, nargs="*", default=[1_000, 5_000, 20_000, 100_000])
+    ap.add_argument("--stream", type=int, nargs="*", default=[], metavar="ROWS")
+    args = ap.parse_args()
+
+    for n in args.stream:
+        bench_stream(n)
+    if not args.sizes:
+        return
+
+    print(f"{'rows':>9} {'seconds':>9} {'rows/s':>11} {'insert':>8} {'reject':>8} {'dup':>7}")
+    for n in args.sizes:
+        df = synthetic_upload(n)
+        # A tenant that already has every 10th code
+        existing = {
+            code: {"name": "x", "ingredient_type": "Bought", "package_cost": 1.0}
+            for code in df["ingredient_code"].iloc[::10]
+        }
+        t0 = time.perf_counter()
+        inserts, rejected, duplicates = validate_ingredients(df, existing, CATEGORIES, BASE_UOM_MAP)
+        dt = time.perf_counter() - t0
+        print(
+            f"{n:>9} {dt:>9.3f} {n / dt:>11,.0f} "
+            f"{len(inserts):>8} {len(rejected):>8} {len(duplicates):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
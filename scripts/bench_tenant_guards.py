@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Time 50k-row inserts under the V008 row-level tenant guards and the V020
+statement-level ones.
+
+Builds a synthetic tenant (200 ingredients, 100 recipes) inside a transaction,
+then inserts N recipe_lines and N sales with each guard version installed in
+turn (the trigger swap is part of the same transaction). The cost store
+triggers on recipe_lines are disabled for the run so only the guard cost is
+measured. Everything is rolled back.
+
+Usage (DB_* secrets in the environment, as for utils.db):
+    python scripts/bench_tenant_guards.py [--rows 50000] [--runs 3]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.db import get_engine
+
+SEED = """
+insert into public.tenants (id, name, code) values (:t, 'bench', :code);
+
+insert into public.ingredients (tenant_id, ingredient_code, name, ingredient_type)
+select :t, 'BI' || g, 'Bench ingredient ' || g, 'Bought'
+from generate_series(1, 200) g;
+
+insert into public.recipes (tenant_id, recipe_code, name, recipe_type)
+select :t, 'BR' || g, 'Bench recipe ' || g, case when g <= 20 then 'prep' else 'service' end
+from generate_series(1, 100) g;
+
+alter table public.recipe_lines disable trigger tr_recipe_lines_cost_store_ins
+"""
+
+ROW_LEVEL = """
+drop trigger tr_recipe_lines_check_tenant_ins on public.recipe_lines;
+drop trigger tr_recipe_lines_check_tenant_upd on public.recipe_lines;
+drop trigger tr_sales_check_tenant_ins on public.sales;
+drop trigger tr_sales_check_tenant_upd on public.sales;
+create trigger tr_recipe_lines_tenant_guard before insert or update on public.recipe_lines
+  for each row execute function public.enforce_same_tenant_recipe_lines();
+create trigger tr_sales_tenant_guard before insert or update on public.sales
+  for each row execute function public.enforce_same_tenant_sales()
+"""
+
+# Service recipes get ingredient lines and, every 4th line, a prep recipe line
+INSERTS = {
+    "recipe_lines": """
+insert into public.recipe_lines (tenant_id, recipe_id, ingredient_id, qty, qty_uom)
+select :t, r.id, case when g % 4 = 0 then p.id else i.id end, 1, 'g'
+from generate_series(1, :n) g
+  join (select id, row_number() over (order by recipe_code) - 1 as k
+        from public.recipes where tenant_id = :t and recipe_type = 'service') r on r.k = g % 80
+  join (select id, row_number() over (order by ingredient_code) - 1 as k
+        from public.ingredients where tenant_id = :t) i on i.k = g % 200
+  join (select id, row_number() over (order by recipe_code) - 1 as k
+        from public.recipes where tenant_id = :t and recipe_type = 'prep') p on p.k = g % 20
+""",
+    "sales": """
+insert into public.sales (tenant_id, recipe_id, sale_date, qty)
+select :t, r.id, current_date - g % 365, 1 + g % 3
+from generate_series(1, :n) g
+  join (select id, row_number() over (order by recipe_code) - 1 as k
+        from public.recipes where tenant_id = :t) r on r.k = g % 100
+""",
+}
+
+
+def timed_insert(conn, sql: str, params: dict) -> float:
+    sp = conn.begin_nested()
+    t0 = time.perf_counter()
+    conn.execute(text(sql), params)
+    dt = time.perf_counter() - t0
+    sp.rollback()
+    return dt
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--runs", type=int, default=3, help="timed inserts per table and version")
+    args = ap.parse_args()
+
+    tenant_id = str(uuid.uuid4())
+    params = {"t": tenant_id, "n": args.rows}
+    results = {}
+    with get_engine().connect() as conn:
+        try:
+            for stmt in SEED.split(";\n"):
+                conn.execute(text(stmt), {"t": tenant_id, "code": f"BENCH-{tenant_id[:8]}"})
+
+            for version in ("statement (V020)", "row (V008)"):
+                if version.startswith("row"):
+                    for stmt in ROW_LEVEL.split(";\n"):
+                        conn.execute(text(stmt))
+                for table, sql in INSERTS.items():
+                    runs = [timed_insert(conn, sql, params) for _ in range(args.runs)]
+                    results[(table, version)] = statistics.median(runs)
+        finally:
+            conn.rollback()
+
+    print(f"{args.rows:,}-row inserts, median of {args.runs}:")
+    for table in INSERTS:
+        row = results[(table, "row (V008)")]
+        stmt = results[(table, "statement (V020)")]
+        print(
+            f"  {table:<13} row-level {row:6.2f}s   statement-level {stmt:6.2f}s   x{row / stmt:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
 import pandas as pd
 
+from utils.bulk_load import BULK_TABLES, bulk_load
 from utils.db import get_engine
+from utils.importers import CHUNK_ROWS
 
 engine = get_engine()
 
 
-def upload_csv_to_table(csv_path, table_name):
+def upload_csv_to_table(csv_path, table_name, tenant_id=None):
+    if table_name in BULK_TABLES:
+        # COPY + merge per chunk, scoped to the tenant; existing codes are skipped
+        if not tenant_id:
+            raise ValueError(f"{table_name} is tenant-scoped: pass tenant_id")
+        written = 0
+        for chunk in pd.read_csv(csv_path, chunksize=CHUNK_ROWS):
+            written += bulk_load(
+                table_name, chunk.to_dict("records"), tenant_id, bind=engine
+            ).written
+        print(f"✅ {table_name} uploaded ({written} rows)")
+        return
+
     df = pd.read_csv(csv_path)
     df.to_sql(table_name, engine, if_exists="replace", index=False)
     print(f"✅ {table_name} uploaded")
 
 
 # Example:
-# upload_csv_to_table('data/sample_seed.csv', 'ingredients')
+# upload_csv_to_table('data/sample_seed.csv', 'ingredients', tenant_id='<tenant uuid>')
@@ -0,0 +1,83 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from utils.bulk_load import bulk_load
+from utils.db import get_engine
+
+
+def _ingredient(code, cost, **extra):
+    return {
+        "ingredient_code": code,
+        "name": f"Bulk {code}",
+        "ingredient_type": "Bought",
+        "package_qty": 1000,
+        "package_uom": "g",
+        "package_cost": cost,
+        "base_uom": "g",
+        **extra,
+    }
+
+
+@pytest.mark.smoke
+def test_bulk_load_merges_per_tenant_and_feeds_the_cost_store():
+    """COPY + merge (utils.bulk_load) stamps the tenant, skips or updates known codes."""
+    engine = get_engine()
+    with engine.connect() as conn, conn.begin() as tx:
+        tid = conn.execute(text("select id::text from tenants order by name limit 1")).scalar()
+        code = f"BULK-{uuid.uuid4().hex[:8]}"
+
+        first = bulk_load("ingredients", [_ingredient(code, 5.0)], tid, bind=conn)
+        again = bulk_load(
+            "ingredients",
+            (_ingredient(c, 7.0) for c in (code, f"{code}-2", f"{code}-2")),
+            tid,
+            bind=conn,
+        )
+        assert (first.staged, first.written) == (1, 1)
+        assert (again.staged, again.written) == (3, 1)  # known code and in-load repeat skipped
+
+        updated = bulk_load("ingredients", [_ingredient(code, 9.0)], tid, update=True, bind=conn)
+        assert updated.written == 1
+        rows = conn.execute(
+            text(
+                "select tenant_id::text, package_cost from ingredients "
+                "where ingredient_code like :c order by ingredient_code"
+            ),
+            {"c": f"{code}%"},
+        ).fetchall()
+        assert [(r[0], float(r[1])) for r in rows] == [(tid, 9.0), (tid, 7.0)]
+
+        recipe = {"recipe_code": code, "name": "Bulk dish", "recipe_type": "service"}
+        bulk_load("recipes", [recipe], tid, bind=conn)
+        rid, iid = conn.execute(
+            text(
+                "select r.id, i.id from recipes r, ingredients i where r.tenant_id = :t "
+                "and i.tenant_id = :t and r.recipe_code = :c and i.ingredient_code = :c"
+            ),
+            {"t": tid, "c": code},
+        ).one()
+        lines = [{"recipe_id": rid, "ingredient_id": iid, "qty": 100, "qty_uom": "g"}] * 2
+        assert bulk_load("recipe_lines", lines, tid, bind=conn).written == 2
+        total = conn.execute(
+            text("select total_cost from recipe_cost_store where recipe_id = :r"), {"r": rid}
+        ).scalar()
+        assert float(total) == pytest.approx(2 * 100 * 9.0 / 1000)
+        tx.rollback()
+
+
+@pytest.mark.smoke
+def test_bulk_load_rejects_unknown_tables_and_columns():
+    with pytest.raises(ValueError):
+        bulk_load("tenants", [{"name": "x"}], "t")
+    with pytest.raises(ValueError):
+        bulk_load("ingredients", [_ingredient("X", 1.0, nope=1)], str(uuid.uuid4()))
+
+
+@pytest.mark.smoke
+def test_bulk_load_rejects_rows_of_another_tenant():
+    tid, other = str(uuid.uuid4()), str(uuid.uuid4())
+    rows = [_ingredient("OWN", 1.0), _ingredient("OTHER", 1.0, tenant_id=other)]
+    with pytest.raises(ValueError, match="another|tenant"):
+        bulk_load("ingredients", rows, tid)
@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from utils.costing import cost_recipes
+from utils.db import get_engine
+
+
+def _costs(conn, tenant_id):
+    def q(sql):
+        return [dict(r) for r in conn.execute(text(sql), {"t": tenant_id}).mappings()]
+
+    ingredients = q(
+        "select id::text, package_qty, package_uom, package_cost, yield_pct, base_uom "
+        "from ingredients where tenant_id = :t and deleted_at is null"
+    )
+    recipes = q(
+        "select id::text, recipe_code, name, recipe_type, status, price, yield_qty, yield_uom "
+        "from recipes where tenant_id = :t and deleted_at is null"
+    )
+    lines = q(
+        "select id::text, recipe_id::text, ingredient_id::text, qty, qty_uom "
+        "from recipe_lines where tenant_id = :t and deleted_at is null"
+    )
+    conversions = q("select from_uom, to_uom, factor from ref_uom_conversion")
+    return cost_recipes(ingredients, recipes, lines, conversions)
+
+
+def _nan(value):
+    return float(value) if value is not None else float("nan")
+
+
+@pytest.mark.smoke
+def test_in_process_costing_matches_cost_store_views():
+    """The cost store (V016) and utils.costing agree at every level of prep nesting."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        tenants = [r[0] for r in conn.execute(text("select id::text from tenants")).fetchall()]
+        for tid in tenants:
+            by_id = _costs(conn, tid)
+
+            preps = pd.read_sql(
+                text(
+                    "select recipe_id::text, total_cost, base_uom, unit_cost "
+                    "from prep_costs where tenant_id = :t"
+                ),
+                conn,
+                params={"t": tid},
+            )
+            for row in preps.itertuples():
+                got = by_id[row.recipe_id]
+                assert got["total_cost"] == pytest.approx(float(row.total_cost), rel=1e-9)
+                assert got["base_uom"] == row.base_uom
+                assert _nan(got["unit_cost"]) == pytest.approx(
+                    _nan(row.unit_cost), rel=1e-9, nan_ok=True
+                )
+
+            summary = pd.read_sql(
+                text(
+                    "select recipe_id::text, total_cost, cost_pct, margin "
+                    "from recipe_summary where tenant_id = :t"
+                ),
+                conn,
+                params={"t": tid},
+            )
+            for row in summary.itertuples():
+                got = by_id[row.recipe_id]
+                assert got["total_cost"] == pytest.approx(float(row.total_cost), rel=1e-9)
+                for col in ("cost_pct", "margin"):
+                    assert _nan(got[col]) == pytest.approx(
+                        _nan(getattr(row, col)), abs=0.011, nan_ok=True
+                    )
+
+            lines = pd.read_sql(
+                text(
+                    "select recipe_line_id::text, line_cost from recipe_line_costs where tenant_id = :t"
+                ),
+                conn,
+                params={"t": tid},
+            )
+            got_lines = {lid: c for r in by_id.values() for lid, c in r["line_costs"].items()}
+            for row in lines.itertuples():
+                assert got_lines[row.recipe_line_id] == pytest.approx(
+                    float(row.line_cost), rel=1e-9, abs=1e-9
+                )
+
+
+@pytest.mark.smoke
+def test_cost_store_triggers_match_a_full_refresh():
+    """Statement-level incremental refreshes leave the store as a full rebuild would."""
+    cols = "recipe_id, level, total_cost, base_uom, conversion_factor, unit_cost, cost_pct, margin"
+    engine = get_engine()
+    with engine.connect() as conn:
+        incremental = pd.read_sql(
+            text(f"select {cols} from recipe_cost_store order by recipe_id"), conn
+        )
+        conn.execute(text("select refresh_all_recipe_costs()"))
+        full = pd.read_sql(text(f"select {cols} from recipe_cost_store order by recipe_id"), conn)
+        conn.rollback()
+    pd.testing.assert_frame_equal(incremental, full)
@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import text
+
+from utils.db import get_engine
+
+
+def _backfill(conn, tid, dry_run):
+    return conn.execute(
+        text("select public.maintenance_backfill_base_uom(:t, :d)"),
+        {"t": tid, "d": dry_run},
+    ).scalar()
+
+
+@pytest.mark.smoke
+def test_backfill_base_uom_dry_run_counts_what_the_update_changes():
+    """maintenance_backfill_base_uom (V019): dry run == rows updated, then nothing left."""
+    engine = get_engine()
+    with engine.connect() as conn, conn.begin() as tx:
+        tenants = [r[0] for r in conn.execute(text("select id from tenants")).fetchall()]
+        for tid in tenants:
+            pending = _backfill(conn, tid, True)
+            assert _backfill(conn, tid, False) == pending
+            assert _backfill(conn, tid, True) == 0
+            left = conn.execute(
+                text(
+                    "select count(*) from ingredients where tenant_id = :t "
+                    "and deleted_at is null and base_uom is null "
+                    "and lower(package_uom) in ('each', 'unit', 'g', 'ml')"
+                ),
+                {"t": tid},
+            ).scalar()
+            assert left == 0
+        tx.rollback()
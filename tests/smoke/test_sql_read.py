@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import text
+
+from utils.db import get_engine
+from utils.sql_read import read_df, read_relation
+
+
+@pytest.mark.smoke
+def test_read_relation_scopes_like_the_rest_path():
+    """read_relation (utils.sql_read): tenant filter, soft-delete filter, REST-like dtypes."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        for (tid,) in conn.execute(text("select id::text from tenants")).fetchall():
+            live = conn.execute(
+                text(
+                    "select count(*) from ingredients where tenant_id = :t and deleted_at is null"
+                ),
+                {"t": tid},
+            ).scalar()
+            df = read_relation(
+                "ingredients", "id, package_cost", tenant_id=tid, live_only=True, bind=conn
+            )
+            assert len(df) == live
+            if live:
+                assert isinstance(df["id"].iloc[0], str)  # uuid as text, like PostgREST
+                assert df["package_cost"].dtype.kind in "fO"  # numeric as float, not Decimal
+
+            summary = read_relation("recipe_summary", tenant_id=tid, bind=conn)
+            assert set(summary["tenant_id"]) <= {tid}
+
+
+@pytest.mark.smoke
+def test_read_df_requires_tenant_filter_and_is_read_only():
+    engine = get_engine()
+    with engine.connect() as conn:
+        tid = conn.execute(text("select id::text from tenants order by name limit 1")).scalar()
+
+    with pytest.raises(ValueError):
+        read_df("select * from ingredients", tid, bind=engine)
+
+    df = read_df(
+        "select count(*) as n from recipes where tenant_id = %(tenant_id)s", tid, bind=engine
+    )
+    assert df["n"].iloc[0] >= 0
+
+    with pytest.raises(Exception, match="read-only"):
+        read_df("delete from sales where tenant_id = %(tenant_id)s", tid, bind=engine)
@@ -0,0 +1,113 @@
+import itertools
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from utils.db import get_engine
+
+
+def _v008_recipe_lines(tenant, parent, ingredient, prep):
+    """Message the V008 row-level guard raised for one recipe line (None: allowed)."""
+    if parent is not None and tenant != parent:
+        return "Cross-tenant reference (parent recipe)"
+    if ingredient is not None and tenant != ingredient:
+        return "Cross-tenant reference (ingredient)"
+    if ingredient is None and prep is not None and tenant != prep:
+        return "Cross-tenant reference (prep recipe)"
+    return None
+
+
+def _insert(conn, sql, params):
+    """Run one statement under a savepoint; the guard's message, or None when it passed."""
+    sp = conn.begin_nested()
+    try:
+        conn.execute(text(sql), params)
+        return None
+    except Exception as e:
+        return str(getattr(e, "orig", e)).splitlines()[0]
+    finally:
+        sp.rollback()
+
+
+@pytest.mark.smoke
+def test_statement_level_guards_match_the_row_level_rules():
+    """V020 guards reject exactly what the V008 row triggers rejected, row by row and in batches."""
+    engine = get_engine()
+    with engine.connect() as conn, conn.begin() as tx:
+
+        def new(sql, **params):
+            return conn.execute(text(sql + " returning id"), params).scalar()
+
+        t1, t2 = (
+            new("insert into tenants (name) values (:n)", n=f"guard-{uuid.uuid4().hex[:6]}")
+            for _ in range(2)
+        )
+        tenant_of = {}
+        for t in (t1, t2):
+            for kind in ("service", "prep"):
+                rid = new(
+                    "insert into recipes (tenant_id, recipe_code, name, recipe_type) "
+                    "values (:t, :c, :c, :k)",
+                    t=t,
+                    c=f"G-{kind}-{uuid.uuid4().hex[:6]}",
+                    k=kind,
+                )
+                tenant_of[rid] = (t, kind)
+            iid = new(
+                "insert into ingredients (tenant_id, ingredient_code, name, ingredient_type) "
+                "values (:t, :c, :c, 'Bought')",
+                t=t,
+                c=f"G-{uuid.uuid4().hex[:6]}",
+            )
+            tenant_of[iid] = (t, "ingredient")
+        recipes = [r for r, (_, k) in tenant_of.items() if k != "ingredient"]
+        inputs = list(tenant_of) + [uuid.uuid4()]  # ingredient_id has no FK
+
+        for tenant, parent, ingredient in itertools.product((t1, t2), recipes, inputs):
+            if ingredient == parent:
+                continue  # a self-reference is the cost store's cycle error, not a guard
+            _, kind = tenant_of.get(ingredient, (None, None))
+            want = _v008_recipe_lines(
+                tenant,
+                tenant_of[parent][0],
+                tenant_of[ingredient][0] if kind == "ingredient" else None,
+                tenant_of[ingredient][0] if kind == "prep" else None,
+            )
+            got = _insert(
+                conn,
+                "insert into recipe_lines (tenant_id, recipe_id, ingredient_id, qty, qty_uom) "
+                "values (:t, :r, :i, 1, 'g')",
+                {"t": tenant, "r": parent, "i": ingredient},
+            )
+            assert got == want, (tenant, tenant_of[parent], tenant_of.get(ingredient))
+
+        for tenant, recipe in itertools.product((t1, t2), recipes):
+            want = None if tenant == tenant_of[recipe][0] else "Cross-tenant reference in sales"
+            got = _insert(
+                conn,
+                "insert into sales (tenant_id, recipe_id, sale_date, qty) "
+                "values (:t, :r, current_date, 1)",
+                {"t": tenant, "r": recipe},
+            )
+            assert got == want
+
+        cat = new("insert into ref_ingredient_categories (tenant_id, name) values (:t, 'g')", t=t2)
+        got = _insert(
+            conn,
+            "update ingredients set category_id = :c where tenant_id = :t",
+            {"c": cat, "t": t1},
+        )
+        assert got == "Cross-tenant reference: ingredient.category_id"
+
+        # one bad row fails the whole batch
+        good = [r for r in recipes if tenant_of[r][0] == t1]
+        bad = [r for r in recipes if tenant_of[r][0] == t2]
+        got = _insert(
+            conn,
+            "insert into sales (tenant_id, recipe_id, sale_date, qty) "
+            "select :t, r, current_date, 1 from unnest(cast(:rs as uuid[])) r",
+            {"t": t1, "rs": good * 100 + bad[:1]},
+        )
+        assert got == "Cross-tenant reference in sales"
+        tx.rollback()
@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from utils import uom
+from utils.db import get_engine
+
+
+@pytest.mark.smoke
+def test_closure_table_matches_utils_uom():
+    """ref_uom_conversion_closure (V018) picks the same paths as utils.uom."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        direct = pd.read_sql(text("select from_uom, to_uom, factor from ref_uom_conversion"), conn)
+        table = pd.read_sql(
+            text("select from_uom, to_uom, factor, hops from ref_uom_conversion_closure"), conn
+        )
+    want = {(p["from_uom"], p["to_uom"]): p for p in uom.closure(direct).pairs()}
+    got = {(r.from_uom, r.to_uom): r for r in table.itertuples()}
+    assert set(got) == set(want)
+    for key, row in got.items():
+        assert row.hops == want[key]["hops"]
+        assert float(row.factor) == pytest.approx(want[key]["factor"], rel=1e-9)
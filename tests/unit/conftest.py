@@ -0,0 +1,5 @@
+import os
+
+# Unit tests never reach Supabase; a placeholder project lets utils.supabase_client import
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "unit-tests")
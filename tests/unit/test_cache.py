@@ -0,0 +1,155 @@
+import pandas as pd
+import pytest
+
+from utils import cache
+
+
+@pytest.fixture(autouse=True)
+def active_tenant(monkeypatch):
+    state = {"tid": "tenant-a"}
+    monkeypatch.setattr(cache, "get_active_tenant", lambda default=None: state["tid"] or default)
+    cache.clear_all()
+    yield state
+    cache.clear_all()
+
+
+def test_entries_are_namespaced_by_tenant(active_tenant) -> None:
+    calls = []
+
+    @cache.cache_by_tenant(ttl=60)
+    def load():
+        calls.append(active_tenant["tid"])
+        return active_tenant["tid"]
+
+    assert load() == "tenant-a"
+    active_tenant["tid"] = "tenant-b"
+    assert load() == "tenant-b"
+    active_tenant["tid"] = "tenant-a"
+    assert load() == "tenant-a"
+    assert calls == ["tenant-a", "tenant-b"]
+
+
+def test_clear_tenant_leaves_other_tenants_warm(active_tenant) -> None:
+    calls = []
+
+    @cache.cache_by_tenant(ttl=60)
+    def load():
+        calls.append(active_tenant["tid"])
+        return len(calls)
+
+    load()
+    active_tenant["tid"] = "tenant-b"
+    load()
+    cache.clear_tenant("tenant-a")
+    load()  # tenant-b still cached
+    active_tenant["tid"] = "tenant-a"
+    load()  # tenant-a refetched
+    assert calls == ["tenant-a", "tenant-b", "tenant-a"]
+
+
+def test_bucket_is_lru_capped(monkeypatch) -> None:
+    monkeypatch.setattr(cache, "MAX_ENTRIES_PER_TENANT", 2)
+    calls = []
+
+    @cache.cache_by_tenant(ttl=60)
+    def load(n):
+        calls.append(n)
+        return n
+
+    load(1)
+    load(2)
+    load(1)  # touch 1 so 2 becomes least recently used
+    load(3)  # evicts 2
+    load(1)
+    load(2)
+    assert calls == [1, 2, 3, 2]
+
+
+def test_entries_expire_after_ttl(monkeypatch) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    calls = []
+
+    @cache.cache_by_tenant(ttl=10)
+    def load():
+        calls.append(now[0])
+        return now[0]
+
+    load()
+    now[0] += 5
+    load()
+    now[0] += 10
+    load()
+    assert len(calls) == 2
+
+
+def test_callers_receive_copies() -> None:
+    @cache.cache_by_tenant(ttl=60)
+    def load():
+        return pd.DataFrame({"x": [1, 2]})
+
+    df = load()
+    df["x"] = 0
+    assert load()["x"].tolist() == [1, 2]
+
+
+def test_shared_bucket_ignores_active_tenant(active_tenant) -> None:
+    calls = []
+
+    @cache.cache_by_tenant(ttl=60, shared=True)
+    def load():
+        calls.append(1)
+        return "clients"
+
+    load()
+    active_tenant["tid"] = "tenant-b"
+    load()
+    cache.clear_tenant("tenant-b")
+    load()
+    assert len(calls) == 1
+    cache.clear_shared()
+    load()
+    assert len(calls) == 2
+
+
+def test_invalidate_evicts_only_loaders_reading_the_relation(active_tenant) -> None:
+    calls = []
+
+    @cache.cache_by_tenant(ttl=60, reads=("recipe_summary",))
+    def summary():
+        calls.append("summary")
+
+    @cache.cache_by_tenant(ttl=60, reads=("ref_ingredient_categories",))
+    def categories():
+        calls.append("categories")
+
+    @cache.cache_by_tenant(ttl=60)
+    def undeclared():
+        calls.append("undeclared")
+
+    for load in (summary, categories, undeclared):
+        load()
+    cache.invalidate("tenant-a", {"ingredients", "recipe_summary"})
+    for load in (summary, categories, undeclared):
+        load()
+    assert calls == ["summary", "categories", "undeclared", "summary", "undeclared"]
+
+
+def test_invalidate_is_scoped_to_one_tenant_unless_global(active_tenant) -> None:
+    calls = []
+
+    @cache.cache_by_tenant(ttl=60, reads=("ingredients",))
+    def load():
+        calls.append(active_tenant["tid"])
+
+    load()
+    active_tenant["tid"] = "tenant-b"
+    load()
+    cache.invalidate("tenant-a", {"ingredients"})
+    load()
+    assert calls == ["tenant-a", "tenant-b"]
+    cache.invalidate_everywhere({"ingredients"})
+    load()
+    active_tenant["tid"] = "tenant-a"
+    load()
+    assert calls == ["tenant-a", "tenant-b", "tenant-b", "tenant-a"]
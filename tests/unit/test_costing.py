@@ -0,0 +1,144 @@
+import pytest
+
+from utils import costing
+
+CONVERSIONS = [
+    {"from_uom": "kg", "to_uom": "g", "factor": 1000},
+    {"from_uom": "g", "to_uom": "kg", "factor": 0.001},
+    {"from_uom": "l", "to_uom": "ml", "factor": 1000},
+]
+INGREDIENTS = [
+    # 2.50 per kg, counted in g
+    {
+        "id": "flour",
+        "package_qty": 1,
+        "package_uom": "kg",
+        "package_cost": 2.5,
+        "yield_pct": 100,
+        "base_uom": "g",
+    },
+    # 1.20 per litre
+    {
+        "id": "milk",
+        "package_qty": 1000,
+        "package_uom": "ml",
+        "package_cost": 1.2,
+        "yield_pct": 100,
+        "base_uom": "ml",
+    },
+    # 50% trim loss doubles the effective cost
+    {
+        "id": "leek",
+        "package_qty": 1000,
+        "package_uom": "g",
+        "package_cost": 4,
+        "yield_pct": 50,
+        "base_uom": "g",
+    },
+]
+
+
+def _recipe(rid, rtype="prep", yield_qty=1, yield_uom="kg", price=None, status="Active"):
+    return {
+        "id": rid,
+        "recipe_code": rid.upper(),
+        "name": rid,
+        "recipe_type": rtype,
+        "status": status,
+        "price": price,
+        "yield_qty": yield_qty,
+        "yield_uom": yield_uom,
+    }
+
+
+def _line(lid, recipe_id, ingredient_id, qty, uom):
+    return {
+        "id": lid,
+        "recipe_id": recipe_id,
+        "ingredient_id": ingredient_id,
+        "qty": qty,
+        "qty_uom": uom,
+    }
+
+
+def test_ingredient_lines_follow_view_formula() -> None:
+    recipes = [_recipe("batter", yield_qty=1, yield_uom="kg")]
+    lines = [
+        _line("l1", "batter", "flour", 400, "g"),  # 0.4 kg * 2.5
+        _line("l2", "batter", "milk", 0.5, "l"),  # 500 ml * 0.0012
+        _line("l3", "batter", "leek", 100, "g"),  # 100 g / 0.5 * 0.004
+    ]
+    out = costing.cost_recipes(INGREDIENTS, recipes, lines, CONVERSIONS)["batter"]
+    assert out["line_costs"] == pytest.approx({"l1": 1.0, "l2": 0.6, "l3": 0.8})
+    assert out["total_cost"] == pytest.approx(2.4)
+    assert out["base_uom"] == "g"  # min of the ingredients' base UOMs
+    assert out["conversion_factor"] == 1000
+    assert out["unit_cost"] == pytest.approx(2.4 / 1000)
+
+
+def test_nested_preps_are_costed_at_every_level() -> None:
+    recipes = [
+        _recipe("stock", yield_qty=1, yield_uom="kg"),
+        _recipe("sauce", yield_qty=500, yield_uom="g"),
+        _recipe("gratin", yield_qty=1, yield_uom="kg"),
+        _recipe("plate", rtype="service", yield_qty=1, yield_uom="unit", price=12),
+    ]
+    lines = [
+        _line("s1", "stock", "leek", 500, "g"),  # 4.00
+        _line("c1", "sauce", "stock", 250, "g"),  # 250 * 0.004 = 1.00
+        _line("c2", "sauce", "flour", 200, "g"),  # 0.50
+        _line("g1", "gratin", "sauce", 0.5, "kg"),  # 500 g * (1.5 / 500) = 1.50
+        _line("p1", "plate", "gratin", 200, "g"),  # 200 * 0.0015 = 0.30
+    ]
+    out = costing.cost_recipes(INGREDIENTS, recipes, lines, CONVERSIONS)
+    assert out["sauce"]["total_cost"] == pytest.approx(1.5)
+    assert out["gratin"]["total_cost"] == pytest.approx(1.5)
+    # gratin has no ingredient lines: its base UOM comes from the sub-prep
+    assert out["gratin"]["base_uom"] == "g"
+    assert out["plate"]["total_cost"] == pytest.approx(0.3)
+    assert out["plate"]["cost_pct"] == 2.5
+    assert out["plate"]["margin"] == 11.7
+
+
+def test_uncostable_lines_count_as_zero() -> None:
+    recipes = [
+        _recipe("dormant", status="Inactive"),
+        _recipe("dish", rtype="service", price=0),
+    ]
+    lines = [
+        _line("d0", "dormant", "flour", 1, "kg"),
+        _line("d1", "dish", "dormant", 100, "g"),  # inactive prep: not an input
+        _line("d2", "dish", "flour", 2, "cup"),  # no cup -> kg conversion
+        _line("d3", "dish", "ghost", 1, "g"),  # unknown input
+    ]
+    out = costing.cost_recipes(INGREDIENTS, recipes, lines, CONVERSIONS)
+    assert out["dormant"]["unit_cost"] is None
+    assert out["dish"]["line_costs"] == {"d1": 0.0, "d2": 0.0, "d3": 0.0}
+    assert out["dish"]["cost_pct"] is None and out["dish"]["margin"] is None
+
+
+def test_topological_order_puts_sub_recipes_first() -> None:
+    lines = [
+        _line("1", "c", "b", 1, "g"),
+        _line("2", "b", "a", 1, "g"),
+        _line("3", "c", "a", 1, "g"),
+        _line("4", "b", "flour", 1, "g"),
+    ]
+    assert costing.topological_order(["a", "b", "c"], lines) == ["a", "b", "c"]
+
+
+def test_cycles_are_reported() -> None:
+    lines = [
+        _line("1", "a", "b", 1, "g"),
+        _line("2", "b", "c", 1, "g"),
+        _line("3", "c", "a", 1, "g"),
+        _line("4", "d", "a", 1, "g"),
+    ]
+    with pytest.raises(costing.CycleError) as exc:
+        costing.topological_order(["a", "b", "c", "d"], lines)
+    assert set(exc.value.recipe_ids) >= {"a", "b", "c"}
+
+
+def test_round2_matches_postgres_half_away_from_zero() -> None:
+    assert costing.round2(2.675) == 2.68
+    assert costing.round2(-0.125) == -0.13
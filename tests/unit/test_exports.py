@@ -0,0 +1,50 @@
+import io
+
+import pandas as pd
+
+from utils import exports
+from utils import tenant_db as db
+
+
+def test_base_tables_of_tables_are_themselves() -> None:
+    assert exports.base_tables(["recipes", "ingredients"]) == ("ingredients", "recipes")
+
+
+def test_base_tables_of_derived_relations_follow_dependents() -> None:
+    for relation in set().union(*db.DEPENDENTS.values()):
+        expected = tuple(sorted(t for t, deps in db.DEPENDENTS.items() if relation in deps))
+        assert exports.base_tables([relation]) == expected, relation
+    assert exports.base_tables(["ingredient_grid"]) == (
+        "ingredients",
+        "ref_ingredient_categories",
+        "ref_storage_type",
+        "ref_uom_conversion",
+    )
+
+
+def test_base_tables_of_a_mix_are_merged_once() -> None:
+    assert exports.base_tables(["recipe_summary", "recipes", "sales"]) == (
+        "ingredients",
+        "recipe_lines",
+        "recipes",
+        "ref_uom_conversion",
+        "sales",
+    )
+
+
+def test_write_csv_takes_the_header_from_the_first_non_empty_frame() -> None:
+    frames = [
+        pd.DataFrame(columns=["code", "name"]),
+        pd.DataFrame({"code": ["A", "B"], "name": ["Apple", "Bean"]}),
+        pd.DataFrame(columns=["code", "name"]),
+        pd.DataFrame({"code": ["C"], "name": ["Corn"]}),
+    ]
+    data, rows = exports.write_csv(frames)
+    assert rows == 3
+    assert data.decode("utf-8").splitlines() == ["code,name", "A,Apple", "B,Bean", "C,Corn"]
+    assert pd.read_csv(io.BytesIO(data)).equals(pd.concat(frames[1::2], ignore_index=True))
+
+
+def test_write_csv_of_no_rows_is_empty() -> None:
+    assert exports.write_csv([]) == (b"", 0)
+    assert exports.write_csv([pd.DataFrame(columns=["code"])]) == (b"", 0)
@@ -0,0 +1,83 @@
+from dataclasses import fields
+from types import SimpleNamespace
+
+import pytest
+from streamlit.runtime.scriptrunner import ScriptRunContext
+from streamlit.runtime.scriptrunner.script_requests import RerunData, ScriptRequests
+
+from utils import fragments
+
+
+class FullRerun(Exception):
+    """Stands in for the exception st.rerun() raises."""
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """A script run with fragments "grid" and "form" registered; returns its request queue."""
+    requests = ScriptRequests()
+    ctx = SimpleNamespace(
+        script_requests=requests,
+        query_string="",
+        page_script_hash="page",
+        fragment_ids_this_run=[],
+    )
+    reg = fragments._Registry(
+        token=object(),
+        fragments={"grid": ("f-grid", frozenset()), "form": ("f-form", frozenset())},
+    )
+    monkeypatch.setattr(fragments, "get_script_run_ctx", lambda suppress_warning=False: ctx)
+    monkeypatch.setattr(fragments, "_registry", lambda: reg)
+
+    def full_rerun():
+        raise FullRerun
+
+    monkeypatch.setattr(fragments.st, "rerun", full_rerun)
+    return requests
+
+
+def test_installed_streamlit_has_queued_reruns() -> None:
+    # Fails on a Streamlit upgrade: check the private API below, then add the release
+    assert fragments._QUEUED_RERUNS
+
+
+def test_private_script_runner_api() -> None:
+    # What rerun() relies on, as of the releases in SUPPORTED_STREAMLIT
+    assert {"query_string", "page_script_hash", "fragment_id_queue"} <= {
+        f.name for f in fields(RerunData)
+    }
+    assert {
+        "script_requests",
+        "query_string",
+        "page_script_hash",
+        "fragment_ids_this_run",
+        "current_fragment_id",
+    } <= {f.name for f in fields(ScriptRunContext)}
+
+    # fragment reruns coalesce into one queue, in order, without interrupting the run
+    requests = ScriptRequests()
+    for fragment_id in ("a", "b", "a"):
+        assert requests.request_rerun(RerunData(fragment_id_queue=[fragment_id]))
+    assert requests.on_scriptrunner_yield() is None
+    assert requests.on_scriptrunner_ready().rerun_data.fragment_id_queue == ["a", "b"]
+
+
+def test_rerun_queues_fragments(session) -> None:
+    fragments.rerun("grid", "form")
+    request = session.on_scriptrunner_ready()
+    assert request.rerun_data.fragment_id_queue == ["f-grid", "f-form"]
+    assert request.rerun_data.page_script_hash == "page"
+
+
+def test_rerun_of_an_unknown_fragment_in_a_fragment_run_is_a_full_rerun(session) -> None:
+    fragments.get_script_run_ctx().fragment_ids_this_run = ["f-grid"]
+    with pytest.raises(FullRerun):
+        fragments.rerun("grid", "nope")
+
+
+def test_other_streamlit_releases_fall_back_to_a_full_rerun(session, monkeypatch) -> None:
+    monkeypatch.setattr(fragments, "_QUEUED_RERUNS", False)
+    with pytest.raises(FullRerun):
+        fragments.rerun("grid")
+    assert session.on_scriptrunner_ready().type.value == "STOP"  # nothing queued
+    fragments.rerun()  # nothing to rerun: no-op
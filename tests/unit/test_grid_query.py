@@ -0,0 +1,101 @@
+from utils.grid_query import GridQuery, from_state
+
+COLUMNS = ("name", "price", "cost_pct")
+
+
+def test_empty_state_is_an_empty_query() -> None:
+    assert from_state(None, COLUMNS) == GridQuery()
+    assert from_state({}, COLUMNS) == GridQuery()
+
+
+def test_sort_model_becomes_order_for_known_columns() -> None:
+    state = {
+        "sort": {
+            "sortModel": [
+                {"colId": "price", "sort": "desc"},
+                {"colId": "nope", "sort": "asc"},
+                {"colId": "name", "sort": "asc"},
+            ]
+        }
+    }
+    assert from_state(state, COLUMNS).order == (("price", True), ("name", False))
+
+
+def test_text_filters_escape_like_wildcards() -> None:
+    state = {
+        "filter": {
+            "filterModel": {
+                "name": {"filterType": "text", "type": "contains", "filter": "50%_off"},
+            }
+        }
+    }
+    assert from_state(state, COLUMNS).where == (("name", "ilike", "*50\\%\\_off*"),)
+
+
+def test_number_filters_and_ranges() -> None:
+    state = {
+        "filter": {
+            "filterModel": {
+                "price": {"filterType": "number", "type": "inRange", "filter": 5, "filterTo": 10},
+                "cost_pct": {"filterType": "number", "type": "greaterThan", "filter": 30},
+            }
+        }
+    }
+    assert from_state(state, COLUMNS).where == (
+        ("price", "gte", "5"),
+        ("price", "lte", "10"),
+        ("cost_pct", "gt", "30"),
+    )
+
+
+def test_blank_filters_map_to_is_null() -> None:
+    state = {"filter": {"filterModel": {"price": {"filterType": "number", "type": "blank"}}}}
+    assert from_state(state, COLUMNS).where == (("price", "is", "null"),)
+
+
+def test_or_combined_conditions_become_a_logic_tree() -> None:
+    state = {
+        "filter": {
+            "filterModel": {
+                "name": {
+                    "filterType": "text",
+                    "operator": "OR",
+                    "conditions": [
+                        {"filterType": "text", "type": "startsWith", "filter": "a,b"},
+                        {"filterType": "text", "type": "blank"},
+                    ],
+                }
+            }
+        }
+    }
+    query = from_state(state, COLUMNS)
+    assert query.where == ()
+    assert query.any_of == ('name.ilike."a,b*",name.is.null',)
+
+
+def test_and_combined_legacy_conditions_are_all_where_terms() -> None:
+    state = {
+        "filter": {
+            "filterModel": {
+                "price": {
+                    "filterType": "number",
+                    "operator": "AND",
+                    "condition1": {"filterType": "number", "type": "greaterThan", "filter": 1},
+                    "condition2": {"filterType": "number", "type": "lessThan", "filter": 9},
+                }
+            }
+        }
+    }
+    assert from_state(state, COLUMNS).where == (("price", "gt", "1"), ("price", "lt", "9"))
+
+
+def test_unsupported_filters_and_unknown_columns_are_ignored() -> None:
+    state = {
+        "filter": {
+            "filterModel": {
+                "name": {"filterType": "set", "values": ["x"]},
+                "secret": {"filterType": "text", "type": "equals", "filter": "x"},
+            }
+        }
+    }
+    assert from_state(state, COLUMNS) == GridQuery()
@@ -0,0 +1,397 @@
+import io
+import random
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.importers import (
+    read_chunks,
+    run_import,
+    validate_ingredients,
+    validate_recipes,
+)
+
+CATEGORIES = {"Dairy": "cat-1", "Dry": "cat-2"}
+BASE_UOM_MAP = {"kg": "g", "l": "ml", "lb": "g"}
+
+
+def _row_by_row(df, existing, category_map, base_uom_map):
+    """
+    The per-row loop pages/Settings.py used to run (one lookup per row), with
+    codes inserted earlier in the upload counted as existing.
+    """
+    existing = dict(existing)
+    valid_statuses = {"active", "inactive"}
+    valid_types = {"bought", "prepped"}
+    inserts, rejected, duplicates = [], [], []
+    for _, row in df.iterrows():
+        issues = []
+        ingredient_code = str(row["ingredient_code"]).strip()
+        name = str(row["name"]).strip()
+        ingredient_type = str(row["ingredient_type"]).strip().capitalize()
+        package_qty = row["package_qty"]
+        package_uom = str(row["package_uom"]).strip()
+        package_cost = row["package_cost"]
+        yield_pct = row["yield_pct"]
+        status = str(row["status"]).strip().capitalize()
+        category_id = category_map.get(str(row["category"]).strip())
+        base_uom = row.get("base_uom", "")
+        base_uom = "" if pd.isna(base_uom) else str(base_uom).strip().lower() or None
+
+        if not ingredient_code or len(ingredient_code) > 100:
+            issues.append("Invalid or missing ingredient_code")
+        if not name or len(name) > 100:
+            issues.append("Invalid or missing name")
+        if ingredient_type.lower() not in valid_types and ingredient_type != "":
+            issues.append("Invalid ingredient_type")
+        if pd.isna(package_qty) or package_qty < 0:
+            issues.append("Invalid package_qty")
+        if not package_uom:
+            issues.append("Missing package_uom")
+        if pd.isna(package_cost) or package_cost < 0:
+            issues.append("Invalid package_cost")
+        if 0 < yield_pct <= 2:
+            yield_pct = round(yield_pct * 100, 6)
+        if pd.isna(yield_pct) or yield_pct <= 0 or yield_pct > 200:
+            issues.append("Invalid yield_pct")
+        if status.lower() not in valid_statuses and status != "":
+            issues.append("Invalid status")
+        if not category_id:
+            issues.append("Category not found")
+
+        if not base_uom:
+            base_uom = None
+            if package_uom.lower() in ["each", "unit"]:
+                base_uom = "unit"
+            elif package_uom in base_uom_map:
+                base_uom = base_uom_map[package_uom]
+
+        if ingredient_code in existing:
+            duplicates.append(ingredient_code)
+            continue
+        if issues:
+            rejected.append((ingredient_code, "; ".join(issues)))
+        else:
+            inserts.append(
+                {
+                    "ingredient_code": ingredient_code,
+                    "name": name,
+                    "ingredient_type": (
+                        ingredient_type if ingredient_type.lower() in valid_types else "Bought"
+                    ),
+                    "package_qty": round(package_qty, 6),
+                    "package_uom": package_uom,
+                    "package_cost": round(package_cost, 6),
+                    "yield_pct": round(yield_pct, 6),
+                    "status": status if status.lower() in valid_statuses else "Active",
+                    "category_id": category_id,
+                    "base_uom": base_uom,
+                }
+            )
+            existing[ingredient_code] = inserts[-1]
+    return inserts, rejected, duplicates
+
+
+def _random_upload(seed: int, n: int = 400) -> pd.DataFrame:
+    rng = random.Random(seed)
+
+    def pick(*options):
+        return rng.choice(options)
+
+    rows = []
+    for i in range(n):
+        rows.append(
+            {
+                "ingredient_code": pick(f"C{i}", f" C{i} ", f"E{i % 30}", "", "X" * 101),
+                "name": pick(f"Item {i}", "", "N" * 101, f"  Item {i}"),
+                "ingredient_type": pick("bought", "Prepped", "", "weird", np.nan),
+                "package_qty": pick(1.0, 2.5, 0.0, -1.0, np.nan, 3.1234567),
+                "package_uom": pick("kg", "l", "each", "UNIT", "g", "", "oz"),
+                "package_cost": pick(9.99, 0.0, -2.0, np.nan, 1.23456789),
+                "yield_pct": pick(100.0, 0.85, 2.0, 0.0, 250.0, np.nan, 95.5),
+                "status": pick("active", "INACTIVE", "", "gone"),
+                "category": pick("Dairy", "Dry", "Meat", " Dairy "),
+                "base_uom": pick("G", " ml ", "", np.nan, np.nan),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_vectorized_validation_matches_the_row_loop(seed) -> None:
+    df = _random_upload(seed)
+    existing = {
+        f"E{i}": {"name": "x", "ingredient_type": "Bought", "package_cost": 1} for i in range(10)
+    }
+    inserts, rejected, duplicates = validate_ingredients(df, existing, CATEGORIES, BASE_UOM_MAP)
+    want_inserts, want_rejected, want_duplicates = _row_by_row(
+        df, existing, CATEGORIES, BASE_UOM_MAP
+    )
+
+    assert [d["ingredient_code"] for d in duplicates] == want_duplicates
+    got_rejected = list(
+        zip(rejected["ingredient_code"].astype(str).str.strip(), rejected["errors"])
+    )
+    assert got_rejected == want_rejected
+    assert len(inserts) == len(want_inserts)
+    for got, want in zip(inserts, want_inserts):
+        assert got.keys() == want.keys()
+        for k, v in want.items():
+            if isinstance(v, float):
+                assert got[k] == pytest.approx(v, abs=1e-9)
+            else:
+                assert got[k] == v
+
+
+def test_rejected_rows_keep_their_source_columns() -> None:
+    df = _random_upload(1, n=50)
+    _, rejected, _ = validate_ingredients(df, {}, CATEGORIES, BASE_UOM_MAP)
+    assert list(rejected.columns) == list(df.columns) + ["errors"]
+    assert (rejected["errors"] != "").all()
+
+
+def test_missing_base_uom_column_is_inferred_from_package_uom() -> None:
+    df = _random_upload(2, n=50).drop(columns=["base_uom"])
+    inserts, _, _ = validate_ingredients(df, {}, CATEGORIES, BASE_UOM_MAP)
+    assert inserts
+    for r in inserts:
+        want = (
+            "unit"
+            if r["package_uom"].lower() in ("each", "unit")
+            else BASE_UOM_MAP.get(r["package_uom"])
+        )
+        assert r["base_uom"] == want
+
+
+def _recipes_row_by_row(df, existing):
+    """
+    The per-row recipe loop pages/Settings.py used to run (NaN text cells read as
+    None), with codes inserted earlier in the upload counted as existing.
+    """
+    existing = dict(existing)
+    inserts, rejected, duplicates = [], [], []
+    for _, row in df.iterrows():
+        issues = []
+        recipe_code = str(row.get("recipe_code", "")).strip()
+        name = str(row.get("name", "")).strip()
+        status = str(row.get("status", "Active")).strip().capitalize()
+        base_yield_qty = row.get("base_yield_qty", 1.0)
+        base_yield_uom = row.get("base_yield_uom")
+        base_yield_uom = "" if pd.isna(base_yield_uom) else str(base_yield_uom).strip()
+        price = row.get("price", None)
+        recipe_category = row.get("recipe_category")
+        recipe_category = None if pd.isna(recipe_category) else str(recipe_category).strip()
+
+        if not recipe_code:
+            issues.append("Missing recipe_code")
+        elif len(recipe_code) > 32:
+            issues.append("recipe_code too long")
+        elif recipe_code in existing and existing[recipe_code]["name"] != name:
+            issues.append("Duplicate recipe_code with different name")
+        if not name:
+            issues.append("Missing name")
+        elif len(name) > 100:
+            issues.append("Name too long")
+        if status not in ["Active", "Inactive"]:
+            issues.append("Invalid status")
+        try:
+            if pd.isna(base_yield_qty):
+                base_yield_qty = 1.0
+            else:
+                base_yield_qty = round(float(base_yield_qty), 4)
+                if base_yield_qty <= 0:
+                    issues.append("base_yield_qty must be > 0")
+        except Exception:
+            issues.append("Invalid base_yield_qty")
+        if base_yield_uom and len(base_yield_uom) > 20:
+            issues.append(f"base_yield_uom too long: {base_yield_uom}")
+        try:
+            if pd.notna(price):
+                price = round(float(price), 4)
+                if price < 0:
+                    issues.append("price must be >= 0")
+            else:
+                price = None
+        except Exception:
+            issues.append("Invalid price")
+
+        if recipe_code in existing and existing[recipe_code]["name"] == name:
+            duplicates.append((recipe_code, name))
+            continue
+        if issues:
+            rejected.append((recipe_code, "; ".join(issues)))
+        else:
+            inserts.append(
+                {
+                    "recipe_code": recipe_code,
+                    "name": name,
+                    "status": status,
+                    "yield_qty": base_yield_qty,
+                    "yield_uom": base_yield_uom or None,
+                    "price": price,
+                    "recipe_category": recipe_category or None,
+                }
+            )
+            existing[recipe_code] = inserts[-1]
+    return inserts, rejected, duplicates
+
+
+def _random_recipes(seed: int, n: int = 300) -> pd.DataFrame:
+    rng = random.Random(seed)
+
+    def pick(*options):
+        return rng.choice(options)
+
+    return pd.DataFrame(
+        [
+            {
+                "recipe_code": pick(f"R{i}", f" R{i} ", f"E{i % 20}", "", "X" * 33),
+                "name": pick(f"Dish {i}", "Same", "", "N" * 101),
+                "status": pick("active", "Inactive", "gone", np.nan),
+                "base_yield_qty": pick(1, 2.5, 0, -1, "abc", np.nan, 1.23456),
+                "base_yield_uom": pick("kg", " portion ", "", np.nan, "U" * 21),
+                "price": pick(12.5, 0, -3, "free", np.nan, 9.87654),
+                "recipe_category": pick("Mains", " Sides ", "", np.nan),
+            }
+            for i in range(n)
+        ]
+    )
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_recipe_validation_matches_the_row_loop(seed) -> None:
+    df = _random_recipes(seed)
+    existing = {f"E{i}": {"name": "Same"} for i in range(10)}
+    inserts, rejected, duplicates = validate_recipes(df, existing)
+    want_inserts, want_rejected, want_duplicates = _recipes_row_by_row(df, existing)
+
+    assert list(zip(rejected["recipe_code"].astype(str).str.strip(), rejected["errors"])) == (
+        want_rejected
+    )
+    assert inserts == want_inserts
+    assert [(d["recipe_code"], d["name"]) for d in duplicates] == want_duplicates
+
+
+def test_chunked_import_matches_a_single_pass() -> None:
+    df = _random_upload(3, n=400)
+    existing = {
+        f"E{i}": {"name": "x", "ingredient_type": "Bought", "package_cost": 1} for i in range(5)
+    }
+    csv = df.to_csv(index=False)
+    whole = validate_ingredients(pd.read_csv(io.StringIO(csv)), existing, CATEGORIES, BASE_UOM_MAP)
+
+    written = []
+    reports = list(
+        run_import(
+            read_chunks(io.StringIO(csv), chunksize=64),
+            partial(validate_ingredients, category_map=CATEGORIES, base_uom_map=BASE_UOM_MAP),
+            write=written.extend,
+            batch_rows=25,
+            existing=existing,
+            key="ingredient_code",
+        )
+    )
+
+    assert [r.rows for r in reports] == [64] * 6 + [16]
+    assert [r["ingredient_code"] for r in written] == [r["ingredient_code"] for r in whole.inserts]
+    assert sum(r.inserted for r in reports) == len(whole.inserts)
+    assert sum(r.rejected for r in reports) == len(whole.rejected)
+    assert sum(r.duplicates for r in reports) == len(whole.duplicates)
+
+
+def test_failed_batch_stops_the_run_and_keeps_earlier_batches() -> None:
+    df = pd.DataFrame({"recipe_code": [f"R{i}" for i in range(10)], "name": "dish"})
+    written = []
+
+    def write(batch):
+        if batch[0]["recipe_code"] == "R6":
+            raise RuntimeError("boom")
+        written.extend(batch)
+
+    chunks = [df.iloc[:4], df.iloc[4:8], df.iloc[8:]]
+    reports = list(
+        run_import(chunks, partial(validate_recipes, existing={}), write=write, batch_rows=2)
+    )
+
+    assert [r.chunk for r in reports] == [1, 2]
+    assert [(r.inserted, r.error) for r in reports] == [(4, None), (2, "boom")]
+    assert [r["recipe_code"] for r in written] == [f"R{i}" for i in range(6)]
+
+
+def test_codes_repeated_in_the_upload_are_kept_once() -> None:
+    df = pd.DataFrame(
+        {
+            "recipe_code": ["R1", "R2", "R1", "R2", "R1"],
+            "name": ["Soup", "Stew", "Soup", "Pie", "Soup"],
+            "base_yield_qty": [-1, 1, 1, 1, 1],
+        }
+    )
+    inserts, rejected, duplicates = validate_recipes(df, {})
+
+    # The first R1 is invalid, so the second one is inserted and the third skipped
+    assert [(r["recipe_code"], r["name"]) for r in inserts] == [("R2", "Stew"), ("R1", "Soup")]
+    assert list(rejected["errors"]) == [
+        "base_yield_qty must be > 0",
+        "Duplicate recipe_code with different name",
+    ]
+    assert duplicates == [{"recipe_code": "R1", "name": "Soup"}]
+
+
+def test_codes_inserted_by_earlier_chunks_are_duplicates() -> None:
+    df = pd.DataFrame(
+        {
+            "ingredient_code": [f"C{i % 10}" for i in range(40)],
+            "name": "Milk",
+            "ingredient_type": "bought",
+            "package_qty": 1.0,
+            "package_uom": "l",
+            "package_cost": 2.0,
+            "yield_pct": 100.0,
+            "status": "active",
+            "category": "Dairy",
+        }
+    )
+    chunks = [df.iloc[:10], df.iloc[10:]]
+    validate = partial(validate_ingredients, category_map=CATEGORIES, base_uom_map=BASE_UOM_MAP)
+
+    # A dry run reports what the real run does
+    for write in (None, []):
+        duplicates = []
+        reports = list(
+            run_import(
+                chunks,
+                validate,
+                write=None if write is None else write.extend,
+                on_duplicates=duplicates.extend,
+                existing={},
+                key="ingredient_code",
+            )
+        )
+        assert [(r.valid, r.duplicates) for r in reports] == [(10, 0), (0, 30)]
+        assert {d["existing"]["name"] for d in duplicates} == {"Milk"}
+    assert [r["ingredient_code"] for r in write] == [f"C{i}" for i in range(10)]
+
+
+def test_inserted_counts_the_rows_the_writer_reports() -> None:
+    df = pd.DataFrame({"recipe_code": [f"R{i}" for i in range(5)], "name": "dish"})
+    existing: dict = {}
+
+    # A conflict-skipping writer: R1 was imported by another session meanwhile
+    def write(batch):
+        return sum(r["recipe_code"] != "R1" for r in batch)
+
+    reports = list(
+        run_import(
+            [df.iloc[:3], df.iloc[3:]],
+            validate_recipes,
+            write=write,
+            batch_rows=2,
+            existing=existing,
+            key="recipe_code",
+        )
+    )
+
+    assert [(r.valid, r.inserted) for r in reports] == [(3, 2), (2, 2)]
+    assert existing == {}  # the caller's dict is not modified
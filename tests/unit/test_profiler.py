@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from utils import profiler
+
+
+@pytest.fixture
+def rerun(monkeypatch):
+    """Fake script context; call rerun() to start the next rerun of the same session."""
+    ctx = SimpleNamespace(session_id="session-a", widget_ids_this_run=set())
+    monkeypatch.setattr(
+        profiler, "current_rerun", lambda: (ctx.session_id, ctx.widget_ids_this_run)
+    )
+    profiler._sessions.clear()
+
+    def next_run():
+        ctx.widget_ids_this_run = set()
+
+    yield next_run
+    profiler._sessions.clear()
+
+
+def _client() -> httpx.Client:
+    def handler(request):
+        if "/rpc/" in request.url.path:
+            return httpx.Response(200, json=3)
+        return httpx.Response(200, json=[{"id": 1}, {"id": 2}], headers={"content-range": "0-1/*"})
+
+    return httpx.Client(transport=profiler.ProfiledTransport(httpx.MockTransport(handler)))
+
+
+def test_transport_records_name_filters_rows_and_bytes(rerun) -> None:
+    client = _client()
+    res = client.get(
+        "http://x/rest/v1/ingredients",
+        params={"select": "id", "tenant_id": "eq.t1", "deleted_at": "is.null", "limit": "5"},
+    )
+    client.post("http://x/rest/v1/rpc/get_recipe_details_mt", json={"p_tenant": "t1"})
+    rerun()
+
+    run = profiler.last_run()
+    assert [c.name for c in run.calls] == ["ingredients", "rpc/get_recipe_details_mt"]
+    first, second = run.calls
+    assert first.filters == "tenant_id=eq.t1&deleted_at=is.null"
+    assert (first.rows, first.bytes, first.status) == (2, len(res.content), 200)
+    assert second.rows is None and second.method == "POST"
+    assert run.totals()["calls"] == 2
+
+
+def test_runs_rotate_per_rerun_and_flag_repeated_calls(rerun) -> None:
+    client = _client()
+    for i in range(profiler.N_PLUS_ONE_CALLS):
+        client.get("http://x/rest/v1/recipe_lines", params={"recipe_id": f"eq.{i}"})
+    rerun()
+    client.get("http://x/rest/v1/recipes")
+
+    previous = profiler.last_run()
+    assert len(previous.calls) == profiler.N_PLUS_ONE_CALLS
+    assert previous.repeated() == {"recipe_lines": profiler.N_PLUS_ONE_CALLS}
+
+    rerun()
+    assert [c.name for c in profiler.last_run().calls] == ["recipes"]
+    assert profiler.last_run().seq == previous.seq + 1
+
+
+def test_calls_outside_streamlit_are_only_logged(monkeypatch) -> None:
+    monkeypatch.setattr(profiler, "current_rerun", lambda: None)
+    _client().get("http://x/rest/v1/recipes")
+    assert profiler.last_run() is None
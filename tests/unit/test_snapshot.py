@@ -0,0 +1,125 @@
+import io
+import json
+import zipfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from utils import snapshot
+
+TENANT = "00000000-0000-0000-0000-0000000000a1"
+
+
+@pytest.fixture(autouse=True)
+def tenant(monkeypatch):
+    monkeypatch.setattr(snapshot.db, "active_tenant_id", lambda: TENANT)
+
+
+def _pages():
+    # ingredients in two pages: as the REST path returns them, then the direct SQL path
+    rest = pd.DataFrame(
+        {
+            "id": ["i-1", "i-2"],
+            "tenant_id": [TENANT, TENANT],
+            "ingredient_code": ["FLOUR", "MILK"],
+            "name": ["Flour", "Milk"],
+            "package_qty": [1000, 1],
+            "package_cost": ["2.50", None],
+            "updated_at": ["2024-05-01T12:00:00+02:00", "2024-05-02T08:30:00.123456+00:00"],
+        }
+    )
+    sql = pd.DataFrame(
+        {
+            "id": ["i-3"],
+            "tenant_id": [TENANT],
+            "ingredient_code": ["EGG"],
+            "name": ["Egg"],
+            "package_qty": [Decimal("12")],
+            "package_cost": [Decimal("3.1")],
+            "updated_at": [datetime(2024, 5, 3, 9, 0, tzinfo=timezone.utc)],
+        }
+    )
+    sales = pd.DataFrame(
+        {
+            "id": ["s-1"],
+            "recipe_id": ["r-1"],
+            "sale_date": ["2024-05-04"],
+            "qty": [2],
+            "created_at": ["2024-05-04T18:15:00"],
+        }
+    )
+    return [("ingredients", rest), ("ingredients", sql), ("sales", sales)]
+
+
+@pytest.mark.parametrize("fmt", sorted(snapshot.FORMATS))
+def test_snapshot_round_trip(fmt) -> None:
+    data, total = snapshot.write(_pages(), fmt)
+    snap = snapshot.open_snapshot(io.BytesIO(data))
+
+    assert total == 4
+    assert snap.manifest["format"] == fmt
+    assert snap.manifest["tenant_id"] == TENANT
+    assert snap.manifest["rows"] == {name: 0 for name in snapshot.RELATIONS} | {
+        "ingredients": 3,
+        "sales": 1,
+    }
+    assert sorted(snap.files.namelist()) == sorted(
+        [name + snapshot.FORMATS[fmt] for name in snapshot.RELATIONS] + [snapshot.MANIFEST]
+    )
+
+    # every relation reads back with its fixed schema, empty ones included
+    for name in snapshot.RELATIONS:
+        batches = list(snap.batches(name))
+        assert all(b.schema == snapshot.schema(name) for b in batches)
+        assert sum(b.num_rows for b in batches) == snap.manifest["rows"][name]
+
+    ingredients = snap.frame("ingredients")
+    assert ingredients["ingredient_code"].tolist() == ["FLOUR", "MILK", "EGG"]
+    assert ingredients["package_cost"].dtype == "float64"
+    assert ingredients["package_cost"].tolist()[0::2] == [2.5, 3.1]
+    assert pd.isna(ingredients["package_cost"][1])
+    assert ingredients["updated_at"].tolist() == [
+        pd.Timestamp("2024-05-01T10:00:00", tz="UTC"),
+        pd.Timestamp("2024-05-02T08:30:00.123456", tz="UTC"),
+        pd.Timestamp("2024-05-03T09:00:00", tz="UTC"),
+    ]
+    # columns the pages did not carry are null, not missing
+    assert ingredients["status"].isna().all()
+
+    sales = snap.frame("sales")
+    assert sales["sale_date"].tolist() == [date(2024, 5, 4)]
+    assert sales["created_at"].tolist() == [pd.Timestamp("2024-05-04T18:15:00")]
+
+
+def test_schema_types() -> None:
+    ingredients = snapshot.schema("ingredients")
+    assert ingredients.field("updated_at").type == pa.timestamp("us", tz="UTC")
+    assert ingredients.field("package_cost").type == pa.float64()
+    assert ingredients.field("id").type == pa.string()
+    sales = snapshot.schema("sales")
+    assert sales.field("sale_date").type == pa.date32()
+    assert sales.field("created_at").type == pa.timestamp("us")
+
+
+def _zip(files) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    return buf.getvalue()
+
+
+def test_unknown_formats_are_rejected() -> None:
+    with pytest.raises(ValueError, match="Unknown snapshot format 'csv'"):
+        snapshot.write(_pages(), "csv")
+    manifest = json.dumps({"format": "csv", "tenant_id": TENANT, "rows": {}})
+    with pytest.raises(ValueError, match="Unknown snapshot format 'csv'"):
+        snapshot.open_snapshot(_zip({snapshot.MANIFEST: manifest}))
+
+
+def test_a_zip_without_manifest_is_not_a_snapshot() -> None:
+    with pytest.raises(ValueError, match="manifest.json is missing"):
+        snapshot.open_snapshot(_zip({"ingredients.parquet": b""}))
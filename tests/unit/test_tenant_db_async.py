@@ -0,0 +1,139 @@
+import asyncio
+import inspect
+import json
+
+import httpx
+import pytest
+from postgrest import AsyncPostgrestClient
+
+from utils import tenant_db_async as dba
+
+TENANT = "tenant-a"
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """Requests the module sends, answered by a mock transport (no pinned tenant)."""
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        return httpx.Response(200, json=[])
+
+    def client() -> AsyncPostgrestClient:
+        http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return AsyncPostgrestClient("http://x/rest/v1", http_client=http)
+
+    monkeypatch.setattr(dba, "_client", client)
+    monkeypatch.setattr(dba, "get_active_tenant", lambda: None)
+    return sent
+
+
+def _params(request: httpx.Request):
+    return dict(request.url.params.multi_items())
+
+
+def test_reads_of_tenant_tables_are_scoped(requests) -> None:
+    asyncio.run(dba.table("recipes", tenant_id=TENANT).select("id").execute())
+    asyncio.run(dba.table("recipes", TENANT, include_deleted=True).select("id").execute())
+    asyncio.run(dba.table("ref_uom_conversion").select("*").execute())
+
+    assert _params(requests[0]) == {
+        "select": "id",
+        "tenant_id": f"eq.{TENANT}",
+        "deleted_at": "is.null",
+    }
+    assert _params(requests[1]) == {"select": "id", "tenant_id": f"eq.{TENANT}"}
+    assert _params(requests[2]) == {"select": "*"}
+
+
+def test_select_all_pages_stay_scoped(requests) -> None:
+    asyncio.run(dba.table("sales", tenant_id=TENANT).select_all("qty", recipe_id="r-1"))
+    (request,) = requests  # an empty first page ends the read
+    assert _params(request) == {
+        "select": "qty,id",
+        "tenant_id": f"eq.{TENANT}",
+        "deleted_at": "is.null",
+        "recipe_id": "eq.r-1",
+        "order": "id.asc",
+        "limit": "1000",
+    }
+
+
+def test_writes_are_stamped_and_scoped(requests, monkeypatch) -> None:
+    events = []
+    monkeypatch.setattr(dba, "publish_change", lambda *args: events.append(args))
+
+    asyncio.run(dba.insert_many("ingredients", [{"name": "Flour"}], tenant_id=TENANT).execute())
+    asyncio.run(dba.soft_delete("recipes", tenant_id=TENANT, id="r-1").execute())
+
+    insert, delete = requests
+    assert json.loads(insert.content) == [{"name": "Flour", "tenant_id": TENANT}]
+    assert _params(delete) == {"tenant_id": f"eq.{TENANT}", "id": "eq.r-1"}
+    assert [e[:2] for e in events] == [("ingredients", TENANT), ("recipes", TENANT)]
+
+
+def test_tenant_rpcs_get_p_tenant(requests) -> None:
+    params = {"p_recipe_id": "r-1"}
+    asyncio.run(dba.rpc("get_recipe_details_mt", params, tenant_id=TENANT).execute())
+    asyncio.run(dba.rpc("get_recipe_details_mt", {"p_tenant": "other"}, TENANT).execute())
+    asyncio.run(dba.rpc("refresh_uom_conversion_closure").execute())
+
+    assert [r.url.path for r in requests] == [
+        "/rest/v1/rpc/get_recipe_details_mt",
+        "/rest/v1/rpc/get_recipe_details_mt",
+        "/rest/v1/rpc/refresh_uom_conversion_closure",
+    ]
+    assert json.loads(requests[0].content) == {"p_recipe_id": "r-1", "p_tenant": TENANT}
+    assert json.loads(requests[1].content) == {"p_tenant": "other"}
+    assert json.loads(requests[2].content) == {}
+    assert params == {"p_recipe_id": "r-1"}  # the caller's dict is not modified
+
+
+def test_tenant_calls_without_a_tenant_fail(requests) -> None:
+    with pytest.raises(ValueError, match="No active tenant"):
+        dba.table("recipes").select("id")
+    with pytest.raises(ValueError, match="No active tenant"):
+        dba.rpc("get_recipe_details_mt", {"p_recipe_id": "r-1"})
+    assert requests == []
+
+
+def test_gather_bounds_concurrency_and_keeps_order() -> None:
+    running, peak = 0, 0
+
+    async def job(i: int) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001 * (i % 3))
+        running -= 1
+        return i
+
+    async def main():
+        return await dba.gather(*(job(i) for i in range(20)), limit=4)
+
+    assert asyncio.run(main()) == list(range(20))
+    assert peak == 4
+
+
+def test_gather_fails_fast_and_cancels_the_rest() -> None:
+    finished = []
+
+    async def job(i: int) -> int:
+        if i == 0:
+            raise RuntimeError("boom")
+        await asyncio.sleep(1)
+        finished.append(i)
+        return i
+
+    jobs = [job(i) for i in range(5)]
+
+    async def main():
+        with pytest.raises(RuntimeError, match="boom"):
+            await dba.gather(*jobs, limit=2)
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert finished == []
+    # jobs cancelled before their turn are closed, not left "never awaited"
+    assert {inspect.getcoroutinestate(j) for j in jobs} == {inspect.CORO_CLOSED}
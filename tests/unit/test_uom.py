@@ -0,0 +1,115 @@
+import itertools
+import random
+
+import pandas as pd
+import pytest
+
+from utils import uom
+from utils.costing import cost_recipes
+
+
+def _conv(*rows):
+    return [{"from_uom": f, "to_uom": t, "factor": x} for f, t, x in rows]
+
+
+def test_chained_pairs_get_a_factor() -> None:
+    c = uom.closure(_conv(("kg", "g", 1000), ("g", "oz", 0.035274)))
+    assert c.factor("kg", "oz") == pytest.approx(1000 * 0.035274)
+    assert c.factor("oz", "kg") is None
+    assert c.factor("kg", "kg") == 1.0
+    assert c.factor("lb", "kg") is None
+    assert {(p["from_uom"], p["to_uom"]): p["hops"] for p in c.pairs()} == {
+        ("kg", "g"): 1,
+        ("g", "oz"): 1,
+        ("kg", "oz"): 2,
+    }
+
+
+def test_direct_rows_win_then_fewest_hops_then_first_intermediate() -> None:
+    c = uom.closure(
+        _conv(
+            ("a", "b", 2),
+            ("b", "c", 3),
+            ("c", "d", 5),
+            ("a", "d", 7),  # direct beats a->b->c->d
+            ("a", "x", 11),
+            ("x", "d", 13),
+            ("x", "e", 17),
+            ("b", "e", 19),  # a->b->e and a->x->e: b sorts first
+        )
+    )
+    assert c.factor("a", "d") == 7
+    assert c.factor("a", "e") == 2 * 19
+    assert c.factor("b", "d") == 3 * 5
+
+
+def test_closure_is_cached_per_version_of_the_table() -> None:
+    rows = _conv(("kg", "g", 1000), ("g", "mg", 1000))
+    first = uom.closure(rows)
+    assert uom.closure(list(reversed(rows))) is first
+    assert uom.closure(pd.DataFrame(rows)) is first
+    changed = uom.closure(rows + _conv(("mg", "ug", 1000)))
+    assert changed is not first
+    assert changed.factor("kg", "ug") == pytest.approx(1e9)
+    with pytest.raises(ValueError):
+        first.factors[0, 0] = 2.0
+
+
+def test_closure_matches_a_breadth_first_search() -> None:
+    rng = random.Random(7)
+    units = [f"u{i}" for i in range(12)]
+    rows = {
+        (a, b): round(rng.uniform(0.1, 10), 3)
+        for a, b in itertools.permutations(units, 2)
+        if rng.random() < 0.12
+    }
+    c = uom.closure(_conv(*((a, b, x) for (a, b), x in rows.items())))
+    for src in units:
+        seen = {src: (0, 1.0)}
+        frontier = [src]
+        while frontier:
+            nxt = {}
+            for (a, b), x in sorted(rows.items(), key=lambda kv: (kv[0][0], kv[0][1])):
+                if a in frontier and b not in seen and b not in nxt:
+                    nxt[b] = (seen[a][0] + 1, seen[a][1] * x)
+            seen.update(nxt)
+            frontier = sorted(nxt)
+        for dst in units:
+            if dst == src:
+                continue
+            got = c.factor(src, dst)
+            if dst in seen:
+                assert got == pytest.approx(seen[dst][1])
+                assert c.hops[c.vocab.get_loc(src), c.vocab.get_loc(dst)] == seen[dst][0]
+            else:
+                assert got is None
+
+
+def test_costing_costs_lines_through_a_chained_conversion() -> None:
+    ingredients = [
+        {
+            "id": "I1",
+            "package_qty": 1.0,
+            "package_uom": "oz",
+            "package_cost": 2.0,
+            "yield_pct": 100.0,
+            "base_uom": "g",
+        }
+    ]
+    recipes = [
+        {
+            "id": "S1",
+            "recipe_code": "S1",
+            "name": "S1",
+            "recipe_type": "service",
+            "status": "Active",
+            "price": 10.0,
+            "yield_qty": None,
+            "yield_uom": None,
+        }
+    ]
+    lines = [{"id": "L1", "recipe_id": "S1", "ingredient_id": "I1", "qty": 0.5, "qty_uom": "kg"}]
+    conversions = _conv(("kg", "g", 1000), ("g", "oz", 0.035274))
+    costs = cost_recipes(ingredients, recipes, lines, conversions)
+    assert costs["S1"]["line_costs"]["L1"] == pytest.approx(0.5 * 1000 * 0.035274 * 2.0)
+    assert costs["S1"]["margin"] is not None
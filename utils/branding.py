@@ -5,6 +5,7 @@ from pathlib import Path
 import streamlit as st
 
 from utils import tenant_db as db
+from utils.cache import WRITE_AWARE_TTL, cache_by_tenant
 from utils.tenant_state import get_active_tenant
 
 CONFIG_PATH = Path("config/branding_config.json")
@@ -12,7 +13,7 @@ _DEFAULT_PRIMARY = "#111827"
 _DEFAULT_SECONDARY = "#6b7280"
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, shared=True, reads=())
 def _load_json_fallback():
     try:
         if CONFIG_PATH.exists():
@@ -36,7 +37,7 @@ def _normalize(logo_url, prim, sec, fb):
     return {"logo_url": logo, "primary": primary, "secondary": secondary}
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, reads=("tenants",))
 def load_branding():
     fb = _load_json_fallback()
     tid = get_active_tenant()
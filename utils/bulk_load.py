@@ -0,0 +1,179 @@
+"""
+COPY fast path for bulk loads over a direct Postgres connection (utils.db).
+
+The REST client sends writes as JSON in capped batches, so 100k rows cost
+hundreds of round trips. `bulk_load` streams rows with `COPY ... FROM STDIN`
+into a temp staging table, then merges them into the target with a single
+INSERT ... SELECT. Statement-level triggers (the cost store, V016) therefore
+fire once per load instead of once per batch.
+
+A direct connection bypasses RLS, so tenant scoping happens here: rows without
+a `tenant_id` are stamped with the caller's tenant (as `tenant_db.insert_many`
+does), and a row carrying another tenant's id fails the whole load. The
+statement-level tenant guards (V020) still reject cross-tenant references,
+once per merge.
+
+Only available when DB_* secrets are configured (`utils.db.direct_url_configured`).
+This module does not import the supabase client.
+"""
+
+from __future__ import annotations
+
+import math
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from psycopg import sql
+from sqlalchemy.engine import Connection, Engine
+
+from utils.db import get_engine
+
+Row = Dict[str, Any]
+
+# Table -> natural key per tenant (None: append-only, every row is inserted)
+BULK_TABLES: Dict[str, Optional[Tuple[str, ...]]] = {
+    "ingredients": ("ingredient_code",),
+    "recipes": ("recipe_code",),
+    "recipe_lines": None,
+    "sales": None,
+}
+
+# Never taken from the payload
+_GENERATED = {"created_at", "updated_at", "deleted_at"}
+
+
+class LoadResult(NamedTuple):
+    staged: int  # rows copied into the staging table
+    written: int  # rows inserted (or updated, with update=True)
+
+
+def _clean(value: Any) -> Any:
+    # pandas hands over NaN for empty cells
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _table_columns(cur, table: str) -> List[str]:
+    cur.execute(
+        "select column_name from information_schema.columns "
+        "where table_schema = 'public' and table_name = %s order by ordinal_position",
+        (table,),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def _copy_rows(cur, columns: List[str], rows: Iterator[Row], tenant_id: str) -> int:
+    staged = 0
+    copy_sql = sql.SQL("copy _bulk_stage ({}) from stdin").format(
+        sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    with cur.copy(copy_sql) as copy:
+        for r in rows:
+            values = [_clean(r.get(c)) for c in columns]
+            if values[0] is None:
+                values[0] = tenant_id
+            elif str(values[0]) != str(tenant_id):
+                raise ValueError(f"Row for tenant {values[0]} in a load for tenant {tenant_id}")
+            copy.write_row(values)
+            staged += 1
+    return staged
+
+
+def _merge_sql(table: str, columns: List[str], key: Optional[Tuple[str, ...]], update: bool):
+    cols = sql.SQL(", ").join(map(sql.Identifier, columns))
+    if key is None:
+        return sql.SQL("insert into public.{} ({cols}) select {cols} from _bulk_stage").format(
+            sql.Identifier(table), cols=cols
+        )
+
+    conflict = sql.SQL(", ").join(map(sql.Identifier, ("tenant_id", *key)))
+    settable = [c for c in columns if c not in ("tenant_id", *key)] if update else []
+    if settable:
+        action = sql.SQL("do update set {}").format(
+            sql.SQL(", ").join(
+                sql.SQL("{c} = excluded.{c}").format(c=sql.Identifier(c)) for c in settable
+            )
+        )
+        order = sql.SQL("_ord desc")  # last occurrence in the load wins
+    else:
+        action = sql.SQL("do nothing")
+        order = sql.SQL("_ord")  # first occurrence wins
+    # distinct on: one row per key, so "do update" never touches a row twice
+    return sql.SQL(
+        "insert into public.{table} ({cols}) "
+        "select distinct on ({conflict}) {cols} from _bulk_stage order by {conflict}, {order} "
+        "on conflict ({conflict}) {action}"
+    ).format(table=sql.Identifier(table), cols=cols, conflict=conflict, order=order, action=action)
+
+
+def _load(
+    conn: Connection, table: str, rows: Iterable[Row], tenant_id: str, update: bool
+) -> LoadResult:
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return LoadResult(0, 0)
+
+    cur = conn.connection.driver_connection.cursor()
+    known = set(_table_columns(cur, table))
+    unknown = sorted(set(first) - known)
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(unknown)}")
+    # tenant_id first, so _copy_rows can stamp it by position
+    columns = ["tenant_id"] + [c for c in first if c not in _GENERATED and c != "tenant_id"]
+    key = BULK_TABLES[table]
+    missing_key = [k for k in key or () if k not in columns]
+    if missing_key:
+        raise ValueError(f"{table} rows need {', '.join(missing_key)}")
+
+    cur.execute(
+        sql.SQL(
+            "create temp table _bulk_stage on commit drop as "
+            "select {} from public.{} with no data"
+        ).format(sql.SQL(", ").join(map(sql.Identifier, columns)), sql.Identifier(table))
+    )
+    cur.execute("alter table _bulk_stage add column _ord bigserial")
+    staged = _copy_rows(cur, columns, chain([first], rows), tenant_id)
+    cur.execute(_merge_sql(table, columns, key, update))
+    written = cur.rowcount
+    cur.execute("drop table _bulk_stage")
+    return LoadResult(staged, written)
+
+
+def bulk_load(
+    table: str,
+    rows: Iterable[Row],
+    tenant_id: str,
+    *,
+    update: bool = False,
+    bind: Union[Engine, Connection, None] = None,
+) -> LoadResult:
+    """
+    COPY `rows` into `table` for `tenant_id` and merge them in one statement.
+
+    Columns come from the first row; later rows may omit keys (loaded as NULL).
+    For keyed tables (BULK_TABLES) a row whose code already exists for the
+    tenant is skipped, or updated with `update=True`. `rows` may be a generator;
+    it is streamed, not materialized. Raises ValueError (nothing is written) if
+    a row's `tenant_id` is not `tenant_id`.
+
+    `bind` defaults to a new engine and runs in its own transaction; pass a
+    Connection to load inside the caller's transaction.
+    """
+    if table not in BULK_TABLES:
+        raise ValueError(f"bulk_load does not support {table!r}")
+    if not tenant_id:
+        raise ValueError("bulk_load needs a tenant_id")
+
+    if isinstance(bind, Connection):
+        return _load(bind, table, rows, tenant_id, update)
+    with (bind or get_engine()).begin() as conn:
+        return _load(conn, table, rows, tenant_id, update)
+
+
+__all__ = [
+    "BULK_TABLES",
+    "LoadResult",
+    "bulk_load",
+]
@@ -1,17 +1,155 @@
-import streamlit as st
+"""
+Process-wide, tenant-namespaced cache for data loaders.
+
+Every entry lives in a per-tenant bucket (or the shared bucket for global
+data such as the tenants list). Buckets are LRU-ordered and capped, so one
+busy tenant cannot push everyone else out, and invalidation only touches the
+bucket that changed instead of wiping the whole process like
+`st.cache_data.clear()` does.
+
+Loaders declare the relations they read (`reads=`). Writes made through
+`utils.tenant_db` publish change events that evict only the entries reading an
+affected relation, which is what makes the long TTLs safe.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Tuple
 
 from utils.tenant_state import get_active_tenant
 
+NO_TENANT = "no-tenant"
+SHARED = "__shared__"
+MAX_ENTRIES_PER_TENANT = 256
+# Safe for loaders that declare `reads=`: local writes evict them immediately.
+WRITE_AWARE_TTL = 4 * 60 * 60
+
+_MISS = object()
+_lock = threading.RLock()
+# scope -> key -> (expires_at, reads, value); reads=None means "depends on everything"
+_buckets: Dict[str, "OrderedDict[Hashable, Tuple[float, Optional[FrozenSet[str]], Any]]"] = {}
+
+
+def _freeze(value: Any) -> Hashable:
+    """Turn call arguments into a hashable cache key (lists/dicts/sets included)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    return value
+
+
+def _get(scope: str, key: Hashable) -> Any:
+    with _lock:
+        bucket = _buckets.get(scope)
+        if not bucket or key not in bucket:
+            return _MISS
+        expires_at, _reads, value = bucket[key]
+        if expires_at < time.monotonic():
+            del bucket[key]
+            return _MISS
+        bucket.move_to_end(key)
+        return value
+
+
+def _put(
+    scope: str, key: Hashable, value: Any, ttl: float, reads: Optional[FrozenSet[str]]
+) -> None:
+    with _lock:
+        bucket = _buckets.setdefault(scope, OrderedDict())
+        bucket[key] = (time.monotonic() + ttl, reads, value)
+        bucket.move_to_end(key)
+        while len(bucket) > MAX_ENTRIES_PER_TENANT:
+            bucket.popitem(last=False)
+
+
+def cache_by_tenant(ttl: int = 60, *, shared: bool = False, reads: Optional[Iterable[str]] = None):
+    """
+    Cache a loader's result per active tenant.
+
+    Args:
+        ttl: Seconds before an entry expires.
+        shared: Store in the shared bucket (data that is the same for every tenant).
+        reads: Tables/views the loader reads. Writes to any of them (or to a table
+               they derive from) evict the entry. None = evicted by any write;
+               () = never evicted by writes (e.g. local config files).
+
+    Callers get a deep copy, so mutating a returned DataFrame never corrupts the cache.
+    """
 
-def cache_by_tenant(ttl: int = 60):
     def wrap(fn):
-        @st.cache_data(ttl=ttl)
-        def _inner(_tid, *args, **kwargs):
-            return fn(*args, **kwargs)
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        read_set = frozenset(reads) if reads is not None else None
 
+        @wraps(fn)
         def caller(*args, **kwargs):
-            return _inner(get_active_tenant("no-tenant"), *args, **kwargs)
+            scope = SHARED if shared else get_active_tenant(NO_TENANT)
+            key = (name, _freeze(args), _freeze(kwargs))
+            value = _get(scope, key)
+            if value is _MISS:
+                value = fn(*args, **kwargs)
+                _put(scope, key, value, ttl, read_set)
+            return copy.deepcopy(value)
 
         return caller
 
     return wrap
+
+
+def _evict(bucket, relations: FrozenSet[str]) -> None:
+    stale = [k for k, (_, reads, _) in bucket.items() if reads is None or reads & relations]
+    for k in stale:
+        del bucket[k]
+
+
+def invalidate(tenant_id: Optional[str], relations: Iterable[str]) -> None:
+    """Evict one tenant's entries that read any of `relations`."""
+    rel = frozenset(relations)
+    with _lock:
+        bucket = _buckets.get(tenant_id or NO_TENANT)
+        if bucket:
+            _evict(bucket, rel)
+
+
+def invalidate_everywhere(relations: Iterable[str]) -> None:
+    """Evict entries reading `relations` in every bucket (writes to global tables)."""
+    rel = frozenset(relations)
+    with _lock:
+        for bucket in _buckets.values():
+            _evict(bucket, rel)
+
+
+def clear_tenant(tenant_id: Optional[str]) -> None:
+    """Drop every cached entry for one tenant; other tenants are untouched."""
+    with _lock:
+        _buckets.pop(tenant_id or NO_TENANT, None)
+
+
+def clear_shared() -> None:
+    """Drop the shared (cross-tenant) bucket, e.g. after editing the tenants list."""
+    with _lock:
+        _buckets.pop(SHARED, None)
+
+
+def clear_all() -> None:
+    with _lock:
+        _buckets.clear()
+
+
+__all__ = [
+    "cache_by_tenant",
+    "invalidate",
+    "invalidate_everywhere",
+    "clear_tenant",
+    "clear_shared",
+    "clear_all",
+    "MAX_ENTRIES_PER_TENANT",
+    "WRITE_AWARE_TTL",
+]
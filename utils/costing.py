@@ -0,0 +1,238 @@
+"""
+Multi-level recipe costing over the recipe dependency DAG.
+
+The V007 views stopped early: `prep_costs` only summed ingredient lines
+(`recipe_line_costs_base`), so a prep that used another prep got that line at
+0. This module walks recipes in topological order (sub-recipes first),
+computes each prep's unit cost exactly once and reuses it for every parent, so
+any depth is costed in one O(recipes + lines) pass.
+
+The pages read costs from the V016 cost store, whose triggers
+(`refresh_recipe_costs`) apply the same rules in SQL. `cost_recipes` is the
+reference they are specified by: the smoke tests check the store against it.
+
+Per-line and per-recipe formulas are the V007 views' formulas; only the nesting
+depth differs, and UOM factors come from the transitive closure of
+`ref_uom_conversion` (utils/uom.py) rather than direct pairs only. Inputs are
+plain row dicts as returned by `tenant_db` selects for one tenant (deleted rows
+already filtered out).
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils import uom
+
+Row = Dict[str, Any]
+Factors = Dict[Tuple[str, str], float]
+
+
+class CycleError(ValueError):
+    """Raised when recipe lines form a cycle (a recipe that ends up using itself)."""
+
+    def __init__(self, recipe_ids: Iterable[str]):
+        self.recipe_ids = sorted(recipe_ids)
+        super().__init__(f"Recipe dependency cycle involving: {', '.join(self.recipe_ids)}")
+
+
+def _num(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def round2(value: float) -> float:
+    """Round half away from zero to 2 places, like Postgres `round(numeric, 2)`."""
+    return float(Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def uom_factors(conversions: Iterable[Row]) -> Factors:
+    """
+    (from_uom, to_uom) -> factor for every pair reachable through `ref_uom_conversion`
+    rows, chained conversions included (see utils/uom.py).
+    """
+    return uom.closure(conversions).as_dict()
+
+
+def convert(factors: Factors, from_uom: Optional[str], to_uom: Optional[str]) -> Optional[float]:
+    """Factor from one UOM to another: 1 when equal, None when no conversion exists."""
+    if from_uom is not None and from_uom == to_uom:
+        return 1.0
+    return factors.get((from_uom, to_uom))
+
+
+def ingredient_line_cost(line: Row, ing: Optional[Row], factors: Factors) -> Optional[float]:
+    """
+    Cost of a line pointing at an ingredient (same rules as `recipe_line_costs_base`).
+    None when it cannot be costed (no ingredient, no package qty, no conversion).
+    """
+    if ing is None:
+        return None
+    package_qty = _num(ing.get("package_qty"))
+    if package_qty is None or package_qty <= 0:
+        return None
+    f = convert(factors, line.get("qty_uom"), ing.get("package_uom"))
+    qty = _num(line.get("qty"))
+    package_cost = _num(ing.get("package_cost"))
+    yield_pct = _num(ing.get("yield_pct"))
+    if f is None or qty is None or package_cost is None or not yield_pct:
+        return None
+    return qty * f / (yield_pct / 100.0) * (package_cost / package_qty)
+
+
+def prep_line_cost(line: Row, prep: Optional[Row], factors: Factors) -> Optional[float]:
+    """Cost of a line pointing at a costed prep recipe: qty in the prep's base UOM × unit cost."""
+    if prep is None or prep.get("unit_cost") is None:
+        return None
+    f = convert(factors, line.get("qty_uom"), prep.get("base_uom"))
+    qty = _num(line.get("qty"))
+    if f is None or qty is None:
+        return None
+    return qty * f * prep["unit_cost"]
+
+
+def topological_order(recipe_ids: Iterable[str], lines: Iterable[Row]) -> List[str]:
+    """
+    Kahn's algorithm over recipe -> sub-recipe edges; sub-recipes come first.
+    Raises CycleError naming the recipes that could not be ordered.
+    """
+    ids = set(recipe_ids)
+    children: Dict[str, set] = {rid: set() for rid in ids}
+    for ln in lines:
+        rid, iid = ln.get("recipe_id"), ln.get("ingredient_id")
+        if rid in ids and iid in ids:
+            children[rid].add(iid)
+
+    used_by: Dict[str, List[str]] = {rid: [] for rid in ids}
+    pending = {rid: len(kids) for rid, kids in children.items()}
+    for rid, kids in children.items():
+        for kid in kids:
+            used_by[kid].append(rid)
+
+    queue = deque(sorted(rid for rid, n in pending.items() if n == 0))
+    order: List[str] = []
+    while queue:
+        rid = queue.popleft()
+        order.append(rid)
+        for parent in used_by[rid]:
+            pending[parent] -= 1
+            if pending[parent] == 0:
+                queue.append(parent)
+
+    if len(order) < len(ids):
+        raise CycleError(rid for rid, n in pending.items() if n > 0)
+    return order
+
+
+def cost_recipe(
+    r: Row,
+    own_lines: Iterable[Row],
+    ing_by_id: Dict[str, Row],
+    costed: Dict[str, Row],
+    factors: Factors,
+) -> Row:
+    """
+    Cost one recipe whose sub-recipes are already in `costed` (recipe_id -> result).
+    Result keys are those of `cost_recipes` (`line_costs`: recipe_line_id -> cost).
+    """
+    line_costs: Dict[str, float] = {}
+    ing_base: List[str] = []
+    prep_base: List[str] = []
+    level = 0
+    for ln in own_lines:
+        iid = ln.get("ingredient_id")
+        ing = ing_by_id.get(iid)
+        sub = costed.get(iid)
+        prep = sub if sub is not None and sub["recipe_type"] == "prep" else None
+        if sub is not None:
+            level = max(level, sub["level"] + 1)
+        if ing is not None and ing.get("base_uom"):
+            ing_base.append(ing["base_uom"])
+        if prep is not None and prep.get("unit_cost") is not None:
+            prep_base.append(prep["base_uom"])
+        cost = ingredient_line_cost(ln, ing, factors)
+        if cost is None:
+            cost = prep_line_cost(ln, prep, factors)
+        line_costs[ln["id"]] = cost or 0.0
+
+    total = sum(line_costs.values())
+    row: Row = {
+        "recipe_id": r["id"],
+        "recipe_code": r.get("recipe_code"),
+        "name": r.get("name"),
+        "recipe_type": r.get("recipe_type"),
+        "status": r.get("status"),
+        "price": _num(r.get("price")),
+        "yield_qty": _num(r.get("yield_qty")),
+        "yield_uom": r.get("yield_uom"),
+        "level": level,
+        "total_cost": total,
+        "base_uom": None,
+        "conversion_factor": None,
+        "unit_cost": None,
+        "cost_pct": None,
+        "margin": None,
+        "line_costs": line_costs,
+    }
+
+    if row["recipe_type"] == "prep":
+        base = min(ing_base) if ing_base else (min(prep_base) if prep_base else None)
+        cf = convert(factors, row["yield_uom"], base) if base is not None else None
+        row["base_uom"] = base if base is not None else row["yield_uom"]
+        row["conversion_factor"] = cf
+        denom = (row["yield_qty"] * cf) if (cf is not None and row["yield_qty"]) else None
+        # Only active preps are costed inputs for their parents (as in prep_costs)
+        if denom and denom > 0 and row["status"] == "Active":
+            row["unit_cost"] = total / denom
+    elif row["price"] and row["price"] > 0:
+        row["cost_pct"] = round2(total / row["price"] * 100.0)
+        row["margin"] = round2(row["price"] - total)
+    return row
+
+
+def cost_recipes(
+    ingredients: Iterable[Row],
+    recipes: Iterable[Row],
+    lines: Iterable[Row],
+    conversions: Iterable[Row],
+) -> Dict[str, Row]:
+    """
+    Cost every recipe of one tenant, all nesting levels included.
+
+    Returns recipe_id -> {recipe_id, recipe_code, name, recipe_type, status, price,
+    yield_qty, yield_uom, level, total_cost, base_uom, conversion_factor, unit_cost,
+    cost_pct, margin, line_costs}. `line_costs` maps recipe_line_id -> cost.
+    Prep fields follow `prep_costs` (unit cost only for active preps that have a
+    base UOM and a positive yield); service fields follow `recipe_summary`
+    (cost_pct/margin only when price > 0). A prep made only of sub-preps takes
+    its base UOM from them, which the views cannot do.
+    """
+    factors = uom_factors(conversions)
+    ing_by_id = {i["id"]: i for i in ingredients}
+    recipe_by_id = {r["id"]: r for r in recipes}
+    lines = list(lines)
+
+    lines_by_recipe: Dict[str, List[Row]] = {}
+    for ln in lines:
+        lines_by_recipe.setdefault(ln.get("recipe_id"), []).append(ln)
+
+    out: Dict[str, Row] = {}
+    for rid in topological_order(recipe_by_id, lines):
+        out[rid] = cost_recipe(
+            recipe_by_id[rid], lines_by_recipe.get(rid, []), ing_by_id, out, factors
+        )
+    return out
+
+
+__all__ = [
+    "CycleError",
+    "convert",
+    "cost_recipe",
+    "cost_recipes",
+    "ingredient_line_cost",
+    "prep_line_cost",
+    "round2",
+    "topological_order",
+    "uom_factors",
+]
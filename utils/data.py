@@ -7,8 +7,21 @@ import pandas as pd
 import streamlit as st
 
 from utils import tenant_db as db
+from utils.cache import WRITE_AWARE_TTL, cache_by_tenant
 from utils.supabase_client import supabase
 
+# Columns of the `recipe_summary` view
+SUMMARY_COLUMNS = [
+    "recipe_id",
+    "recipe_code",
+    "name",
+    "status",
+    "price",
+    "total_cost",
+    "cost_pct",
+    "margin",
+]
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -23,45 +36,33 @@ def _to_df(res) -> pd.DataFrame:
 # -----------------------------
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, reads=("recipe_summary",))
 def load_recipes_summary() -> pd.DataFrame:
     """
-    Loads recipe portfolio metrics from the `recipe_summary` view.
-    Makes Home.py resilient by synthesizing columns if the view doesn't expose them yet:
+    Recipe portfolio metrics: active service recipes from `recipe_summary`
+    (an index lookup on the trigger-maintained cost store, see V016).
+    Adds the columns Home.py expects:
       - cost := total_cost
       - margin_dollar := price - cost
       - profitability := margin_dollar / price
-      - popularity := 0 if absent (until sales upload exists)
+      - popularity := 0 (until sales upload exists)
     """
     try:
-        res = db.table("recipe_summary").select("*").execute()
-        df = _to_df(res)
+        df = db.read_frame("recipe_summary", ", ".join(SUMMARY_COLUMNS))
 
         if df.empty:
             return df
 
+        for c in ("price", "total_cost", "cost_pct", "margin"):
+            df[c] = pd.to_numeric(df[c], errors="coerce")
         # Normalize field names expected by Home.py
-        if "recipe" not in df.columns:
-            for cand in ("name", "recipe_name"):
-                if cand in df.columns:
-                    df.rename(columns={cand: "recipe"}, inplace=True)
-                    break
-
-        if "cost" not in df.columns and "total_cost" in df.columns:
-            df["cost"] = df["total_cost"]
-
-        # Derived columns if absent
-        if "margin_dollar" not in df.columns:
-            df["margin_dollar"] = (df.get("price") - df.get("cost")).fillna(0.0)
-
-        if "profitability" not in df.columns:
-            # Avoid div/0 explosions
-            price = df.get("price").replace({0: pd.NA})
-            df["profitability"] = (df["margin_dollar"] / price).fillna(0.0)
-
-        if "popularity" not in df.columns:
-            df["popularity"] = df.get("units_sold", 0).fillna(0)
-
+        df = df.rename(columns={"name": "recipe"})
+        df["cost"] = df["total_cost"]
+        df["margin_dollar"] = (df["price"] - df["cost"]).fillna(0.0)
+        # Avoid div/0 explosions
+        price = df["price"].where(df["price"] != 0)
+        df["profitability"] = (df["margin_dollar"] / price).fillna(0.0)
+        df["popularity"] = 0
         return df
     except Exception as e:
         print("Failed to load recipe summary:", e)
@@ -184,7 +185,7 @@ def update_recipe(
 # -----------------------------
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, reads=("input_catalog",))
 def get_input_catalog() -> pd.DataFrame:
     """
     Returns the unified list of selectable inputs (active ingredients + active prep recipes).
@@ -192,8 +193,7 @@ def get_input_catalog() -> pd.DataFrame:
       Columns expected: id, source ('ingredient'|'recipe'), code, name, base_uom
     """
     try:
-        res = db.table("input_catalog").select("*").order("name").execute()
-        df = _to_df(res)
+        df = db.read_frame("input_catalog", order_by=("name",))
         # Canonical display label for UI dropdowns
         if not df.empty:
             df["label"] = df.apply(
@@ -295,11 +295,10 @@ def get_unit_costs_for_inputs(inputs: List[Dict[str, str]]) -> pd.DataFrame:
 # -----------------------------
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, reads=("ingredients",))
 def load_ingredient_master() -> pd.DataFrame:
     try:
-        res = db.table("ingredients").select("*").execute()
-        return _to_df(res)
+        return db.concat_frames(db.table("ingredients").iter_frames())
     except Exception as e:
         st.error(f"Failed to load ingredients: {e}")
         return pd.DataFrame()
@@ -315,7 +314,7 @@ def get_ingredient_id_by_name(name: str) -> Optional[str]:
 # -----------------------------
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, shared=True, reads=("ref_uom_conversion",))
 def get_uom_list() -> List[str]:
     """
     Returns a flat list of UOMs from ref_uom_conversion (both from_uom and to_uom).
@@ -332,7 +331,7 @@ def get_uom_list() -> List[str]:
         return []
 
 
-@st.cache_data(ttl=60)
+@cache_by_tenant(ttl=WRITE_AWARE_TTL, reads=("ref_ingredient_categories",))
 def get_active_ingredient_categories() -> List[Dict[str, Any]]:
     res = db.table("ref_ingredient_categories").select("id, name").eq("status", "Active").execute()
     return res.data or []
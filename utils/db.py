@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import os
 import sys
-from typing import Optional
+import threading
+from typing import Any, Dict, Optional
 
 from sqlalchemy import create_engine
 from sqlalchemy.engine import URL, Engine
@@ -10,6 +11,18 @@ from sqlalchemy.engine import URL, Engine
 DEFAULT_DRIVER = "postgresql"
 ENGINE_DRIVER = "postgresql+psycopg"
 
+# Connection pool settings (DB_POOL_* secrets override these defaults)
+POOL_DEFAULTS: Dict[str, Any] = {
+    "DB_POOL_SIZE": 5,  # connections kept open
+    "DB_POOL_MAX_OVERFLOW": 5,  # extra connections under load, closed when returned
+    "DB_POOL_TIMEOUT": 30,  # seconds to wait for a free connection
+    "DB_POOL_RECYCLE": 1800,  # seconds before a connection is replaced (pooler idle limits)
+    "DB_POOL_PRE_PING": True,  # test connections on checkout
+}
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
 
 def _get_secret(name: str, default=None, *, required: bool = False):
     value = os.environ.get(name)
@@ -63,8 +76,43 @@ def database_url(driver: Optional[str] = None) -> str:
     return url.render_as_string(hide_password=False)
 
 
+def direct_url_configured() -> bool:
+    """True when the DB_* secrets for a direct Postgres connection are set."""
+    return bool(_get_secret("DB_HOST") and _get_secret("DB_PASSWORD"))
+
+
+def pool_settings() -> Dict[str, Any]:
+    """Pool keyword arguments for create_engine, from DB_POOL_* secrets or POOL_DEFAULTS."""
+    values = {name: _get_secret(name, default) for name, default in POOL_DEFAULTS.items()}
+    return {
+        "pool_size": int(values["DB_POOL_SIZE"]),
+        "max_overflow": int(values["DB_POOL_MAX_OVERFLOW"]),
+        "pool_timeout": float(values["DB_POOL_TIMEOUT"]),
+        "pool_recycle": int(values["DB_POOL_RECYCLE"]),
+        "pool_pre_ping": str(values["DB_POOL_PRE_PING"]).strip().lower()
+        not in ("0", "false", "no", "off"),
+    }
+
+
 def get_engine() -> Engine:
-    return create_engine(database_url(ENGINE_DRIVER), pool_pre_ping=True)
+    """
+    The process-wide engine: created on first use, then shared, so callers reuse
+    pooled connections instead of opening one per call. Engines are thread-safe.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(database_url(ENGINE_DRIVER), **pool_settings())
+        return _engine
+
+
+def dispose_engine() -> None:
+    """Close pooled connections and forget the engine (next get_engine() builds a new one)."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+"""
+File exports (CSV; Parquet / Arrow snapshots) built only when someone asks for one.
+
+    @register("ingredients", reads=("ingredients",))
+    def ingredients(): ...  # yields DataFrames, one page at a time
+
+    components.export_button.render("ingredients", label=..., file_name=...)
+
+Pages declare what an export contains and render a "Prepare" button; nothing
+is read until it is clicked. `build` then writes the pages straight into the
+file buffer, so memory holds one page plus the file, never a tenant's rows as
+one DataFrame (`relation_frames` pages both read paths). It caches the file
+per tenant and data version: the row count and latest `updated_at` of every
+base table behind the export (`data_version`, a few count requests). Clicking
+again after a change anywhere, in this process or another, builds a new file;
+otherwise the cached one is handed out.
+
+No Streamlit imports.
+"""
+
+from __future__ import annotations
+
+import io
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from utils import tenant_db as db
+from utils.cache import cache_by_tenant
+
+# A version-keyed file never goes stale; the TTL only bounds memory
+EXPORT_TTL = 30 * 60
+
+# Base tables whose updated_at is kept current by triggers (V000)
+STAMPED = {"ingredients", "recipes", "recipe_lines"}
+
+Frames = Callable[..., Iterable[Any]]
+Writer = Callable[[Iterable[Any]], Tuple[bytes, int]]
+
+
+class ExportFile(NamedTuple):
+    data: bytes
+    rows: int
+    built_at: datetime
+
+
+# name -> (relations read, frames function, writer)
+_exports: Dict[str, Tuple[FrozenSet[str], Frames, Writer]] = {}
+
+
+def register(
+    name: str, reads: Iterable[str], write: Optional[Writer] = None
+) -> Callable[[Frames], Frames]:
+    """
+    Declare export `name`: the decorated function yields its rows as DataFrames
+    (already renamed / ordered for the file) and reads the relations `reads`.
+    Its arguments are the export's parameters (e.g. a grid's sort and filters) and
+    must be hashable. `write` turns what it yields into (file bytes, rows);
+    the default is `write_csv` (utils.snapshot writes Parquet / Arrow instead).
+    """
+
+    def wrap(fn: Frames) -> Frames:
+        _exports[name] = (frozenset(reads), fn, write or write_csv)
+        return fn
+
+    return wrap
+
+
+def base_tables(relations: Iterable[str]) -> Tuple[str, ...]:
+    """The tables `relations` are computed from (tables themselves included)."""
+    rel = set(relations)
+    derived = set().union(*db.DEPENDENTS.values())
+    tables = {r for r in rel if r not in derived}
+    tables |= {t for t, deps in db.DEPENDENTS.items() if deps & rel}
+    return tuple(sorted(tables))
+
+
+def data_version(relations: Iterable[str]) -> Tuple[Tuple[str, Any, Any], ...]:
+    """
+    (table, row count, latest updated_at) for every base table behind `relations`.
+    Inserts, deletes and soft deletes change the count; updates move updated_at
+    where the table has one (STAMPED). Other tables only report their count.
+    """
+    version = []
+    for t in base_tables(relations):
+        if t in STAMPED:
+            res = (
+                db.table(t)
+                .select("updated_at", count="exact", memo=False)
+                .order("updated_at", desc=True, nullsfirst=False)
+                .limit(1)
+                .execute()
+            )
+            version.append((t, res.count, (res.data or [{}])[0].get("updated_at")))
+        else:
+            res = db.table(t).select(count="exact", memo=False).limit(1).execute()
+            version.append((t, res.count, None))
+    return tuple(version)
+
+
+def relation_frames(
+    name: str, columns: str = "*", key: Tuple[str, ...] = ("id",)
+) -> Iterator[pd.DataFrame]:
+    """
+    Every row of `name` in `key` order (`key` must be unique), one page at a time
+    (tenant_db.read_frames: a server-side cursor with DB_* secrets configured,
+    keyset pages over REST otherwise).
+    """
+    yield from db.read_frames(name, columns, key=key)
+
+
+def write_csv(frames: Iterable[pd.DataFrame]) -> Tuple[bytes, int]:
+    """UTF-8 CSV of `frames` (header from the first non-empty one) and its row count."""
+    buf = io.BytesIO()
+    rows = 0
+    for frame in frames:
+        if frame.empty:
+            continue
+        frame.to_csv(buf, index=False, header=rows == 0)
+        rows += len(frame)
+    return buf.getvalue(), rows
+
+
+@cache_by_tenant(ttl=EXPORT_TTL, reads=())
+def _build(name: str, params: Tuple[Any, ...], version: Tuple) -> ExportFile:
+    _, frames, write = _exports[name]
+    data, rows = write(frames(*params))
+    return ExportFile(data, rows, datetime.now())
+
+
+def build(name: str, *params: Any) -> ExportFile:
+    """Export `name` for `params` as of now: the cached file if the data has not changed."""
+    reads = _exports[name][0]
+    return _build(name, params, data_version(reads))
+
+
+__all__ = [
+    "EXPORT_TTL",
+    "ExportFile",
+    "base_tables",
+    "build",
+    "data_version",
+    "register",
+    "relation_frames",
+    "write_csv",
+]
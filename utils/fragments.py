@@ -0,0 +1,152 @@
+"""
+Page fragments that rerun on their own, each declaring the relations it reads.
+
+    @fragment("line_grid", reads=("recipe_lines", "recipe_line_costs"))
+    def line_grid(recipe_id): ...
+
+A widget inside a fragment reruns only that fragment (st.experimental_fragment).
+After a save, `refresh()` reruns exactly the fragments whose `reads` intersect
+what the save changed: tenant_db announces every write (tenant_db.on_change), and
+a write to a table changes the table and its DEPENDENTS
+(tenant_db.affected_relations). Everything else on the page keeps its widgets
+and data. `rerun(name)` reruns named fragments when one fragment hands state
+to another through session_state, e.g. a grid selection to its edit form.
+
+Streamlit 1.35 has no `st.rerun(scope="fragment")`; the requests go through
+the script runner's request queue the way the frontend sends them, so they
+queue behind the current run instead of interrupting it. Fragments are known by
+name per session, from the last full run of the page on (that is when
+Streamlit forgets the previous page's fragments), and a name that is not
+registered falls back to a full `st.rerun()`. That queue is private API: it is
+used only on the Streamlit releases in SUPPORTED_STREAMLIT (the requirements.txt
+pin, checked by tests/unit/test_fragments.py); on any other release `rerun`
+falls back to a full `st.rerun()`, which reruns every fragment too.
+"""
+
+from __future__ import annotations
+
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.tenant_db import Json, affected_relations, on_change
+from utils.tenant_state import current_rerun
+
+try:
+    from streamlit.runtime.scriptrunner.script_requests import RerunData
+except ImportError:  # private; moved or gone in another release
+    RerunData = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_REGISTRY_KEY = "_fragments"
+
+# Streamlit releases (major.minor) whose script-runner request queue `rerun` drives
+SUPPORTED_STREAMLIT = ("1.35",)
+_QUEUED_RERUNS = RerunData is not None and st.__version__.rsplit(".", 1)[0] in SUPPORTED_STREAMLIT
+
+
+@dataclass
+class _Registry:
+    token: Any  # the full run the fragments were declared in (tenant_state.current_rerun)
+    fragments: Dict[str, Tuple[str, frozenset]] = field(default_factory=dict)  # name -> id, reads
+    changed: Set[str] = field(default_factory=set)  # tables written since the last refresh()
+
+
+def _registry() -> Optional[_Registry]:
+    """This session's registry, reset on every full run (None outside a script run)."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    rerun = current_rerun()
+    if ctx is None or rerun is None:
+        return None
+    reg = st.session_state.get(_REGISTRY_KEY)
+    if reg is None or (not ctx.fragment_ids_this_run and reg.token is not rerun[1]):
+        # a full run re-declares every fragment and renders all data fresh
+        reg = st.session_state[_REGISTRY_KEY] = _Registry(rerun[1])
+    return reg
+
+
+def fragment(name: str, reads: Iterable[str] = ()) -> Callable[[F], F]:
+    """
+    st.experimental_fragment that registers itself as `name`, depending on the
+    relations (tables/views, as tenant_db names them) in `reads`.
+    """
+    depends_on = frozenset(reads)
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            ctx = get_script_run_ctx(suppress_warning=True)
+            reg = _registry()
+            if reg is not None and ctx.current_fragment_id:
+                reg.fragments[name] = (ctx.current_fragment_id, depends_on)
+            return fn(*args, **kwargs)
+
+        return st.experimental_fragment(body)
+
+    return decorate
+
+
+@on_change
+def _note_change(
+    name: str, tenant_id: Optional[str], rows: Optional[List[Json]], deleted: bool
+) -> None:
+    reg = _registry()
+    if reg is not None:
+        reg.changed.add(name)
+
+
+def rerun(*names: str) -> None:
+    """
+    Queue reruns of the named fragments, after the current run; unknown names, or
+    a Streamlit release outside SUPPORTED_STREAMLIT: st.rerun().
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    reg = _registry()
+    if not names or ctx is None or reg is None:
+        return
+    if not _QUEUED_RERUNS:
+        st.rerun()
+    if ctx.script_requests is None:
+        return
+    known = [n for n in names if n in reg.fragments]
+    if ctx.fragment_ids_this_run and len(known) < len(names):
+        st.rerun()
+    # In a full run a fragment not declared yet still renders later in this run
+    for n in known:
+        # one id per request: ScriptRequests coalesces fragment reruns one at a time
+        ctx.script_requests.request_rerun(
+            RerunData(
+                query_string=ctx.query_string,
+                page_script_hash=ctx.page_script_hash,
+                fragment_id_queue=[reg.fragments[n][0]],
+            )
+        )
+
+
+def refresh() -> List[str]:
+    """
+    Rerun the fragments that read anything written since the last refresh (this
+    one included, if it does). Returns their names.
+    """
+    reg = _registry()
+    if reg is None:
+        return []
+    changed: Set[str] = set()
+    for table in reg.changed:
+        changed |= affected_relations(table)
+    reg.changed.clear()
+    stale = [n for n, (_, reads) in reg.fragments.items() if reads & changed]
+    rerun(*stale)
+    return stale
+
+
+__all__ = [
+    "SUPPORTED_STREAMLIT",
+    "fragment",
+    "refresh",
+    "rerun",
+]
@@ -0,0 +1,119 @@
+"""
+AG Grid sort and filter state as PostgREST query terms, for grids that page on
+the server (components.paged_grid).
+
+The browser holds one page, so the grid's own sort and filter model (its
+`gridState`) is replayed on the range query instead (tenant_db.read_page):
+`sortModel` becomes `order`, and `filterModel` becomes `where` terms that all
+hold, plus one `or=(...)` logic tree per OR-combined column filter. Text and
+number filters are supported; other filter types, and columns the grid was not
+given, are ignored.
+
+No Streamlit or supabase imports.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Collection, List, Mapping, NamedTuple, Optional, Tuple
+
+# (column, PostgREST operator, value), e.g. ("name", "ilike", "*salt*")
+Term = Tuple[str, str, str]
+
+
+class GridQuery(NamedTuple):
+    order: Tuple[Tuple[str, bool], ...] = ()  # (column, descending)
+    where: Tuple[Term, ...] = ()  # all must hold
+    any_of: Tuple[str, ...] = ()  # logic trees for or=(...); each must hold
+
+
+# AG Grid filter option -> (operator, pattern for the typed text)
+_TEXT = {
+    "contains": ("ilike", "*{}*"),
+    "notContains": ("not.ilike", "*{}*"),
+    "equals": ("ilike", "{}"),
+    "notEqual": ("not.ilike", "{}"),
+    "startsWith": ("ilike", "{}*"),
+    "endsWith": ("ilike", "*{}"),
+}
+_NUMBER = {
+    "equals": "eq",
+    "notEqual": "neq",
+    "lessThan": "lt",
+    "lessThanOrEqual": "lte",
+    "greaterThan": "gt",
+    "greaterThanOrEqual": "gte",
+}
+_BLANK = {"blank": ("is", "null"), "notBlank": ("not.is", "null")}
+
+
+def _like(text: Any) -> str:
+    # the typed text is literal: escape LIKE's own wildcards (PostgREST maps * to %)
+    return str(text).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _condition(column: str, model: Mapping[str, Any]) -> List[Term]:
+    """Terms (all must hold) for one simple AG Grid filter condition; [] if unsupported."""
+    option = model.get("type")
+    if option in _BLANK:
+        return [(column, *_BLANK[option])]
+    kind = model.get("filterType")
+    value = model.get("filter")
+    if kind == "text" and option in _TEXT and value not in (None, ""):
+        op, pattern = _TEXT[option]
+        return [(column, op, pattern.format(_like(value)))]
+    if kind == "number" and value is not None:
+        if option == "inRange" and model.get("filterTo") is not None:
+            return [(column, "gte", str(value)), (column, "lte", str(model["filterTo"]))]
+        if option in _NUMBER:
+            return [(column, _NUMBER[option], str(value))]
+    return []
+
+
+def _quote(value: str) -> str:
+    # logic-tree values: double-quote so commas/parens/dots stay literal
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _tree(terms: List[Term]) -> str:
+    parts = [f"{c}.{op}.{v if op.endswith('is') else _quote(v)}" for c, op, v in terms]
+    return parts[0] if len(parts) == 1 else f"and({','.join(parts)})"
+
+
+def _column_filter(column: str, model: Mapping[str, Any]) -> Tuple[List[Term], Optional[str]]:
+    """(where terms, or-tree) for one column's filter model."""
+    conditions = model.get("conditions") or [
+        model[k] for k in ("condition1", "condition2") if model.get(k)
+    ]
+    if not conditions:
+        return _condition(column, model), None
+    groups = [g for g in (_condition(column, m) for m in conditions) if g]
+    if model.get("operator", "AND").upper() == "OR" and len(groups) > 1:
+        return [], ",".join(_tree(g) for g in groups)
+    return [t for g in groups for t in g], None
+
+
+def from_state(grid_state: Optional[Mapping[str, Any]], columns: Collection[str]) -> GridQuery:
+    """The query for an AG Grid `gridState`, restricted to `columns`."""
+    state = grid_state or {}
+    order = tuple(
+        (s["colId"], s.get("sort") == "desc")
+        for s in (state.get("sort") or {}).get("sortModel") or []
+        if s.get("colId") in columns
+    )
+    where: List[Term] = []
+    any_of: List[str] = []
+    for column, model in ((state.get("filter") or {}).get("filterModel") or {}).items():
+        if column not in columns or not isinstance(model, Mapping):
+            continue
+        terms, tree = _column_filter(column, model)
+        where += terms
+        if tree:
+            any_of.append(tree)
+    return GridQuery(order, tuple(where), tuple(any_of))
+
+
+__all__ = [
+    "GridQuery",
+    "Term",
+    "from_state",
+]
@@ -0,0 +1,402 @@
+"""
+CSV import pipeline for pages/Settings.py.
+
+Validation is set-based: the caller fetches the tenant's existing codes once
+and every rule is a pandas mask over a whole frame, so a 5,000-row supplier
+file costs a handful of queries and a few vectorized passes instead of one
+round trip and one Python iteration per row.
+
+Uploads are streamed: `read_chunks` parses CHUNK_ROWS rows at a time and
+`run_import` validates each chunk and writes its valid rows in BATCH_ROWS
+inserts, so memory stays flat with file size and no request exceeds PostgREST
+payload limits. Batches commit independently; a failed batch stops the run and
+everything written before it stays written and reported.
+
+Nothing here touches the database: writes go through the `write` callable.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+Row = Dict[str, Any]
+
+INGREDIENT_REQUIRED = [
+    "ingredient_code",
+    "name",
+    "ingredient_type",
+    "package_qty",
+    "package_uom",
+    "package_cost",
+    "yield_pct",
+    "status",
+    "category",
+]
+VALID_INGREDIENT_STATUSES = {"active", "inactive"}
+VALID_INGREDIENT_TYPES = {"bought", "prepped"}
+RECIPE_REQUIRED = ["recipe_code", "name"]
+
+CHUNK_ROWS = 5_000  # rows parsed and validated at a time
+BATCH_ROWS = 500  # rows per insert request
+
+
+class IngredientImport(NamedTuple):
+    inserts: List[Row]  # payloads for `ingredients`
+    rejected: pd.DataFrame  # source rows + `errors`
+    duplicates: List[Row]  # {ingredient_code, source, existing}: code taken in the DB or upload
+
+
+class RecipeImport(NamedTuple):
+    inserts: List[Row]  # payloads for `recipes`
+    rejected: pd.DataFrame  # source rows + `errors`
+    duplicates: List[Row]  # {recipe_code, name}: already imported or uploaded under the same name
+
+
+class ChunkReport(NamedTuple):
+    chunk: int  # 1-based
+    rows: int
+    valid: int
+    inserted: int
+    rejected: int
+    duplicates: int
+    seconds: float
+    error: Optional[str] = None
+
+
+Validator = Callable[..., Tuple[List[Row], pd.DataFrame, List[Row]]]
+
+
+def _text(df: pd.DataFrame, col: str) -> pd.Series:
+    """`str(value).strip()` for every cell (NaN becomes "nan", as str() does)."""
+    return df[col].astype(str).str.strip()
+
+
+def _number(df: pd.DataFrame, col: str) -> pd.Series:
+    return pd.to_numeric(df[col], errors="coerce")
+
+
+def _optional_text(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
+    """Stripped text with blank and missing cells as None."""
+    if col is None or col not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    out = df[col].astype("string").str.strip()
+    return pd.Series(
+        [None if pd.isna(v) or v == "" else v for v in out], index=df.index, dtype=object
+    )
+
+
+def _join_errors(df: pd.DataFrame, checks: List[Tuple[pd.Series, Any]]) -> pd.Series:
+    """ "; "-joined messages of the failed checks, per row ("" when all pass)."""
+    errors = pd.Series("", index=df.index)
+    for mask, message in checks:
+        errors = errors.where(~mask, errors + np.where(errors == "", "", "; ") + message)
+    return errors
+
+
+def _first_kept(code: pd.Series, kept: pd.Series) -> pd.Series:
+    """Per row, the position of the first `kept` row with the same code (NaN if none)."""
+    pos = pd.Series(np.arange(len(code)), index=code.index, dtype=float)
+    return pos.where(kept).groupby(code).transform("min")
+
+
+def validate_ingredients(
+    df: pd.DataFrame,
+    existing: Dict[str, Row],
+    category_map: Dict[str, str],
+    base_uom_map: Dict[str, str],
+) -> IngredientImport:
+    """
+    Split an ingredients upload into rows to insert, rows rejected by validation
+    (with an `errors` column) and rows whose code already exists for the tenant.
+    A code repeated in the upload is kept once, on its first valid row; the rows
+    after it are duplicates too. Duplicates are reported whether or not they
+    would also fail validation.
+    `df` must have INGREDIENT_REQUIRED columns; `base_uom` is optional.
+    """
+    code = _text(df, "ingredient_code")
+    name = _text(df, "name")
+    ingredient_type = _text(df, "ingredient_type").str.capitalize()
+    package_qty = _number(df, "package_qty")
+    package_uom = _text(df, "package_uom")
+    package_cost = _number(df, "package_cost")
+    yield_pct = _number(df, "yield_pct")
+    status = _text(df, "status").str.capitalize()
+    category_id = _text(df, "category").map(category_map)
+    if "base_uom" in df.columns:
+        base_uom = df["base_uom"].astype("string").str.strip().str.lower()
+        base_uom = base_uom.where(base_uom.fillna("") != "")
+    else:
+        base_uom = pd.Series(pd.NA, index=df.index, dtype="string")
+
+    # Fractions (0.85) mean percentages (85)
+    as_fraction = (yield_pct > 0) & (yield_pct <= 2)
+    yield_pct = yield_pct.where(~as_fraction, (yield_pct * 100).round(6))
+
+    type_ok = ingredient_type.str.lower().isin(VALID_INGREDIENT_TYPES)
+    status_ok = status.str.lower().isin(VALID_INGREDIENT_STATUSES)
+    checks = [
+        ((code == "") | (code.str.len() > 100), "Invalid or missing ingredient_code"),
+        ((name == "") | (name.str.len() > 100), "Invalid or missing name"),
+        (~type_ok & (ingredient_type != ""), "Invalid ingredient_type"),
+        (package_qty.isna() | (package_qty < 0), "Invalid package_qty"),
+        (package_uom == "", "Missing package_uom"),
+        (package_cost.isna() | (package_cost < 0), "Invalid package_cost"),
+        (yield_pct.isna() | (yield_pct <= 0) | (yield_pct > 200), "Invalid yield_pct"),
+        (~status_ok & (status != ""), "Invalid status"),
+        (category_id.isna(), "Category not found"),
+    ]
+    errors = _join_errors(df, checks)
+
+    # Infer base_uom when not provided
+    inferred = pd.Series(
+        np.where(
+            package_uom.str.lower().isin(["each", "unit"]),
+            "unit",
+            package_uom.map(base_uom_map),
+        ),
+        index=df.index,
+    )
+    base_uom = base_uom.astype(object).where(base_uom.notna(), inferred)
+    base_uom = base_uom.where(pd.notna(base_uom), None)
+
+    is_known = code.isin(existing.keys())
+    pos = np.arange(len(df))
+    first = _first_kept(code, ~is_known & (errors == ""))
+    is_duplicate = is_known | (pos > first)
+    is_rejected = ~is_duplicate & (errors != "")
+    is_insert = ~is_duplicate & (errors == "")
+
+    source = pd.DataFrame(
+        {"name": name, "ingredient_type": ingredient_type, "package_cost": df["package_cost"]}
+    )
+    # The row a duplicate's code belongs to: the tenant's, or the upload's first
+    taken = {**source[pos == first].set_index(code[pos == first]).to_dict("index"), **existing}
+    duplicates = [
+        {
+            "ingredient_code": c,
+            "source": {"name": n, "ingredient_type": t, "package_cost": pc},
+            "existing": {
+                "name": taken[c]["name"],
+                "ingredient_type": taken[c]["ingredient_type"],
+                "package_cost": taken[c]["package_cost"],
+            },
+        }
+        for c, (n, t, pc) in zip(code[is_duplicate], source[is_duplicate].itertuples(index=False))
+    ]
+
+    rejected = df.loc[is_rejected].copy()
+    rejected["errors"] = errors[is_rejected]
+
+    inserts = pd.DataFrame(
+        {
+            "ingredient_code": code,
+            "name": name,
+            "ingredient_type": ingredient_type.where(type_ok, "Bought"),
+            "package_qty": package_qty.round(6),
+            "package_uom": package_uom,
+            "package_cost": package_cost.round(6),
+            "yield_pct": yield_pct.round(6),
+            "status": status.where(status_ok, "Active"),
+            "category_id": category_id,
+            "base_uom": base_uom,
+        }
+    )[is_insert]
+
+    return IngredientImport(
+        inserts=inserts.astype(object).to_dict("records"),
+        rejected=rejected.reset_index(drop=True),
+        duplicates=duplicates,
+    )
+
+
+def validate_recipes(df: pd.DataFrame, existing: Dict[str, Row]) -> RecipeImport:
+    """
+    Split a recipes upload like `validate_ingredients`. A code that already exists
+    under the same name is a duplicate (skipped); under another name it is rejected.
+    A code repeated in the upload is judged the same way against its first valid row.
+    Yield columns may be named `yield_qty`/`yield_uom` or the older
+    `base_yield_qty`/`base_yield_uom`.
+    """
+    code = _text(df, "recipe_code")
+    name = _text(df, "name")
+    if "status" in df.columns:
+        status = _text(df, "status").str.capitalize()
+    else:
+        status = pd.Series("Active", index=df.index)
+    qty_col = next((c for c in ("yield_qty", "base_yield_qty") if c in df.columns), None)
+    uom_col = next((c for c in ("yield_uom", "base_yield_uom") if c in df.columns), None)
+
+    if qty_col is None:
+        raw_qty = pd.Series(np.nan, index=df.index)
+    else:
+        raw_qty = df[qty_col]
+    yield_qty = pd.to_numeric(raw_qty, errors="coerce")
+    bad_qty = yield_qty.isna() & raw_qty.notna()
+    yield_qty = yield_qty.fillna(1.0).round(4)
+    yield_uom = _optional_text(df, uom_col)
+
+    if "price" in df.columns:
+        raw_price = df["price"]
+    else:
+        raw_price = pd.Series(np.nan, index=df.index)
+    price = pd.to_numeric(raw_price, errors="coerce")
+    bad_price = price.isna() & raw_price.notna()
+    price = price.round(4)
+
+    existing_name = code.map({c: r.get("name") for c, r in existing.items()})
+    is_known = code.isin(existing.keys())
+    qty_name = qty_col or "base_yield_qty"
+    uom_name = uom_col or "base_yield_uom"
+    long_uom = yield_uom.fillna("").str.len() > 20
+    checks = [
+        (code == "", "Missing recipe_code"),
+        ((code != "") & (code.str.len() > 32), "recipe_code too long"),
+        (name == "", "Missing name"),
+        ((name != "") & (name.str.len() > 100), "Name too long"),
+        (~status.isin(["Active", "Inactive"]), "Invalid status"),
+        (bad_qty, f"Invalid {qty_name}"),
+        (~bad_qty & (yield_qty <= 0), f"{qty_name} must be > 0"),
+        (long_uom, f"{uom_name} too long: " + yield_uom.fillna("").astype(str)),
+        (bad_price, "Invalid price"),
+        (~bad_price & (price < 0), "price must be >= 0"),
+    ]
+
+    # An upload row claims its code for the rows after it, as an existing recipe does
+    pos = np.arange(len(df))
+    failed = np.logical_or.reduce([mask.to_numpy(dtype=bool) for mask, _ in checks])
+    first = _first_kept(code, ~is_known & ~failed)
+    is_repeat = pos > first
+    first_name = pd.Series(name.to_numpy()[first.fillna(0).astype(int)], index=df.index)
+    same_name = (is_known & (existing_name == name)) | (is_repeat & (first_name == name))
+    other_name = (is_known & (existing_name != name)) | (is_repeat & (first_name != name))
+    checks.insert(
+        2,
+        (
+            (code != "") & (code.str.len() <= 32) & other_name,
+            "Duplicate recipe_code with different name",
+        ),
+    )
+    errors = _join_errors(df, checks)
+
+    is_duplicate = same_name
+    is_rejected = ~is_duplicate & (errors != "")
+    is_insert = ~is_duplicate & (errors == "")
+
+    rejected = df.loc[is_rejected].copy()
+    rejected["errors"] = errors[is_rejected]
+
+    inserts = pd.DataFrame(
+        {
+            "recipe_code": code,
+            "name": name,
+            "status": status,
+            "yield_qty": yield_qty,
+            "yield_uom": yield_uom,
+            "price": price.astype(object).where(price.notna(), None),
+            "recipe_category": _optional_text(df, "recipe_category"),
+        }
+    )[is_insert]
+
+    return RecipeImport(
+        inserts=inserts.astype(object).to_dict("records"),
+        rejected=rejected.reset_index(drop=True),
+        duplicates=[
+            {"recipe_code": c, "name": n} for c, n in zip(code[is_duplicate], name[is_duplicate])
+        ],
+    )
+
+
+def read_chunks(source, chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Parse a CSV (path or file object) `chunksize` rows at a time."""
+    with pd.read_csv(source, chunksize=chunksize) as reader:
+        for chunk in reader:
+            # `errors` is what we add to rejected rows; re-uploading a fixed file keeps it
+            yield chunk.drop(columns=["errors"], errors="ignore")
+
+
+def run_import(
+    chunks: Iterable[pd.DataFrame],
+    validate: Validator,
+    write: Optional[Callable[[List[Row]], Optional[int]]] = None,
+    on_rejected: Optional[Callable[[pd.DataFrame], Any]] = None,
+    on_duplicates: Optional[Callable[[List[Row]], Any]] = None,
+    batch_rows: int = BATCH_ROWS,
+    existing: Optional[Dict[str, Row]] = None,
+    key: Optional[str] = None,
+) -> Iterator[ChunkReport]:
+    """
+    Validate each chunk and, when `write` is given, insert its valid rows in
+    batches of `batch_rows`; yields one ChunkReport per chunk as it finishes.
+    Without `write` this is a dry run (`inserted` stays 0). `write(batch)` returns
+    how many rows it wrote (a conflict-skipping insert may write fewer); None
+    counts the whole batch.
+
+    With `existing` (code -> row, as the validators take it) and `key` (the code
+    column), `validate` is called as `validate(chunk, existing=...)` and every
+    chunk's inserts (its valid rows in a dry run) join a copy of `existing`, so
+    a code repeated in a later chunk is a duplicate as it is within one.
+
+    A failing batch ends the run: its chunk's report carries the error and the
+    rows inserted before it, and every earlier chunk stays committed.
+    """
+    taken = dict(existing) if existing is not None else None
+    for n, chunk in enumerate(chunks, start=1):
+        t0 = time.perf_counter()
+        if taken is None:
+            inserts, rejected, duplicates = validate(chunk)
+        else:
+            inserts, rejected, duplicates = validate(chunk, existing=taken)
+        if on_rejected is not None and not rejected.empty:
+            on_rejected(rejected)
+        if on_duplicates is not None and duplicates:
+            on_duplicates(duplicates)
+
+        inserted, done, error = 0, 0, None
+        if write is not None:
+            for start in range(0, len(inserts), batch_rows):
+                batch = inserts[start : start + batch_rows]
+                try:
+                    written = write(batch)
+                except Exception as e:
+                    error = str(e)
+                    break
+                inserted += len(batch) if written is None else written
+                done += len(batch)
+        if taken is not None:
+            # Rows a committed batch skipped are taken too (by another writer)
+            kept = inserts if write is None else inserts[:done]
+            taken.update((r[key], r) for r in kept)
+
+        yield ChunkReport(
+            chunk=n,
+            rows=len(chunk),
+            valid=len(inserts),
+            inserted=inserted,
+            rejected=len(rejected),
+            duplicates=len(duplicates),
+            seconds=time.perf_counter() - t0,
+            error=error,
+        )
+        if error is not None:
+            return
+
+
+__all__ = [
+    "BATCH_ROWS",
+    "CHUNK_ROWS",
+    "INGREDIENT_REQUIRED",
+    "RECIPE_REQUIRED",
+    "VALID_INGREDIENT_STATUSES",
+    "VALID_INGREDIENT_TYPES",
+    "ChunkReport",
+    "IngredientImport",
+    "RecipeImport",
+    "read_chunks",
+    "run_import",
+    "validate_ingredients",
+    "validate_recipes",
+]
@@ -0,0 +1,280 @@
+"""
+Query profiler: every PostgREST call and direct SQL read, with its wall time,
+grouped by Streamlit rerun.
+
+The shared supabase client (utils.supabase_client) sends its requests through
+`ProfiledTransport`, so tenant_db, raw `supabase.rpc(...)` / `supabase.table(...)`
+calls and components are all measured at the HTTP layer: name (table or
+`rpc/<fn>`), filters (the query string), rows (from Content-Range), bytes and
+time until the body is read. utils.sql_read reports its reads with `record`.
+
+Each browser session keeps its current and previous rerun (the sidebar panel in
+components.query_profiler shows the previous one). Everything also goes to the
+`menu.queries` logger as JSON lines: one DEBUG line per call, one INFO summary
+per rerun, and a WARNING when one relation is hit N_PLUS_ONE_CALLS or more
+times in a rerun (the N+1 pattern).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import httpx
+
+from utils.secrets import get as get_secret
+from utils.tenant_state import current_rerun
+
+LOGGER_NAME = "menu.queries"
+N_PLUS_ONE_CALLS = 5  # same relation this many times in one rerun -> warning
+MAX_CALLS_PER_RUN = 500  # beyond this a run only counts (dropped)
+MAX_SESSIONS = 64  # sessions whose runs are kept, least recently active dropped first
+
+# Query-string keys that shape the response rather than filter rows
+_NOT_FILTERS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+_REST_PATH = re.compile(r"/rest/v1/(.+)$")
+_CONTENT_RANGE = re.compile(r"^(\d+)-(\d+)/")
+
+log = logging.getLogger(LOGGER_NAME)
+
+
+def _configure_logging() -> None:
+    # The app configures no logging; give this logger its own JSON-lines handler
+    if log.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel((get_secret("LOG_LEVEL", default="INFO") or "INFO").upper())
+    log.propagate = False
+
+
+_configure_logging()
+
+
+class Call(NamedTuple):
+    name: str  # table/view, "rpc/<fn>", or "sql" for raw direct SQL
+    method: str  # HTTP method, or "SQL" for direct reads
+    filters: str  # e.g. "tenant_id=eq.…&deleted_at=is.null"
+    rows: Optional[int]  # None when the response does not say
+    bytes: Optional[int]
+    started: float  # seconds after the run started
+    seconds: float
+    status: Optional[int] = None
+
+
+@dataclass
+class Run:
+    """The calls of one Streamlit rerun, in start order."""
+
+    seq: int
+    started: float = field(default_factory=time.perf_counter)
+    calls: List[Call] = field(default_factory=list)
+    dropped: int = 0
+
+    def totals(self) -> Dict[str, Any]:
+        calls = self.calls
+        return {
+            "calls": len(calls) + self.dropped,
+            "seconds": sum(c.seconds for c in calls),
+            # first start to last finish: what the page actually waited, overlap included
+            "span": max((c.started + c.seconds for c in calls), default=0.0)
+            - min((c.started for c in calls), default=0.0),
+            "rows": sum(c.rows or 0 for c in calls),
+            "bytes": sum(c.bytes or 0 for c in calls),
+        }
+
+    def repeated(self, threshold: int = N_PLUS_ONE_CALLS) -> Dict[str, int]:
+        """Relations called at least `threshold` times, most called first."""
+        counts = Counter(c.name for c in self.calls)
+        return {name: n for name, n in counts.most_common() if n >= threshold}
+
+    def slowest(self, n: int = 5) -> List[Call]:
+        return sorted(self.calls, key=lambda c: c.seconds, reverse=True)[:n]
+
+
+@dataclass
+class _Session:
+    token: Any  # identifies the rerun (tenant_state.current_rerun)
+    current: Run
+    previous: Optional[Run] = None
+
+
+_lock = threading.Lock()
+_sessions: "OrderedDict[str, _Session]" = OrderedDict()
+
+
+def _session_runs() -> Optional[_Session]:
+    """This session's runs, rotated when a new rerun has started (None outside Streamlit)."""
+    rerun = current_rerun()
+    if rerun is None:
+        return None
+    session_id, token = rerun
+    finished = None
+    with _lock:
+        s = _sessions.get(session_id)
+        if s is None:
+            s = _sessions[session_id] = _Session(token, Run(seq=1))
+        elif s.token is not token:
+            finished = s.current
+            s.token, s.previous, s.current = token, finished, Run(seq=finished.seq + 1)
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > MAX_SESSIONS:
+            _sessions.popitem(last=False)
+    if finished is not None:
+        _log_run(session_id, finished)
+    return s
+
+
+def _log_run(session_id: str, run: Run) -> None:
+    if not run.calls and not run.dropped:
+        return
+    totals = {k: round(v, 4) if isinstance(v, float) else v for k, v in run.totals().items()}
+    log.info(json.dumps({"event": "rerun", "session": session_id[:8], "run": run.seq, **totals}))
+    for name, n in run.repeated().items():
+        log.warning(
+            json.dumps(
+                {
+                    "event": "n_plus_one",
+                    "session": session_id[:8],
+                    "run": run.seq,
+                    "name": name,
+                    "calls": n,
+                }
+            )
+        )
+
+
+def record(
+    name: str,
+    method: str,
+    filters: str,
+    rows: Optional[int],
+    nbytes: Optional[int],
+    started: float,
+    seconds: float,
+    status: Optional[int] = None,
+) -> None:
+    """Record one call that started at `started` (time.perf_counter()) and took `seconds`."""
+    s = _session_runs()
+    if s is not None:
+        run = s.current
+        with _lock:
+            if len(run.calls) < MAX_CALLS_PER_RUN:
+                run.calls.append(
+                    Call(
+                        name, method, filters, rows, nbytes, started - run.started, seconds, status
+                    )
+                )
+            else:
+                run.dropped += 1
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(
+            json.dumps(
+                {
+                    "event": "query",
+                    "run": s.current.seq if s is not None else None,
+                    "name": name,
+                    "method": method,
+                    "filters": filters,
+                    "rows": rows,
+                    "bytes": nbytes,
+                    "ms": round(seconds * 1000, 2),
+                    "status": status,
+                }
+            )
+        )
+
+
+def last_run() -> Optional[Run]:
+    """The previous completed rerun of this session (None before the first rerun)."""
+    s = _session_runs()
+    return s.previous if s is not None else None
+
+
+def _rows(response: httpx.Response) -> Optional[int]:
+    content_range = response.headers.get("content-range", "")
+    m = _CONTENT_RANGE.match(content_range)
+    if m:
+        return int(m.group(2)) - int(m.group(1)) + 1
+    return 0 if content_range.startswith("*/") else None
+
+
+def _name(url: httpx.URL) -> str:
+    m = _REST_PATH.search(url.path)
+    return m.group(1) if m else url.path
+
+
+def _filters(url: httpx.URL) -> str:
+    return "&".join(f"{k}={v}" for k, v in url.params.multi_items() if k not in _NOT_FILTERS)
+
+
+class _MeasuredStream(httpx.SyncByteStream):
+    """Counts body bytes; calls `on_close(nbytes)` once, when the client closes the body."""
+
+    def __init__(self, inner: httpx.SyncByteStream, on_close: Callable[[int], None]):
+        self._inner = inner
+        self._on_close: Optional[Callable[[int], None]] = on_close
+        self.nbytes = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._inner:
+            self.nbytes += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._inner.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close(self.nbytes)
+
+
+class ProfiledTransport(httpx.BaseTransport):
+    """httpx transport that records every request sent through `inner`."""
+
+    def __init__(self, inner: httpx.BaseTransport):
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        response = self._inner.handle_request(request)
+
+        def done(nbytes: int) -> None:
+            record(
+                _name(request.url),
+                request.method,
+                _filters(request.url),
+                _rows(response),
+                nbytes,
+                started,
+                time.perf_counter() - started,
+                response.status_code,
+            )
+
+        try:
+            body = response.content  # already in memory (non-streaming transports)
+        except httpx.ResponseNotRead:
+            response.stream = _MeasuredStream(response.stream, done)
+        else:
+            done(len(body))
+        return response
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+__all__ = [
+    "Call",
+    "ProfiledTransport",
+    "Run",
+    "last_run",
+    "record",
+]
@@ -0,0 +1,406 @@
+"""
+Full-tenant snapshots: Parquet or Arrow IPC files with typed columns, and the
+matching restore.
+
+A snapshot is a zip holding one file per relation and `manifest.json` (format,
+tenant, app version, row counts):
+
+- TABLES, the tenant's data (ingredients, recipes, recipe lines, sales), which
+  `restore` loads back with their ids;
+- VIEWS, the derived cost views, for analysis off the live DB (`open_snapshot`);
+  they are never restored, the cost store recomputes them.
+
+Every relation has a fixed Arrow schema (COLUMNS), whichever read path fetched
+it, so files from the REST path and the direct SQL path are interchangeable:
+uuids and text are strings, numerics float64, timestamps microseconds (UTC for
+timestamptz). Rows are written page by page as they are read (exports), and
+restored batch by batch: COPY (utils.bulk_load) when DB_* secrets are
+configured, one transaction per table; REST inserts otherwise.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import zipfile
+from datetime import date, datetime, timezone
+from typing import IO, Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from utils import exports
+from utils import tenant_db as db
+from utils.bulk_load import bulk_load
+from utils.db import direct_url_configured, get_engine
+from utils.importers import BATCH_ROWS, CHUNK_ROWS
+from utils.version import __version__
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+MANIFEST = "manifest.json"
+
+# Restorable tables, in load order (referenced rows first)
+TABLES = ("ingredients", "recipes", "recipe_lines", "sales")
+# Derived cost views: exported for analysis, never restored
+VIEWS = ("ingredient_costs", "prep_costs", "recipe_line_costs", "recipe_summary")
+RELATIONS = TABLES + VIEWS
+
+_TYPES = {
+    "text": pa.string(),
+    "num": pa.float64(),
+    "date": pa.date32(),
+    "ts": pa.timestamp("us"),
+    "tstz": pa.timestamp("us", tz="UTC"),
+}
+
+# relation -> column -> type (_TYPES); uuids are text, as tenant_db returns them
+COLUMNS: Dict[str, Dict[str, str]] = {
+    "ingredients": {
+        "id": "text",
+        "tenant_id": "text",
+        "ingredient_code": "text",
+        "name": "text",
+        "ingredient_type": "text",
+        "status": "text",
+        "category_id": "text",
+        "storage_type_id": "text",
+        "package_qty": "num",
+        "package_uom": "text",
+        "base_uom": "text",
+        "package_cost": "num",
+        "yield_pct": "num",
+        "message": "text",
+        "created_at": "tstz",
+        "updated_at": "tstz",
+    },
+    "recipes": {
+        "id": "text",
+        "tenant_id": "text",
+        "recipe_code": "text",
+        "name": "text",
+        "status": "text",
+        "recipe_type": "text",
+        "recipe_category": "text",
+        "yield_qty": "num",
+        "yield_uom": "text",
+        "price": "num",
+        "updated_at": "tstz",
+    },
+    "recipe_lines": {
+        "id": "text",
+        "tenant_id": "text",
+        "recipe_id": "text",
+        "ingredient_id": "text",
+        "qty": "num",
+        "qty_uom": "text",
+        "note": "text",
+        "updated_at": "tstz",
+    },
+    "sales": {
+        "id": "text",
+        "tenant_id": "text",
+        "recipe_id": "text",
+        "sale_date": "date",
+        "qty": "num",
+        "list_price": "num",
+        "discount": "num",
+        "net_price": "num",
+        "created_at": "ts",
+    },
+    "ingredient_costs": {
+        "tenant_id": "text",
+        "ingredient_id": "text",
+        "ingredient_code": "text",
+        "name": "text",
+        "package_qty": "num",
+        "package_uom": "text",
+        "base_uom": "text",
+        "package_cost": "num",
+        "yield_pct": "num",
+        "package_qty_net": "num",
+        "conversion_factor": "num",
+        "package_qty_net_base_unit": "num",
+        "unit_cost": "num",
+    },
+    "prep_costs": {
+        "tenant_id": "text",
+        "recipe_id": "text",
+        "recipe_code": "text",
+        "name": "text",
+        "yield_qty": "num",
+        "yield_uom": "text",
+        "total_cost": "num",
+        "conversion_factor": "num",
+        "base_uom": "text",
+        "unit_cost": "num",
+    },
+    "recipe_line_costs": {
+        "tenant_id": "text",
+        "recipe_line_id": "text",
+        "recipe_id": "text",
+        "ingredient_id": "text",
+        "qty": "num",
+        "qty_uom": "text",
+        "line_cost": "num",
+    },
+    "recipe_summary": {
+        "tenant_id": "text",
+        "recipe_id": "text",
+        "recipe_code": "text",
+        "name": "text",
+        "status": "text",
+        "price": "num",
+        "total_cost": "num",
+        "cost_pct": "num",
+        "margin": "num",
+    },
+}
+
+# Unique per tenant: keyset order for paged reads
+KEYS = {
+    "ingredient_costs": ("ingredient_id",),
+    "prep_costs": ("recipe_id",),
+    "recipe_line_costs": ("recipe_line_id",),
+    "recipe_summary": ("recipe_id",),
+}
+
+Source = Union[bytes, IO[bytes]]
+
+
+def schema(name: str) -> pa.Schema:
+    return pa.schema([(c, _TYPES[t]) for c, t in COLUMNS[name].items()])
+
+
+def _array(values: pd.Series, kind: str) -> pa.Array:
+    if kind == "num":
+        values = pd.to_numeric(values, errors="coerce")
+    elif kind == "tstz":
+        values = pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+    elif kind in ("ts", "date"):
+        values = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    else:
+        values = values.astype(object).where(values.notna(), None)
+    array = pa.array(values, from_pandas=True)
+    return array if array.type == _TYPES[kind] else array.cast(_TYPES[kind])
+
+
+def to_arrow(name: str, frame: pd.DataFrame) -> pa.Table:
+    """`frame` (as either read path returns it) with `name`'s schema; missing columns are null."""
+    arrays = [
+        _array(frame[c] if c in frame else pd.Series([None] * len(frame), dtype=object), kind)
+        for c, kind in COLUMNS[name].items()
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema(name))
+
+
+def frames() -> Iterator[Tuple[str, pd.DataFrame]]:
+    """(relation, page) for every relation of the active tenant, relation by relation."""
+    for name in RELATIONS:
+        columns = ", ".join(COLUMNS[name])
+        for frame in exports.relation_frames(name, columns, key=KEYS.get(name, ("id",))):
+            yield name, frame
+
+
+class _Writer:
+    """One relation's file, written page by page into memory."""
+
+    def __init__(self, name: str, fmt: str):
+        self.buf = io.BytesIO()
+        if fmt == "parquet":
+            self.out = pq.ParquetWriter(self.buf, schema(name), compression="zstd")
+        else:
+            options = ipc.IpcWriteOptions(compression="zstd")
+            self.out = ipc.new_file(self.buf, schema(name), options=options)
+        self.name = name
+        self.rows = 0
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if not frame.empty:
+            self.out.write_table(to_arrow(self.name, frame))
+            self.rows += len(frame)
+
+    def close(self) -> bytes:
+        self.out.close()
+        return self.buf.getvalue()
+
+
+def write(pages: Iterable[Tuple[str, pd.DataFrame]], fmt: str = "parquet") -> Tuple[bytes, int]:
+    """
+    Zip of one `fmt` file per relation (RELATIONS; relations without pages get an
+    empty file) plus the manifest, and the total row count. Pages arrive grouped
+    by relation, so one file is open at a time.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown snapshot format {fmt!r}")
+    rows: Dict[str, int] = {}
+    buf = io.BytesIO()
+    # the files are compressed already
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+
+        def flush(w: _Writer) -> None:
+            zf.writestr(w.name + FORMATS[fmt], w.close())
+            rows[w.name] = w.rows
+
+        current: Optional[_Writer] = None
+        for name, frame in pages:
+            if current is None or current.name != name:
+                if current is not None:
+                    flush(current)
+                current = _Writer(name, fmt)
+            current.write(frame)
+        if current is not None:
+            flush(current)
+        for name in RELATIONS:
+            if name not in rows:
+                flush(_Writer(name, fmt))
+
+        manifest = {
+            "format": fmt,
+            "tenant_id": db.active_tenant_id(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "app_version": __version__,
+            "rows": {name: rows[name] for name in RELATIONS},
+        }
+        zf.writestr(MANIFEST, json.dumps(manifest, indent=2))
+    return buf.getvalue(), sum(rows.values())
+
+
+class Snapshot(NamedTuple):
+    manifest: Dict[str, Any]
+    files: zipfile.ZipFile
+
+    def batches(self, name: str) -> Iterator[pa.RecordBatch]:
+        """`name`'s rows, one record batch at a time."""
+        data = pa.py_buffer(self.files.read(name + FORMATS[self.manifest["format"]]))
+        if self.manifest["format"] == "parquet":
+            yield from pq.ParquetFile(pa.BufferReader(data)).iter_batches(batch_size=CHUNK_ROWS)
+        else:
+            reader = ipc.open_file(data)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """`name` as one typed DataFrame (for analysis; `batches` for large tables)."""
+        batches = list(self.batches(name))
+        return pa.Table.from_batches(batches, schema=schema(name)).to_pandas()
+
+
+def open_snapshot(source: Source) -> Snapshot:
+    """Read a snapshot zip (bytes or a binary file, e.g. an upload)."""
+    files = zipfile.ZipFile(io.BytesIO(source) if isinstance(source, bytes) else source)
+    try:
+        manifest = json.loads(files.read(MANIFEST))
+    except KeyError:
+        raise ValueError("Not a snapshot: manifest.json is missing") from None
+    if manifest.get("format") not in FORMATS:
+        raise ValueError(f"Unknown snapshot format {manifest.get('format')!r}")
+    return Snapshot(manifest, files)
+
+
+class RestoreResult(NamedTuple):
+    table: str
+    rows: int  # rows in the snapshot
+    loaded: int  # rows written (left in the table, on failure); 0 when skipped
+    skipped: Optional[str] = None  # why the table was not restored
+    error: Optional[str] = None  # why loading failed; the restore stops there
+
+
+def _json_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    # REST inserts are JSON: dates and timestamps as ISO strings
+    return {k: v.isoformat() if isinstance(v, (date, datetime)) else v for k, v in row.items()}
+
+
+def _present(table: str) -> int:
+    # Soft-deleted rows keep their ids, so they block a restore as live ones do
+    res = db.table(table, include_deleted=True).select(count="exact", memo=False).limit(1)
+    return res.execute().count or 0
+
+
+def _rows(snapshot: Snapshot, table: str) -> Iterator[List[Dict[str, Any]]]:
+    for batch in snapshot.batches(table):
+        # the load stamps the active tenant; timestamps are the database's own
+        rows = [
+            {k: v for k, v in r.items() if k not in ("tenant_id", "created_at", "updated_at")}
+            for r in batch.to_pylist()
+        ]
+        if rows:
+            yield rows
+
+
+def _load_table(snapshot: Snapshot, table: str, tenant_id: str) -> int:
+    if direct_url_configured():
+        # One transaction per table: a failure leaves it empty, ready for a retry
+        with get_engine().begin() as conn:
+            return sum(
+                bulk_load(table, rows, tenant_id, bind=conn).written
+                for rows in _rows(snapshot, table)
+            )
+    loaded = 0
+    for rows in _rows(snapshot, table):
+        for i in range(0, len(rows), BATCH_ROWS):
+            batch = rows[i : i + BATCH_ROWS]
+            db.insert_many(table, [_json_row(r) for r in batch]).execute()
+            loaded += len(batch)
+    return loaded
+
+
+def restore(snapshot: Snapshot) -> List[RestoreResult]:
+    """
+    Load the snapshot's TABLES back into the active tenant, ids included, so
+    lines and sales keep pointing at their recipes and ingredients.
+
+    Only the tenant the snapshot was taken from, and only into tables that have
+    no rows, soft-deleted ones included (e.g. after Settings → Scrub Dataset);
+    tables holding at least the snapshot's rows are skipped and reported.
+
+    With DB_* secrets each table loads in one transaction. Over REST each batch
+    commits on its own, so a failure can leave a table partly loaded: it is
+    reported as failed, then and on a retry (fewer rows than the snapshot), and
+    the restore stops before the tables that reference it.
+    """
+    tenant_id = db.active_tenant_id()
+    if snapshot.manifest.get("tenant_id") != tenant_id:
+        raise ValueError("This snapshot was taken from another tenant")
+
+    results = []
+    for table in TABLES:
+        total = snapshot.manifest["rows"].get(table, 0)
+        present = _present(table)
+        if present and present >= total:
+            results.append(RestoreResult(table, total, 0, f"{present:,} rows already present"))
+            continue
+        if present:
+            error = f"partly restored ({present:,} of {total:,} rows): scrub it and restore again"
+            results.append(RestoreResult(table, total, 0, error=error))
+            return results
+        try:
+            loaded = _load_table(snapshot, table, tenant_id)
+        except Exception as e:
+            loaded = _present(table)
+            if loaded:
+                db.publish_change(table, tenant_id)
+            results.append(RestoreResult(table, total, loaded, error=str(e)))
+            return results
+        if loaded:
+            db.publish_change(table, tenant_id)
+        results.append(RestoreResult(table, total, loaded))
+    return results
+
+
+__all__ = [
+    "COLUMNS",
+    "FORMATS",
+    "RELATIONS",
+    "RestoreResult",
+    "Snapshot",
+    "TABLES",
+    "VIEWS",
+    "frames",
+    "open_snapshot",
+    "restore",
+    "schema",
+    "to_arrow",
+    "write",
+]
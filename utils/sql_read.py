@@ -0,0 +1,175 @@
+"""
+Direct-SQL read path: tenant-scoped queries over the pooled engine (utils.db),
+returned as DataFrames built straight from the cursor.
+
+PostgREST serializes every row to JSON and the client parses it back; for wide
+reads (cost views, exports) that is most of the cost. Here rows go from the
+psycopg cursor into `pd.DataFrame.from_records`. `numeric` loads as float and
+`uuid` as text, so frames match what the REST path returns.
+
+A direct connection bypasses RLS, so the tenant filter is the caller's
+contract: `read_df` refuses SQL that does not bind `%(tenant_id)s`, and
+`read_relation` adds the filter itself. Connections are opened read-only.
+
+Only available when DB_* secrets are configured (`utils.db.direct_url_configured`).
+This module does not import the supabase client.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+from psycopg import sql
+from psycopg.types.numeric import FloatLoader
+from psycopg.types.string import TextLoader
+from sqlalchemy.engine import Connection, Engine
+
+from utils import profiler
+from utils.db import get_engine
+
+Query = Union[str, sql.Composable]
+
+
+# Rows per fetch from a server-side cursor (iter_relation)
+CURSOR_ROWS = 10_000
+
+
+@contextmanager
+def _cursor(bind: Union[Engine, Connection, None], name: Optional[str] = None) -> Iterator[Any]:
+    # cursors are closed before the connection goes back (to the caller or the pool);
+    # a `name` makes it a server-side cursor (rows stay in Postgres until fetched)
+    if isinstance(bind, Connection):
+        with bind.connection.driver_connection.cursor(name=name) as cur:
+            yield cur
+        return
+    # read-only for the checkout; the pool resets it (and rolls back) on return
+    with (bind or get_engine()).connect() as conn:
+        conn = conn.execution_options(postgresql_readonly=True)
+        with conn.connection.driver_connection.cursor(name=name) as cur:
+            yield cur
+
+
+def _fetch_df(cur, query: Query, params: Dict[str, Any], name: str) -> pd.DataFrame:
+    started = time.perf_counter()
+    cur.adapters.register_loader("numeric", FloatLoader)
+    cur.adapters.register_loader("uuid", TextLoader)
+    cur.execute(query, params)
+    columns = [d.name for d in cur.description]
+    df = pd.DataFrame.from_records(cur.fetchall(), columns=columns)
+    filters = "&".join(f"{k}={v}" for k, v in params.items())
+    profiler.record(name, "SQL", filters, len(df), None, started, time.perf_counter() - started)
+    return df
+
+
+def read_df(
+    query: Query,
+    tenant_id: str,
+    params: Optional[Dict[str, Any]] = None,
+    *,
+    bind: Union[Engine, Connection, None] = None,
+) -> pd.DataFrame:
+    """
+    Run a parameterized query (psycopg `%(name)s` placeholders) for `tenant_id`.
+
+    The query must filter on `%(tenant_id)s`; it is bound from `tenant_id`.
+    `bind` defaults to the shared engine (read-only); pass a Connection to read
+    inside the caller's transaction.
+    """
+    if not tenant_id:
+        raise ValueError("read_df needs a tenant_id")
+    if isinstance(query, str) and "%(tenant_id)s" not in query:
+        raise ValueError("read_df queries must filter on %(tenant_id)s")
+    with _cursor(bind) as cur:
+        return _fetch_df(cur, query, {**(params or {}), "tenant_id": tenant_id}, "sql")
+
+
+def _relation_query(
+    name: str,
+    columns: str,
+    tenant_id: Optional[str],
+    live_only: bool,
+    order_by: Sequence[str],
+    filters: Dict[str, Any],
+) -> Tuple[sql.Composable, Dict[str, Any]]:
+    cols = [c.strip() for c in columns.split(",")]
+    select = sql.SQL("*") if "*" in cols else sql.SQL(", ").join(map(sql.Identifier, cols))
+    where, params = [], {}
+    if tenant_id is not None:
+        where.append(sql.SQL("tenant_id = %(tenant_id)s"))
+        params["tenant_id"] = tenant_id
+    if live_only:
+        where.append(sql.SQL("deleted_at is null"))
+    for k, v in filters.items():
+        where.append(sql.SQL("{} = {}").format(sql.Identifier(k), sql.Placeholder(k)))
+        params[k] = v
+
+    query = sql.SQL("select {} from public.{}").format(select, sql.Identifier(name))
+    if where:
+        query += sql.SQL(" where ") + sql.SQL(" and ").join(where)
+    if order_by:
+        query += sql.SQL(" order by ") + sql.SQL(", ").join(map(sql.Identifier, order_by))
+    return query, params
+
+
+def read_relation(
+    name: str,
+    columns: str = "*",
+    *,
+    tenant_id: Optional[str] = None,
+    live_only: bool = False,
+    order_by: Sequence[str] = (),
+    bind: Union[Engine, Connection, None] = None,
+    **filters,
+) -> pd.DataFrame:
+    """
+    `select columns from public.name` as a DataFrame, the way tenant_db scopes it:
+    `tenant_id` filters tenant-scoped relations (None: global, no filter),
+    `live_only` skips soft-deleted rows. `filters` are equality filters.
+    """
+    query, params = _relation_query(name, columns, tenant_id, live_only, order_by, filters)
+    with _cursor(bind) as cur:
+        return _fetch_df(cur, query, params, name)
+
+
+def iter_relation(
+    name: str,
+    columns: str = "*",
+    *,
+    tenant_id: Optional[str] = None,
+    live_only: bool = False,
+    order_by: Sequence[str] = (),
+    page_size: int = CURSOR_ROWS,
+    bind: Union[Engine, Connection, None] = None,
+    **filters,
+) -> Iterator[pd.DataFrame]:
+    """
+    `read_relation`, one DataFrame of up to `page_size` rows at a time, fetched
+    from a server-side cursor: memory stays bounded by a page however large the
+    relation is. The connection is held until the iterator is exhausted or closed.
+    """
+    query, params = _relation_query(name, columns, tenant_id, live_only, order_by, filters)
+    started = time.perf_counter()
+    rows = 0
+    with _cursor(bind, name=f"iter_{name}") as cur:
+        cur.adapters.register_loader("numeric", FloatLoader)
+        cur.adapters.register_loader("uuid", TextLoader)
+        cur.execute(query, params)
+        while True:
+            page = cur.fetchmany(page_size)
+            if not page:
+                break
+            rows += len(page)
+            yield pd.DataFrame.from_records(page, columns=[d.name for d in cur.description])
+    filters_text = "&".join(f"{k}={v}" for k, v in params.items())
+    profiler.record(name, "SQL", filters_text, rows, None, started, time.perf_counter() - started)
+
+
+__all__ = [
+    "CURSOR_ROWS",
+    "iter_relation",
+    "read_df",
+    "read_relation",
+]
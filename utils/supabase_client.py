@@ -1,13 +1,24 @@
 # utils/supabase_client.py
 from __future__ import annotations
 
-from supabase import Client, create_client
+import httpx
+from supabase import Client, ClientOptions, create_client
 
+from utils.profiler import ProfiledTransport
 from utils.secrets import get as get_secret
 
 SUPABASE_URL = get_secret("SUPABASE_URL", required=True)
 SUPABASE_ANON_KEY = get_secret("SUPABASE_ANON_KEY", required=True)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+# Same settings as postgrest's default session; the transport records every call (utils.profiler)
+_http = httpx.Client(
+    transport=ProfiledTransport(httpx.HTTPTransport(http2=True)),
+    timeout=120,
+    follow_redirects=True,
+)
+
+supabase: Client = create_client(
+    SUPABASE_URL, SUPABASE_ANON_KEY, options=ClientOptions(httpx_client=_http)
+)
 
 __all__ = ["supabase", "SUPABASE_URL", "SUPABASE_ANON_KEY"]
@@ -1,9 +1,30 @@
 # utils/tenant_db.py
-from typing import Any, Dict, List, Optional, Set
-
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import pandas as pd
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from utils import cache, sql_read
+from utils.db import direct_url_configured
 from utils.secrets import get as get_secret
 from utils.supabase_client import supabase
-from utils.tenant_state import get_active_tenant, set_active_tenant
+from utils.tenant_state import current_rerun, get_active_tenant, pinned_tenant, set_active_tenant
 
 Json = Dict[str, Any]
 
@@ -22,6 +43,10 @@ TENANT_SCOPED: Set[str] = {
     "recipe_summary",
     "prep_costs",
     "missing_uom_conversions",
+    "recipe_cost_store",
+    "recipe_line_cost_store",
+    "ingredient_grid",
+    "recipe_grid",
     # add more here as you tenant-scope them
 }
 
@@ -36,13 +61,230 @@ SOFT_DELETE: Set[str] = {
     # add more here if needed
 }
 
+# RPCs that take the active tenant as p_tenant
+TENANT_RPCS: Set[str] = {
+    "get_recipe_details_mt",
+    "get_unit_costs_for_inputs_mt",
+    "get_recipe_editor_bundle",
+    "maintenance_backfill_base_uom",
+    "maintenance_inferred_base_uom",
+    "search_input_catalog",
+}
+
 # Global (no tenant filter)
 GLOBAL_TABLES: Set[str] = {
     "tenants",
     "user_tenant_memberships",
     "ref_uom_conversion",  # global by design
+    "ref_uom_conversion_closure",  # derived from ref_uom_conversion (V018)
+}
+
+# Base table -> views (and trigger-maintained tables, V016) computed from it. A write to
+# the table makes cached reads of the table itself and of these stale (see
+# _evict_cached_reads).
+DEPENDENTS: Dict[str, Set[str]] = {
+    "ingredients": {
+        "ingredient_costs",
+        "ingredient_grid",
+        "input_catalog",
+        "recipe_line_costs_base",
+        "recipe_line_costs",
+        "prep_costs",
+        "recipe_summary",
+        "recipe_cost_store",
+        "recipe_line_cost_store",
+        "missing_uom_conversions",
+        "recipe_grid",
+    },
+    "recipes": {
+        "input_catalog",
+        "recipe_line_costs",
+        "prep_costs",
+        "recipe_summary",
+        "recipe_cost_store",
+        "recipe_line_cost_store",
+        "missing_uom_conversions",
+        "recipe_grid",
+    },
+    "recipe_lines": {
+        "recipe_line_costs_base",
+        "recipe_line_costs",
+        "prep_costs",
+        "recipe_summary",
+        "recipe_cost_store",
+        "recipe_line_cost_store",
+        "missing_uom_conversions",
+        "recipe_grid",
+    },
+    "ref_uom_conversion": {
+        "ref_uom_conversion_closure",
+        "ingredient_costs",
+        "ingredient_grid",
+        "recipe_line_costs_base",
+        "recipe_line_costs",
+        "prep_costs",
+        "recipe_summary",
+        "recipe_cost_store",
+        "recipe_line_cost_store",
+        "missing_uom_conversions",
+        "recipe_grid",
+    },
+    "ref_ingredient_categories": {"ingredient_grid"},
+    "ref_storage_type": {"ingredient_grid"},
 }
 
+# Rows per keyset page. PostgREST caps every response at its `max-rows` (1000 on
+# Supabase); a smaller cap only means more pages, never missing rows.
+PAGE_SIZE = 1000
+
+# listener(table, tenant_id, rows, deleted): rows are the written rows as returned by the
+# write (None when unknown); deleted=True for hard deletes
+ChangeListener = Callable[[str, Optional[str], Optional[List[Json]], bool], None]
+_listeners: List[ChangeListener] = []
+
+
+def on_change(listener: ChangeListener) -> ChangeListener:
+    """Register `listener(table, tenant_id, rows, deleted)`; called after every successful write."""
+    _listeners.append(listener)
+    return listener
+
+
+def affected_relations(name: str) -> Set[str]:
+    return {name} | DEPENDENTS.get(name, set())
+
+
+def publish_change(
+    name: str,
+    tenant_id: Optional[str] = None,
+    rows: Optional[List[Json]] = None,
+    deleted: bool = False,
+) -> None:
+    """Announce "table `name` changed for tenant `tenant_id`" (None = global table)."""
+    for listener in list(_listeners):
+        listener(name, tenant_id, rows, deleted)
+
+
+# Per-rerun read memo: session_id -> (rerun token, fingerprint -> Future of the response)
+MEMO_SESSIONS = 64
+MEMO_ENTRIES = 256  # responses kept per rerun; later reads run unmemoized
+_memos: "OrderedDict[str, Tuple[Any, Dict[Hashable, Future]]]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def _rerun_memo() -> Optional[Dict[Hashable, Future]]:
+    """This rerun's memo (a new, empty one on every rerun); None outside Streamlit."""
+    rerun = current_rerun()
+    if rerun is None:
+        return None
+    session_id, token = rerun
+    with _memo_lock:
+        entry = _memos.get(session_id)
+        if entry is None or entry[0] is not token:
+            entry = _memos[session_id] = (token, {})
+        _memos.move_to_end(session_id)
+        while len(_memos) > MEMO_SESSIONS:
+            _memos.popitem(last=False)
+        return entry[1]
+
+
+def _fingerprint(builder) -> Optional[Hashable]:
+    """What makes two built reads identical: relation, columns, filters, order, range, shape."""
+    req = getattr(builder, "request", None)
+    if req is None or getattr(req.http_method, "value", req.http_method) != "GET":
+        return None
+    params = tuple(
+        (k, v.replace(" ", "") if k == "select" else v) for k, v in req.params.multi_items()
+    )
+    headers = tuple(req.headers.get(h) for h in ("accept", "accept-profile", "prefer", "range"))
+    return str(req.path), params, headers
+
+
+def _memo_execute(builder):
+    """
+    `builder.execute()`, at most once per fingerprint per rerun. Concurrent identical
+    reads (db.gather) wait for the first. The first caller's response is kept as
+    returned; later callers get their own copy of it. Once MEMO_ENTRIES responses
+    are kept, new reads run unmemoized.
+    """
+    memo = _rerun_memo()
+    key = _fingerprint(builder) if memo is not None else None
+    if key is None:
+        return builder.execute()
+
+    with _memo_lock:
+        future = memo.get(key)
+        owner = future is None
+        if owner and len(memo) >= MEMO_ENTRIES:
+            key = None
+        elif owner:
+            future = memo[key] = Future()
+    if key is None:
+        return builder.execute()
+    if not owner:
+        return copy.deepcopy(future.result())
+
+    try:
+        res = builder.execute()
+    except BaseException as e:
+        with _memo_lock:
+            if memo.get(key) is future:
+                del memo[key]
+        future.set_exception(e)
+        raise
+    future.set_result(res)
+    return res
+
+
+class _Read:
+    """
+    Proxy around a postgrest select builder. Filters chain through unchanged;
+    `.execute()` goes through the per-rerun memo (_memo_execute) unless `memo` is off.
+    """
+
+    def __init__(self, builder, memo: bool = True):
+        self._builder = builder
+        self._memo = memo
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._builder, attr)
+        if not callable(value):
+            return value
+
+        def chained(*args, **kwargs):
+            out = value(*args, **kwargs)
+            if hasattr(out, "execute"):
+                return _Read(out, self._memo)
+            return out
+
+        return chained
+
+    def execute(self):
+        if not self._memo:
+            return self._builder.execute()
+        return _memo_execute(self._builder)
+
+
+@on_change
+def _forget_rerun_reads(
+    name: str, tenant_id: Optional[str], rows: Optional[List[Json]], deleted: bool
+) -> None:
+    # a write in this rerun: later reads in it must see the new rows
+    memo = _rerun_memo()
+    if memo is not None:
+        with _memo_lock:
+            memo.clear()
+
+
+@on_change
+def _evict_cached_reads(
+    name: str, tenant_id: Optional[str], rows: Optional[List[Json]], deleted: bool
+) -> None:
+    relations = affected_relations(name)
+    if name in GLOBAL_TABLES or tenant_id is None:
+        cache.invalidate_everywhere(relations)
+    else:
+        cache.invalidate(tenant_id, relations)
+
 
 def _tid() -> str:
     t = get_active_tenant()
@@ -51,7 +293,7 @@ def _tid() -> str:
 
     # 1) DB default (and active)
     r = (
-        supabase.table("tenants")
+        table("tenants")
         .select("id")
         .eq("is_default", True)
         .eq("is_active", True)
@@ -66,21 +308,21 @@ def _tid() -> str:
     # 2) ENV default (ID first, then CODE)
     want_id = (get_secret("DEFAULT_TENANT_ID", default="") or "").strip()
     if want_id:
-        r = supabase.table("tenants").select("id").eq("id", want_id).limit(1).execute()
+        r = table("tenants").select("id").eq("id", want_id).limit(1).execute()
         if r.data:
             set_active_tenant(want_id)
             return want_id
 
     want_code = (get_secret("DEFAULT_TENANT_CODE", default="") or "").strip()
     if want_code:
-        r = supabase.table("tenants").select("id").eq("code", want_code).limit(1).execute()
+        r = table("tenants").select("id").eq("code", want_code).limit(1).execute()
         if r.data:
             tid = r.data[0]["id"]
             set_active_tenant(tid)
             return tid
 
     # 3) Fallback: first by name
-    r = supabase.table("tenants").select("id").order("name").limit(1).execute()
+    r = table("tenants").select("id").order("name").limit(1).execute()
     if not r.data:
         raise RuntimeError("No tenants provisioned.")
     tid = r.data[0]["id"]
@@ -88,50 +330,190 @@ def _tid() -> str:
     return tid
 
 
+class _Write:
+    """
+    Proxy around a postgrest write builder. Filters chain through unchanged;
+    `.execute()` runs the write and then publishes the change event.
+    """
+
+    def __init__(self, builder, name: str, tenant_ids: Set[Optional[str]], deleted: bool = False):
+        self._builder = builder
+        self._name = name
+        self._tenant_ids = tenant_ids
+        self._deleted = deleted
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._builder, attr)
+        if not callable(value):
+            return value
+
+        def chained(*args, **kwargs):
+            out = value(*args, **kwargs)
+            # postgrest filters return the (same or a new) builder; keep wrapping it
+            if hasattr(out, "execute"):
+                return _Write(out, self._name, self._tenant_ids, self._deleted)
+            return out
+
+        return chained
+
+    def execute(self):
+        res = self._builder.execute()
+        data = getattr(res, "data", None)
+        for tid in self._tenant_ids:
+            rows = None
+            if isinstance(data, list):
+                rows = [r for r in data if tid is None or r.get("tenant_id") in (None, tid)]
+            publish_change(self._name, tid, rows, self._deleted)
+        return res
+
+
+def _write_scope(name: str, tenant_id: Optional[str] = None) -> Set[Optional[str]]:
+    if name in TENANT_SCOPED:
+        return {tenant_id or _tid()}
+    return {None}
+
+
 class _TenantTable:
     def __init__(self, name: str, include_deleted: bool = False):
         self.name = name
         self.include_deleted = include_deleted
 
     # --- READS ---
-    def select(self, columns: str = "*"):
-        b = supabase.table(self.name).select(columns)
+    def select(self, columns: str = "*", count: Optional[str] = None, memo: bool = True):
+        """
+        Scoped select builder. `memo=False` skips the per-rerun memo: paged and
+        count reads, whose pages must not pile up for the rest of the rerun.
+        """
+        b = supabase.table(self.name).select(columns, count=count)
         if self.name in TENANT_SCOPED:
             b = b.eq("tenant_id", _tid())
         if (self.name in SOFT_DELETE) and (not self.include_deleted):
             # only apply if table supports soft delete
             b = b.is_("deleted_at", "null")
-        return b
+        # identical reads in one rerun run once (_memo_execute)
+        return _Read(b, memo)
+
+    def iter_rows(
+        self,
+        columns: str = "*",
+        page_size: int = PAGE_SIZE,
+        key: Sequence[str] = ("id",),
+        **filters,
+    ) -> Iterator[Json]:
+        """
+        Every matching row, fetched lazily in pages of `page_size` ordered by `key`
+        (keyset: each page starts after the last key seen, so deep pages cost the
+        same as the first and no row is skipped when PostgREST caps a response).
+        `filters` are equality filters. Key columns are added to `columns` if missing.
+        """
+        cols = [c.strip() for c in columns.split(",")]
+        if "*" not in cols:
+            cols += [k for k in key if k not in cols]
+        last: Optional[Json] = None
+        while True:
+            # Pages are read once and dropped: not memoized
+            b = self.select(", ".join(cols), memo=False)
+            for k, v in filters.items():
+                b = b.eq(k, v)
+            if last is not None:
+                b = _after(b, key, last)
+            for k in key:
+                b = b.order(k)
+            page = b.limit(page_size).execute().data or []
+            if not page:
+                return
+            yield from page
+            last = page[-1]
+
+    def iter_frames(
+        self,
+        columns: str = "*",
+        page_size: int = PAGE_SIZE,
+        key: Sequence[str] = ("id",),
+        **filters,
+    ) -> Iterator[pd.DataFrame]:
+        """`iter_rows`, one DataFrame per page."""
+        page: List[Json] = []
+        for row in self.iter_rows(columns, page_size, key, **filters):
+            page.append(row)
+            if len(page) == page_size:
+                yield pd.DataFrame(page)
+                page = []
+        if page:
+            yield pd.DataFrame(page)
+
+    def select_all(
+        self,
+        columns: str = "*",
+        page_size: int = PAGE_SIZE,
+        key: Sequence[str] = ("id",),
+        **filters,
+    ) -> List[Json]:
+        """Every matching row as a list (`iter_rows`, materialized)."""
+        return list(self.iter_rows(columns, page_size, key, **filters))
 
     # --- WRITES ---
     def insert(self, row: Json):
         payload = dict(row)
         if self.name in TENANT_SCOPED:
             payload.setdefault("tenant_id", _tid())
-        return supabase.table(self.name).insert(payload)
+        scope = _write_scope(self.name, payload.get("tenant_id"))
+        return _Write(supabase.table(self.name).insert(payload), self.name, scope)
 
     def upsert(self, row: Json):
         payload = dict(row)
         if self.name in TENANT_SCOPED:
             payload.setdefault("tenant_id", _tid())
-        return supabase.table(self.name).upsert(payload)
+        scope = _write_scope(self.name, payload.get("tenant_id"))
+        return _Write(supabase.table(self.name).upsert(payload), self.name, scope)
 
     def update(self, values: Json):
         # return a builder that already includes tenant filter, so callers can chain .eq("id",..).execute()
         b = supabase.table(self.name).update(values)
         if self.name in TENANT_SCOPED:
             b = b.eq("tenant_id", _tid())
-        return b
+        return _Write(b, self.name, _write_scope(self.name))
 
     def delete(self):
         # hard delete (discouraged). Still tenant-scoped if used.
         b = supabase.table(self.name).delete()
         if self.name in TENANT_SCOPED:
             b = b.eq("tenant_id", _tid())
-        return b
+        return _Write(b, self.name, _write_scope(self.name), deleted=True)
+
+
+def _quote(value: Any) -> str:
+    # PostgREST logic-tree values: double-quote so commas/parens/dots stay literal
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _after(builder, key: Sequence[str], last: Json):
+    """Filter to rows whose `key` tuple sorts after `last` (row comparison, spelled out)."""
+    if len(key) == 1:
+        return builder.gt(key[0], last[key[0]])
+    # (a, b) > (x, y)  <=>  a > x or (a = x and b > y), generalized to n columns
+    terms = []
+    for i, k in enumerate(key):
+        eqs = [f"{p}.eq.{_quote(last[p])}" for p in key[:i]]
+        gt = f"{k}.gt.{_quote(last[k])}"
+        terms.append(f"and({','.join(eqs + [gt])})" if eqs else gt)
+    return builder.or_(",".join(terms))
+
+
+def concat_frames(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """One DataFrame from page frames (`iter_frames`), concatenated once at the end."""
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True, copy=False)
 
 
 # Public helpers
+def active_tenant_id() -> str:
+    """Tenant every read/write is scoped to (resolves the default tenant on first use)."""
+    return _tid()
+
+
 def table(name: str, include_deleted: bool = False) -> _TenantTable:
     return _TenantTable(name, include_deleted=include_deleted)
 
@@ -145,43 +527,202 @@ def upsert(name: str, row: Json):
 
 
 def insert_many(name: str, rows: List[Json]):
+    scope: Set[Optional[str]] = {None}
     if name in TENANT_SCOPED:
         t = _tid()
         rows = [{**r, "tenant_id": r.get("tenant_id", t)} for r in rows]
-    return supabase.table(name).insert(rows)
+        scope = {r["tenant_id"] for r in rows} or {t}
+    return _Write(supabase.table(name).insert(rows), name, scope)
 
 
-def update(name: str, values: Json, **filters):
-    b = supabase.table(name)
+def _filtered_update(name: str, values: Json, filters: Dict[str, Any]):
+    # filters must be applied to the UPDATE builder (the bare table builder has no .eq)
+    b = supabase.table(name).update(values)
     if name in TENANT_SCOPED:
         b = b.eq("tenant_id", _tid())
     for k, v in filters.items():
         b = b.eq(k, v)
-    return b.update(values)
+    return _Write(b, name, _write_scope(name))
+
+
+def update(name: str, values: Json, **filters):
+    return _filtered_update(name, values, filters)
 
 
 def soft_delete(name: str, **filters):
     # sets deleted_at = now()
-    b = supabase.table(name)
-    if name in TENANT_SCOPED:
-        b = b.eq("tenant_id", _tid())
-    for k, v in filters.items():
-        b = b.eq(k, v)
-    return b.update({"deleted_at": "now()"})
+    return _filtered_update(name, {"deleted_at": "now()"}, filters)
 
 
 def restore(name: str, **filters):
-    b = supabase.table(name)
-    if name in TENANT_SCOPED:
-        b = b.eq("tenant_id", _tid())
+    return _filtered_update(name, {"deleted_at": None}, filters)
+
+
+def read_frame(
+    name: str,
+    columns: str = "*",
+    order_by: Sequence[str] = (),
+    include_deleted: bool = False,
+    **filters,
+) -> pd.DataFrame:
+    """
+    Every matching row of `name` as a DataFrame, scoped like `table(name).select(...)`.
+    With DB_* secrets configured this is one direct SQL read (utils.sql_read, no JSON);
+    otherwise a single REST select. `filters` are equality filters.
+    """
+    if direct_url_configured():
+        return sql_read.read_relation(
+            name,
+            columns,
+            tenant_id=_tid() if name in TENANT_SCOPED else None,
+            live_only=name in SOFT_DELETE and not include_deleted,
+            order_by=order_by,
+            **filters,
+        )
+    b = table(name, include_deleted=include_deleted).select(columns)
     for k, v in filters.items():
         b = b.eq(k, v)
-    return b.update({"deleted_at": None})
+    for c in order_by:
+        b = b.order(c)
+    return pd.DataFrame(b.execute().data or [])
+
+
+def read_frames(
+    name: str,
+    columns: str = "*",
+    key: Sequence[str] = ("id",),
+    **filters,
+) -> Iterator[pd.DataFrame]:
+    """
+    `read_frame` one page at a time, in `key` order (`key` must be unique), for reads
+    too large to hold at once: a server-side cursor (utils.sql_read.iter_relation)
+    with DB_* secrets configured, otherwise keyset pages over REST (`iter_frames`).
+    """
+    if direct_url_configured():
+        yield from sql_read.iter_relation(
+            name,
+            columns,
+            tenant_id=_tid() if name in TENANT_SCOPED else None,
+            live_only=name in SOFT_DELETE,
+            order_by=key,
+            **filters,
+        )
+    else:
+        yield from table(name).iter_frames(columns, key=key, **filters)
+
+
+def read_page(
+    name: str,
+    columns: str = "*",
+    *,
+    offset: int = 0,
+    limit: int = PAGE_SIZE,
+    order: Sequence[Tuple[str, bool]] = (),
+    where: Sequence[Tuple[str, str, str]] = (),
+    any_of: Sequence[str] = (),
+    count: Optional[str] = "exact",
+    **filters,
+) -> Tuple[pd.DataFrame, Optional[int]]:
+    """
+    Rows offset .. offset + limit - 1 of `name`, scoped like `table(name).select(...)`,
+    and how many rows match in total (None if PostgREST does not say, or with
+    `count=None`, which spares Postgres the count when paging through everything).
+    `order` is (column, descending) pairs, `where` (column, PostgREST operator, value)
+    terms that all hold, `any_of` logic trees for `or=(...)` (utils.grid_query builds
+    all three from a grid's state); `filters` are equality filters. Order by a unique
+    column last, or rows can repeat or go missing between pages.
+    """
+    b = table(name).select(columns, count=count, memo=False)
+    for k, v in filters.items():
+        b = b.eq(k, v)
+    for column, op, value in where:
+        b = b.filter(column, op, value)
+    for tree in any_of:
+        b = b.or_(tree)
+    for column, desc in order:
+        b = b.order(column, desc=desc)
+    res = b.range(offset, offset + limit - 1).execute()
+    return pd.DataFrame(res.data or []), res.count
 
 
 # RPC helpers
 def rpc(name: str, params: Optional[Json] = None):
     p = dict(params or {})
-    if name in {"get_recipe_details_mt", "get_unit_costs_for_inputs_mt"}:
+    if name in TENANT_RPCS:
         p.setdefault("p_tenant", _tid())
     return supabase.rpc(name, p)
+
+
+# Concurrent reads
+GATHER_WORKERS = 8  # requests in flight per process; the HTTP client pools connections
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_worker = threading.local()
+
+
+def _gather_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=GATHER_WORKERS, thread_name_prefix="db-gather")
+        return _pool
+
+
+def _run(query) -> Any:
+    # builders (anything with .execute()) run as-is; loaders are called
+    return query.execute() if hasattr(query, "execute") else query()
+
+
+def gather(*queries, return_exceptions: bool = False) -> List[Any]:
+    """
+    Run independent queries concurrently and return their results in order.
+
+    Each query is a zero-argument loader (e.g. `fetch_categories`) or a builder
+    to `.execute()`. Build builders before calling. The active tenant is
+    resolved here, on the calling thread, and pinned on the workers together
+    with Streamlit's script context, so loaders that call `db.table(...)`, the
+    tenant cache or `st.*` behave as they would inline.
+
+    The first failure is re-raised after every query has finished, unless
+    `return_exceptions=True` (then exceptions are returned in place). Called
+    from inside a gathered query, queries run inline so the bounded pool
+    cannot deadlock on itself.
+    """
+    if not queries:
+        return []
+    if getattr(_worker, "active", False) or len(queries) == 1:
+        results = []
+        for q in queries:
+            try:
+                results.append(_run(q))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    tenant_id = _tid()
+    ctx = get_script_run_ctx()
+
+    def task(query):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        _worker.active = True
+        try:
+            with pinned_tenant(tenant_id):
+                return _run(query)
+        finally:
+            _worker.active = False
+
+    futures = [_gather_pool().submit(task, q) for q in queries]
+    results, first_error = [], None
+    for f in futures:
+        try:
+            results.append(f.result())
+        except Exception as e:
+            first_error = first_error or e
+            results.append(e)
+    if first_error is not None and not return_exceptions:
+        raise first_error
+    return results
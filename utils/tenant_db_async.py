@@ -0,0 +1,284 @@
+# utils/tenant_db_async.py
+"""
+Asyncio counterpart of utils.tenant_db, for batch jobs and services.
+
+Same scoping rules (TENANT_SCOPED, SOFT_DELETE, TENANT_RPCS) and the same
+change events after writes, but every call is awaitable and goes through one
+pooled HTTP/2 client per event loop, so hundreds of requests can be in flight
+from a single process:
+
+    async def cost_recipes(tenant_id, recipe_ids):
+        results = await dba.gather(
+            *(
+                dba.rpc("get_recipe_details_mt", {"p_recipe_id": r}, tenant_id=tenant_id).execute()
+                for r in recipe_ids
+            )
+        )
+        await dba.aclose()
+
+There is no session state outside the app, so the tenant is explicit: pass
+`tenant_id=` (falls back to the pinned / session tenant, never to the DB
+default tenant).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import weakref
+from typing import Any, Awaitable, Dict, List, Optional, Sequence, Set, TypeVar
+
+import httpx
+from postgrest import AsyncPostgrestClient
+
+from utils.supabase_client import SUPABASE_ANON_KEY, SUPABASE_URL
+from utils.tenant_db import (
+    PAGE_SIZE,
+    SOFT_DELETE,
+    TENANT_RPCS,
+    TENANT_SCOPED,
+    Json,
+    _after,
+    publish_change,
+)
+from utils.tenant_state import get_active_tenant
+
+T = TypeVar("T")
+
+# Connection pool per event loop. With HTTP/2 most requests share a few
+# connections; the limits cap sockets, not requests in flight.
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE = 20
+KEEPALIVE_EXPIRY = 30.0  # seconds an idle connection is kept open
+REQUEST_TIMEOUT = 120.0  # matches postgrest's default
+GATHER_LIMIT = 200  # awaitables run at once by gather()
+
+# httpx connections belong to the loop that opened them: one client per loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncPostgrestClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _client() -> AsyncPostgrestClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        http = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            # pool=None: requests beyond the limits wait for a connection instead of failing
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, pool=None),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        client = AsyncPostgrestClient(
+            f"{SUPABASE_URL}/rest/v1",
+            headers={
+                "apikey": SUPABASE_ANON_KEY,
+                "Authorization": f"Bearer {SUPABASE_ANON_KEY}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            http_client=http,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close this loop's HTTP client (call once at the end of a job)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _tid(tenant_id: Optional[str] = None) -> str:
+    t = tenant_id or get_active_tenant()
+    if not t:
+        raise ValueError("No active tenant: pass tenant_id")
+    return t
+
+
+class _AsyncWrite:
+    """
+    Proxy around an async postgrest write builder. Filters chain through
+    unchanged; `await .execute()` runs the write and then publishes the change event.
+    """
+
+    def __init__(self, builder, name: str, tenant_ids: Set[Optional[str]], deleted: bool = False):
+        self._builder = builder
+        self._name = name
+        self._tenant_ids = tenant_ids
+        self._deleted = deleted
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._builder, attr)
+        if not callable(value):
+            return value
+
+        def chained(*args, **kwargs):
+            out = value(*args, **kwargs)
+            if hasattr(out, "execute"):
+                return _AsyncWrite(out, self._name, self._tenant_ids, self._deleted)
+            return out
+
+        return chained
+
+    async def execute(self):
+        res = await self._builder.execute()
+        data = getattr(res, "data", None)
+        for tid in self._tenant_ids:
+            rows = None
+            if isinstance(data, list):
+                rows = [r for r in data if tid is None or r.get("tenant_id") in (None, tid)]
+            publish_change(self._name, tid, rows, self._deleted)
+        return res
+
+
+def _write_scope(name: str, tenant_id: Optional[str] = None) -> Set[Optional[str]]:
+    if name in TENANT_SCOPED:
+        return {_tid(tenant_id)}
+    return {None}
+
+
+class _AsyncTenantTable:
+    def __init__(self, name: str, tenant_id: Optional[str] = None, include_deleted: bool = False):
+        self.name = name
+        self.tenant_id = tenant_id
+        self.include_deleted = include_deleted
+
+    # --- READS ---
+    def select(self, columns: str = "*"):
+        b = _client().table(self.name).select(columns)
+        if self.name in TENANT_SCOPED:
+            b = b.eq("tenant_id", _tid(self.tenant_id))
+        if (self.name in SOFT_DELETE) and (not self.include_deleted):
+            b = b.is_("deleted_at", "null")
+        return b
+
+    async def select_all(
+        self,
+        columns: str = "*",
+        page_size: int = PAGE_SIZE,
+        key: Sequence[str] = ("id",),
+        **filters,
+    ) -> List[Json]:
+        """Every matching row, read in keyset pages (see tenant_db `iter_rows`)."""
+        cols = [c.strip() for c in columns.split(",")]
+        if "*" not in cols:
+            cols += [k for k in key if k not in cols]
+        rows: List[Json] = []
+        last: Optional[Json] = None
+        while True:
+            b = self.select(", ".join(cols))
+            for k, v in filters.items():
+                b = b.eq(k, v)
+            if last is not None:
+                b = _after(b, key, last)
+            for k in key:
+                b = b.order(k)
+            page = (await b.limit(page_size).execute()).data or []
+            if not page:
+                return rows
+            rows.extend(page)
+            last = page[-1]
+
+    # --- WRITES ---
+    def insert(self, row: Json):
+        payload = dict(row)
+        if self.name in TENANT_SCOPED:
+            payload.setdefault("tenant_id", _tid(self.tenant_id))
+        scope = _write_scope(self.name, payload.get("tenant_id"))
+        return _AsyncWrite(_client().table(self.name).insert(payload), self.name, scope)
+
+    def upsert(self, row: Json):
+        payload = dict(row)
+        if self.name in TENANT_SCOPED:
+            payload.setdefault("tenant_id", _tid(self.tenant_id))
+        scope = _write_scope(self.name, payload.get("tenant_id"))
+        return _AsyncWrite(_client().table(self.name).upsert(payload), self.name, scope)
+
+    def update(self, values: Json):
+        b = _client().table(self.name).update(values)
+        if self.name in TENANT_SCOPED:
+            b = b.eq("tenant_id", _tid(self.tenant_id))
+        return _AsyncWrite(b, self.name, _write_scope(self.name, self.tenant_id))
+
+    def delete(self):
+        # hard delete (discouraged). Still tenant-scoped if used.
+        b = _client().table(self.name).delete()
+        if self.name in TENANT_SCOPED:
+            b = b.eq("tenant_id", _tid(self.tenant_id))
+        return _AsyncWrite(b, self.name, _write_scope(self.name, self.tenant_id), deleted=True)
+
+
+# Public helpers
+def table(
+    name: str, tenant_id: Optional[str] = None, include_deleted: bool = False
+) -> _AsyncTenantTable:
+    return _AsyncTenantTable(name, tenant_id=tenant_id, include_deleted=include_deleted)
+
+
+def insert_many(name: str, rows: List[Json], tenant_id: Optional[str] = None):
+    scope: Set[Optional[str]] = {None}
+    if name in TENANT_SCOPED:
+        t = _tid(tenant_id)
+        rows = [{**r, "tenant_id": r.get("tenant_id", t)} for r in rows]
+        scope = {r["tenant_id"] for r in rows} or {t}
+    return _AsyncWrite(_client().table(name).insert(rows), name, scope)
+
+
+def _filtered_update(name: str, values: Json, tenant_id: Optional[str], filters: Dict[str, Any]):
+    b = _client().table(name).update(values)
+    if name in TENANT_SCOPED:
+        b = b.eq("tenant_id", _tid(tenant_id))
+    for k, v in filters.items():
+        b = b.eq(k, v)
+    return _AsyncWrite(b, name, _write_scope(name, tenant_id))
+
+
+def update(name: str, values: Json, tenant_id: Optional[str] = None, **filters):
+    return _filtered_update(name, values, tenant_id, filters)
+
+
+def soft_delete(name: str, tenant_id: Optional[str] = None, **filters):
+    # sets deleted_at = now()
+    return _filtered_update(name, {"deleted_at": "now()"}, tenant_id, filters)
+
+
+def restore(name: str, tenant_id: Optional[str] = None, **filters):
+    return _filtered_update(name, {"deleted_at": None}, tenant_id, filters)
+
+
+# RPC helpers
+def rpc(name: str, params: Optional[Json] = None, tenant_id: Optional[str] = None):
+    p = dict(params or {})
+    if name in TENANT_RPCS:
+        p.setdefault("p_tenant", _tid(tenant_id))
+    return _client().rpc(name, p)
+
+
+async def gather(*aws: Awaitable[T], limit: int = GATHER_LIMIT) -> List[T]:
+    """
+    `asyncio.gather` with at most `limit` awaitables running at once, results in
+    order. Fails fast like asyncio.gather; pending awaitables are cancelled, and
+    coroutines that never got their turn are closed.
+    """
+    sem = asyncio.Semaphore(limit)
+
+    async def bounded(aw: Awaitable[T]) -> T:
+        async with sem:
+            return await aw
+
+    tasks = [asyncio.ensure_future(bounded(aw)) for aw in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for t in tasks:
+            t.cancel()
+        for aw in aws:
+            if inspect.iscoroutine(aw) and inspect.getcoroutinestate(aw) == inspect.CORO_CREATED:
+                aw.close()
@@ -1,24 +1,55 @@
 # utils/tenant_state.py
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 TENANT_KEY = "tenant_id"
 
+# Per-thread override: worker threads (tenant_db.gather) have no session state
+_pinned = threading.local()
+
 
 def set_active_tenant(tenant_id: str) -> None:
+    # No cache wipe here: utils.cache namespaces entries by tenant, so switching
+    # clients never serves another tenant's data and never evicts other sessions.
     st.session_state[TENANT_KEY] = tenant_id
-    try:
-        st.cache_data.clear()
-    except Exception:
-        pass
 
 
 def get_active_tenant(default: Optional[str] = None) -> Optional[str]:
+    pinned = getattr(_pinned, "tenant_id", None)
+    if pinned is not None:
+        return pinned
     return st.session_state.get(TENANT_KEY, default)
 
 
+@contextmanager
+def pinned_tenant(tenant_id: str) -> Iterator[None]:
+    """Make get_active_tenant() return `tenant_id` on this thread, without session state."""
+    previous = getattr(_pinned, "tenant_id", None)
+    _pinned.tenant_id = tenant_id
+    try:
+        yield
+    finally:
+        _pinned.tenant_id = previous
+
+
 def key(name: str) -> str:
     """Prefix keys with the active tenant to avoid cross-tenant widget bleed."""
     tid = get_active_tenant("no-tenant")
     return f"{tid}__{name}"
+
+
+def current_rerun() -> Optional[Tuple[str, Any]]:
+    """
+    (session_id, token) for the Streamlit rerun in progress; None outside a script run.
+    The token is the same object for the whole rerun (worker threads attached with
+    add_script_run_ctx included) and a new one on every rerun; compare with `is`.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    # ScriptRunContext.reset() gives every rerun a fresh widget_ids_this_run set
+    return ctx.session_id, ctx.widget_ids_this_run
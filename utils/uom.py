@@ -0,0 +1,142 @@
+"""
+Transitive closure of `ref_uom_conversion`.
+
+The table only holds the pairs someone typed in: a line measured in `kg`
+against a package bought in `oz` gets no factor when the table knows `kg`→`g`
+and `g`→`oz` but not `kg`→`oz`. `closure` chains direct pairs into every
+reachable pair and keeps the result as a dense factor matrix over a sorted UOM
+vocabulary, so each lookup is one array (or dict) access.
+
+The closure is computed once per version of the table: the rows themselves are
+the cache key, so a saved conversion yields a new closure on the next read.
+
+Path rules, mirrored by `refresh_uom_conversion_closure()` (V018):
+  - a direct row always wins;
+  - otherwise the path with the fewest hops;
+  - among equally short paths, the one whose last intermediate UOM sorts first.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+Row = Dict[str, Any]
+Version = Tuple[Tuple[str, str, float], ...]
+
+
+class UomClosure:
+    """
+    Factor matrix over `vocab`: `factors[i, j]` converts one `vocab[i]` into
+    `vocab[j]` (NaN when no path exists, 1 on the diagonal) and `hops[i, j]` is
+    the path length (0 on the diagonal, -1 when unreachable). Arrays are read-only.
+    """
+
+    def __init__(self, vocab: pd.Index, factors: np.ndarray, hops: np.ndarray):
+        self.vocab = vocab
+        self.factors = factors
+        self.hops = hops
+
+    def factor(self, from_uom: Optional[str], to_uom: Optional[str]) -> Optional[float]:
+        """Factor from one UOM to another: 1 when equal, None when no path exists."""
+        if from_uom is not None and from_uom == to_uom:
+            return 1.0
+        i = self.vocab.get_indexer([from_uom, to_uom])
+        if (i < 0).any() or np.isnan(self.factors[i[0], i[1]]):
+            return None
+        return float(self.factors[i[0], i[1]])
+
+    def as_dict(self) -> Dict[Tuple[str, str], float]:
+        """(from_uom, to_uom) -> factor for every reachable pair of distinct UOMs."""
+        src, dst = np.nonzero(self.hops > 0)
+        return {(self.vocab[i], self.vocab[j]): float(self.factors[i, j]) for i, j in zip(src, dst)}
+
+    def pairs(self) -> List[Row]:
+        """Closure rows as `ref_uom_conversion_closure` holds them (no identity rows)."""
+        src, dst = np.nonzero(self.hops > 0)
+        return [
+            {
+                "from_uom": self.vocab[i],
+                "to_uom": self.vocab[j],
+                "factor": float(self.factors[i, j]),
+                "hops": int(self.hops[i, j]),
+            }
+            for i, j in zip(src, dst)
+        ]
+
+    def matrix(self, vocab: pd.Index) -> np.ndarray:
+        """
+        The factors re-indexed onto another vocabulary, with one extra NaN row and
+        column at index len(vocab) so an unknown UOM (code -1) finds no factor.
+        """
+        n = len(vocab)
+        out = np.full((n + 1, n + 1), np.nan)
+        idx = vocab.get_indexer(self.vocab)
+        known = idx >= 0
+        out[np.ix_(idx[known], idx[known])] = self.factors[np.ix_(known, known)]
+        out[np.arange(n), np.arange(n)] = 1.0
+        return out
+
+
+def version(conversions: Iterable[Row]) -> Version:
+    """Hashable identity of a set of `ref_uom_conversion` rows (incomplete rows skipped)."""
+    out = set()
+    for c in conversions:
+        src, dst, factor = c.get("from_uom"), c.get("to_uom"), c.get("factor")
+        if src is None or dst is None or factor is None or pd.isna(factor):
+            continue
+        out.add((str(src), str(dst), float(factor)))
+    return tuple(sorted(out))
+
+
+def closure(conversions: Iterable[Row]) -> UomClosure:
+    """Closure of `ref_uom_conversion` rows (dicts or a DataFrame), cached per version."""
+    if isinstance(conversions, pd.DataFrame):
+        conversions = conversions.to_dict("records")
+    return _closure(version(conversions))
+
+
+@lru_cache(maxsize=16)
+def _closure(rows: Version) -> UomClosure:
+    vocab = pd.Index(sorted({u for src, dst, _ in rows for u in (src, dst)}), dtype=object)
+    n = len(vocab)
+    direct = np.full((n, n), np.nan)
+    if rows:
+        src = vocab.get_indexer([r[0] for r in rows])
+        dst = vocab.get_indexer([r[1] for r in rows])
+        direct[src, dst] = [r[2] for r in rows]
+    direct[np.arange(n), np.arange(n)] = 1.0
+
+    factors = direct.copy()
+    hops = np.where(np.isnan(direct), -1, 1)
+    hops[np.arange(n), np.arange(n)] = 0
+    step = 1
+    while True:
+        missing = np.isnan(factors)
+        if not missing.any():
+            break
+        # cand[i, k, j]: known i -> k, then the direct pair k -> j
+        cand = factors[:, :, None] * direct[None, :, :]
+        ok = ~np.isnan(cand)
+        fill = missing & ok.any(axis=1)
+        if not fill.any():
+            break
+        first_k = ok.argmax(axis=1)
+        best = np.take_along_axis(cand, first_k[:, None, :], axis=1)[:, 0, :]
+        step += 1
+        factors[fill] = best[fill]
+        hops[fill] = step
+
+    factors.setflags(write=False)
+    hops.setflags(write=False)
+    return UomClosure(vocab, factors, hops)
+
+
+__all__ = [
+    "UomClosure",
+    "closure",
+    "version",
+]